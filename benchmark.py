@@ -0,0 +1,507 @@
+"""
+Banco de pruebas de rendimiento con una base sintética de farmacia.
+
+Genera (o reutiliza) una base con la cantidad de productos y movimientos de la
+escala elegida, mide cada método de DBManager, la lógica en Python puro
+(filtros, paginación, formato de filas, costeo) y, si hay pantalla, el
+redibujado de la tabla de Inventario. Los resultados se guardan en JSON y se
+pueden comparar contra una corrida anterior (la "línea base").
+
+Uso:
+    python benchmark.py [--escala pequena|mediana|grande] [--repeticiones 5] [--salida resultados.json]
+    python benchmark.py --productos 5000 --movimientos 200000
+    python benchmark.py --comparar base.json [--umbral 20] [--fallar-si-empeora]
+    xvfb-run python benchmark.py ...     (para medir también la interfaz sin monitor)
+
+Las bases generadas se guardan en --datos y se reutilizan entre corridas con la
+misma escala y semilla; cada corrida trabaja sobre una copia.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from catalogo import CatalogoCache
+from db_manager import DBManager, cargar_configuracion, consulta_fts, validar_movimiento
+from importador import normalizar_fila
+from valoracion import EstadoValoracion
+
+# Escalas predefinidas: (productos, movimientos)
+ESCALAS = {
+    "pequena": (1_000, 100_000),
+    "mediana": (10_000, 1_000_000),
+    "grande": (100_000, 10_000_000),
+}
+# Los movimientos sintéticos terminan en una fecha fija para que las corridas sean comparables
+FECHA_FIN = date(2025, 12, 31)
+DIAS = 730
+TAMANO_INSERCION = 100_000
+
+CATEGORIAS = [
+    "Analgésicos", "Antibióticos", "Antiinflamatorios", "Antihistamínicos", "Vitaminas y suplementos",
+    "Dermatología", "Gastrointestinal", "Cardiovascular", "Respiratorio", "Higiene personal",
+    "Bebés", "Oftalmología", "Diabetes", "Primeros auxilios",
+]
+DROGAS = [
+    "Paracetamol", "Ibuprofeno", "Amoxicilina", "Loratadina", "Omeprazol", "Diclofenac", "Atorvastatina",
+    "Metformina", "Salbutamol", "Cetirizina", "Enalapril", "Losartán", "Ácido fólico", "Vitamina C",
+    "Azitromicina", "Dexametasona", "Ranitidina", "Levotiroxina", "Amlodipina", "Clotrimazol",
+]
+DOSIS = ["5mg", "10mg", "20mg", "50mg", "100mg", "250mg", "500mg", "1g"]
+PRESENTACIONES = ["comprimidos", "cápsulas", "jarabe 120ml", "crema 30g", "gotas 20ml", "sobres"]
+LABORATORIOS = ["Bayer", "Roemmers", "Bagó", "Elea", "Gador", "Pfizer", "Sanofi", "Novartis", "Raffo", "Casasco"]
+
+
+@contextlib.contextmanager
+def silencio():
+    """Oculta los mensajes de DBManager (conexión, migraciones) mientras se prepara la base."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def abrir_base(ruta):
+    config = cargar_configuracion()
+    config["archivo"] = str(ruta)
+    with silencio():
+        return DBManager(config)
+
+
+# --- Generación de datos ---
+
+def generar_base(ruta, productos, movimientos, semilla=1):
+    """
+    Crea en 'ruta' una base sintética con 'productos' productos y 'movimientos'
+    movimientos repartidos en los DIAS días anteriores a FECHA_FIN, siempre igual
+    para la misma semilla. Las tablas base se llenan sin triggers y después
+    DBManager aplica las migraciones, que cargan stock, FTS y resúmenes de una vez.
+    """
+    rng = random.Random(semilla)
+    ruta = Path(ruta)
+    for sufijo in ("", "-wal", "-shm"):
+        Path(f"{ruta}{sufijo}").unlink(missing_ok=True)
+
+    # El esquema base se toma de DBManager (en memoria) para no duplicar el DDL
+    config = cargar_configuracion()
+    config["archivo"] = ":memory:"
+    with silencio():
+        plantilla = DBManager(config)
+    ddl = [
+        sql for (sql,) in plantilla.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ('categorias', 'productos', 'movimientos') "
+            "ORDER BY rowid"
+        )
+    ]
+    plantilla.cerrar()
+
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    for sql in ddl:
+        conn.execute(sql)
+
+    conn.executemany("INSERT INTO categorias (id, nombre) VALUES (?, ?)", enumerate(CATEGORIAS, start=1))
+    precios = []
+    filas = []
+    for producto_id in range(1, productos + 1):
+        nombre = f"{rng.choice(DROGAS)} {rng.choice(DOSIS)} x {rng.randint(1, 60)} {rng.choice(PRESENTACIONES)}"
+        filas.append((
+            producto_id, f"MED{producto_id:06d}", nombre,
+            rng.randint(1, len(CATEGORIAS)), rng.choice(LABORATORIOS),
+        ))
+        precios.append(round(rng.uniform(500, 50_000), 2))
+    conn.executemany("INSERT INTO productos (id, codigo, nombre, categoria_id, laboratorio) VALUES (?, ?, ?, ?, ?)", filas)
+
+    # Movimientos en orden de fecha; los productos más bajos se mueven más (distribución sesgada)
+    inicio = FECHA_FIN - timedelta(days=DIAS - 1)
+    lote = []
+    for dia in range(DIAS):
+        fecha = (inicio + timedelta(days=dia)).isoformat()
+        cantidad_dia = movimientos // DIAS + (1 if dia < movimientos % DIAS else 0)
+        for _ in range(cantidad_dia):
+            producto_id = int(productos * rng.random() ** 2) + 1
+            if rng.random() < 0.25:
+                lote.append((producto_id, fecha, "Compra", precios[producto_id - 1], rng.randint(10, 200), ""))
+            else:
+                lote.append((producto_id, fecha, "Venta", round(precios[producto_id - 1] * 1.4, 2), rng.randint(1, 5), ""))
+            if len(lote) >= TAMANO_INSERCION:
+                conn.executemany(
+                    "INSERT INTO movimientos (producto_id, fecha, tipo, precio, cantidad, observaciones) VALUES (?, ?, ?, ?, ?, ?)",
+                    lote
+                )
+                lote.clear()
+    conn.executemany(
+        "INSERT INTO movimientos (producto_id, fecha, tipo, precio, cantidad, observaciones) VALUES (?, ?, ?, ?, ?, ?)",
+        lote
+    )
+    conn.commit()
+    conn.close()
+
+    # Las migraciones crean las tablas derivadas, los triggers y los índices sobre los datos ya cargados
+    abrir_base(ruta).cerrar()
+
+
+# --- Medición ---
+
+def medir(funcion, repeticiones):
+    """Ejecuta funcion() 'repeticiones' veces y retorna los tiempos en ms."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def resumir(grupo, tiempos):
+    return {
+        "grupo": grupo,
+        "repeticiones": len(tiempos),
+        "mediana_ms": statistics.median(tiempos),
+        "minimo_ms": min(tiempos),
+        "maximo_ms": max(tiempos),
+    }
+
+
+def consumir(bloques):
+    """Recorre un generador de bloques y retorna la cantidad de filas."""
+    return sum(len(bloque) for bloque in bloques)
+
+
+def casos_lectura(db, productos):
+    """(nombre, función, repeticiones o None) para los métodos de DBManager que sólo leen."""
+    producto_id = productos // 2 or 1
+    codigo, nombre = db.catalogo.producto(producto_id)
+    categoria = CATEGORIAS[0]
+    mes = FECHA_FIN.strftime("%Y-%m")
+    mes_inicio = (FECHA_FIN - timedelta(days=364)).strftime("%Y-%m")
+    desde_mes = FECHA_FIN.replace(day=1).isoformat()
+    hasta = FECHA_FIN.isoformat()
+    medio = (FECHA_FIN - timedelta(days=DIAS // 2)).isoformat()
+    pagina = db.consultar_inventario(limite=15)
+    return [
+        ("obtener_productos_combo", db.obtener_productos_combo, None),
+        ("obtener_id_producto_por_nombre", lambda: db.obtener_id_producto_por_nombre(nombre), None),
+        ("obtener_producto_por_id", lambda: db.obtener_producto_por_id(producto_id), None),
+        ("obtener_detalle_producto (sin caché)", lambda: (db._invalidar_detalles(), db.obtener_detalle_producto(producto_id)), None),
+        ("obtener_detalle_producto (con caché)", lambda: db.obtener_detalle_producto(producto_id), None),
+        ("obtener_datos_inventario", db.obtener_datos_inventario, 3),
+        ("contar_inventario", db.contar_inventario, None),
+        ("contar_inventario (texto + alerta)", lambda: db.contar_inventario("paracetamol 500", "Stock bajo"), None),
+        ("consultar_inventario (primera página)", lambda: db.consultar_inventario(limite=15), None),
+        ("consultar_inventario (siguiente página)", lambda: db.consultar_inventario(despues_de=pagina[-1], limite=15), None),
+        ("consultar_inventario (orden stock)", lambda: db.consultar_inventario(orden="stock", limite=15), None),
+        ("consultar_inventario (texto)", lambda: db.consultar_inventario("amoxicilina", limite=15), None),
+        ("obtener_filas_inventario", lambda: db.obtener_filas_inventario([fila[0] for fila in pagina]), None),
+        ("iterar_inventario (completo)", lambda: consumir(db.iterar_inventario()), 3),
+        ("buscar_productos", lambda: db.buscar_productos("para 50"), None),
+        ("obtener_cierres", db.obtener_cierres, None),
+        ("stock_en_fecha (un producto)", lambda: db.stock_en_fecha(producto_id, medio), None),
+        ("stock_en_fecha (todos)", lambda: db.stock_en_fecha(None, medio), 3),
+        ("resumen_valoracion", db.resumen_valoracion, None),
+        ("valoracion_por_categoria", db.valoracion_por_categoria, None),
+        ("obtener_tablero (mes, por día)", lambda: db.obtener_tablero(mes, mes, por_dia=True), None),
+        ("obtener_tablero (12 meses)", lambda: db.obtener_tablero(mes_inicio, mes), None),
+        ("obtener_categorias", db.obtener_categorias, None),
+        ("buscar_categorias", lambda: db.buscar_categorias("anti"), None),
+        ("obtener_todas_categorias_combo", db.obtener_todas_categorias_combo, None),
+        ("obtener_id_categoria_por_nombre", lambda: db.obtener_id_categoria_por_nombre(categoria), None),
+        ("obtener_mapa_categorias", db.obtener_mapa_categorias, None),
+        ("obtener_mapa_codigos", db.obtener_mapa_codigos, 3),
+        ("obtener_ultimo_movimiento", lambda: db.obtener_ultimo_movimiento(producto_id, "Compra"), None),
+        ("obtener_movimientos_producto", lambda: db.obtener_movimientos_producto(producto_id), None),
+        ("obtener_movimientos_por_fecha (un mes)", lambda: db.obtener_movimientos_por_fecha(desde_mes, hasta), 3),
+        ("contar_movimientos (un mes)", lambda: db.contar_movimientos(desde_mes, hasta), None),
+        ("iterar_movimientos (un mes)", lambda: consumir(db.iterar_movimientos(desde_mes, hasta)), 3),
+    ]
+
+
+def casos_escritura(db, productos):
+    """
+    Casos que modifican la base, en el orden en que se ejecutan. Cada repetición
+    usa datos nuevos (nombres, códigos o fechas distintos) para no chocar con la anterior.
+    """
+    contador = itertools.count(1)
+    categoria_id = 1
+    producto_id = productos // 2 or 1
+    fecha = FECHA_FIN.isoformat()
+    nuevas_categorias = []
+    nuevos_productos = []
+    cierres = (FECHA_FIN - timedelta(days=dias) for dias in itertools.count(40, 7))
+
+    def insertar_categoria():
+        nuevas_categorias.append(db.insertar_categoria(f"Benchmark {next(contador)}"))
+
+    def insertar_producto():
+        n = next(contador)
+        nuevos_productos.append(db.insertar_producto(f"BENCH{n:07d}", f"Producto de prueba {n}", categoria_id, "Bayer"))
+
+    def registrar_producto():
+        n = next(contador)
+        nuevos_productos.append(db.registrar_producto(f"BENCH{n:07d}", f"Producto de prueba {n}", CATEGORIAS[0], "Bayer"))
+
+    def guardar_productos_lote():
+        n = next(contador)
+        db.guardar_productos_lote(
+            [(f"MED{i:06d}", f"Producto renombrado {n}-{i}", CATEGORIAS[i % len(CATEGORIAS)], "Bagó")
+             for i in range(1, min(productos, 1000) + 1)],
+            db.obtener_mapa_categorias()
+        )
+
+    lote = [(producto_id, fecha, "Venta", 100.0, 1, "benchmark")] * 1000
+    return [
+        ("insertar_categoria", insertar_categoria, None),
+        ("actualizar_categoria", lambda: db.actualizar_categoria(nuevas_categorias[0], f"Benchmark renombrada {next(contador)}"), None),
+        ("eliminar_categoria", lambda: db.eliminar_categoria(nuevas_categorias.pop()), None),
+        ("insertar_producto", insertar_producto, None),
+        ("registrar_producto (categoría + inserción)", registrar_producto, None),
+        ("guardar_productos_lote (1000)", guardar_productos_lote, 3),
+        ("guardar_productos_lote (1000, simulado)", lambda: db.guardar_productos_lote(
+            [(f"SIM{i:06d}", "Simulado", CATEGORIAS[0], "Elea") for i in range(1000)], db.obtener_mapa_categorias(), simular=True
+        ), 3),
+        ("actualizar_valoracion (completa)", db.actualizar_valoracion, 1),
+        ("actualizar_valoracion fifo (completa)", lambda: db.actualizar_valoracion("fifo"), 1),
+        ("crear_cierres_mensuales (completo)", lambda: db.crear_cierres_mensuales(FECHA_FIN.isoformat()), 1),
+        ("crear_cierre", lambda: db.crear_cierre(next(cierres).isoformat()), 3),
+        ("insertar_movimiento", lambda: db.insertar_movimiento(producto_id, fecha, "Venta", 100.0, 1, "benchmark"), None),
+        ("registrar_movimiento (inserción + stock)",
+         lambda: db.registrar_movimiento(producto_id, fecha, "Venta", 100.0, 1, "benchmark"), None),
+        ("insertar_movimiento (retroactivo, con cierres)", lambda: db.insertar_movimiento(
+            producto_id, (FECHA_FIN - timedelta(days=DIAS - 5)).isoformat(), "Compra", 50.0, 1, "benchmark"
+        ), None),
+        ("insertar_movimientos_lote (1000)", lambda: db.insertar_movimientos_lote(lote), 3),
+        ("actualizar_valoracion (incremental)", lambda: (db.insertar_movimiento(producto_id, fecha, "Venta", 100.0, 1, ""),
+                                                         db.actualizar_valoracion()), None),
+        ("verificar_stock", db.verificar_stock, 3),
+        ("verificar_cierres", db.verificar_cierres, 1),
+        ("eliminar_producto_completo", lambda: db.eliminar_producto_completo(nuevos_productos.pop()), 1),
+    ]
+
+
+def casos_python(db, productos):
+    """Lógica en Python puro: se mide un lote de llamadas para que el tiempo sea apreciable."""
+    from main_app import InventarioPage
+
+    pagina = db.consultar_inventario(limite=15)
+    catalogo = db.catalogo
+    codigos = [f"MED{i:06d}" for i in range(1, productos + 1)]
+    rng = random.Random(7)
+    operaciones = [
+        (i, f"2025-{i % 12 + 1:02d}-01", "Compra" if rng.random() < 0.3 else "Venta", 100.0 + i % 50, rng.randint(1, 20))
+        for i in range(100_000)
+    ]
+    fila = {"codigo": " MED000001 ", "fecha": "05/12/2025", "tipo": "Venta", "precio": "10.5", "cantidad": "2"}
+
+    def costeo(metodo):
+        estado = EstadoValoracion(metodo)
+        for operacion in operaciones:
+            estado.aplicar(*operacion)
+
+    def paginar(paginas=20):
+        # Recorre páginas con la paginación por clave, como los botones de Inventario
+        actual = db.consultar_inventario(limite=15)
+        for _ in range(paginas - 1):
+            if not actual:
+                break
+            actual = db.consultar_inventario(despues_de=actual[-1], limite=15)
+
+    def catalogo_copia():
+        copia = CatalogoCache()
+        copia.cargar(
+            [(i, nombre) for i, nombre in enumerate(CATEGORIAS, start=1)],
+            [(i, codigo, codigo) for i, codigo in enumerate(codigos, start=1)],
+        )
+        return copia
+
+    return [
+        ("consulta_fts x10000", lambda: [consulta_fts("paracetamol 500 mg") for _ in range(10_000)], None),
+        ("validar_movimiento x10000", lambda: [validar_movimiento("05/12/2025", "Venta", "10.5", "2") for _ in range(10_000)], None),
+        ("normalizar_fila x10000", lambda: [normalizar_fila(fila) for _ in range(10_000)], None),
+        ("InventarioPage.formatear_filas x1000 páginas", lambda: [InventarioPage.formatear_filas(pagina) for _ in range(1000)], None),
+        ("paginacion keyset (20 páginas)", paginar, None),
+        ("EstadoValoracion promedio x100000", lambda: costeo("promedio"), 3),
+        ("EstadoValoracion fifo x100000", lambda: costeo("fifo"), 3),
+        ("CatalogoCache.id_por_codigo (todos)", lambda: [catalogo.id_por_codigo(codigo) for codigo in codigos], None),
+        ("CatalogoCache.cargar + productos_combo", lambda: catalogo_copia().productos_combo(), 3),
+    ]
+
+
+def casos_interfaz(db, repeticiones):
+    """
+    Redibujado de la tabla de Inventario (requiere pantalla; con xvfb-run sirve sin monitor).
+    Retorna {nombre: resumen} o None si no hay pantalla disponible.
+    """
+    import tkinter
+
+    import customtkinter as ctk
+    from db_executor import DBExecutor
+    from main_app import InventarioPage
+
+    try:
+        raiz = ctk.CTk()
+    except tkinter.TclError as e:
+        print(f"Sin pantalla disponible ({e}); se omite la medición de la interfaz (use xvfb-run).")
+        return None
+
+    resultados = {}
+    executor = DBExecutor(raiz, db_factory=lambda: db)
+    try:
+        raiz.geometry("1200x600")
+        inicio = time.perf_counter()
+        pagina = InventarioPage(raiz, executor)
+        pagina.grid(row=0, column=0, sticky="nsew")
+        raiz.update()
+        resultados["InventarioPage (construcción)"] = resumir("interfaz", [(time.perf_counter() - inicio) * 1000])
+
+        # Se espera a que terminen las cargas iniciales para que no interfieran
+        limite = time.perf_counter() + 30
+        while executor.pendientes() and time.perf_counter() < limite:
+            raiz.update()
+            time.sleep(0.01)
+        raiz.update()
+
+        primera = db.consultar_inventario(limite=pagina.items_per_page)
+        segunda = db.consultar_inventario(despues_de=primera[-1], limite=pagina.items_per_page) if primera else []
+        paginas = itertools.cycle([primera, segunda])
+
+        def redibujar(datos):
+            pagina.page_data = datos
+            pagina.draw_inventory_table()
+            raiz.update_idletasks()
+
+        resultados["draw_inventory_table (página distinta)"] = resumir(
+            "interfaz", medir(lambda: redibujar(next(paginas)), repeticiones * 4)
+        )
+        resultados["draw_inventory_table (misma página)"] = resumir(
+            "interfaz", medir(lambda: redibujar(primera), repeticiones * 4)
+        )
+    finally:
+        with silencio():
+            executor.cerrar()
+        raiz.destroy()
+    return resultados
+
+
+def ejecutar(ruta, productos, repeticiones, con_interfaz=True):
+    """Corre todos los casos sobre la base de 'ruta' y retorna {nombre: resumen}."""
+    resultados = {}
+    db = abrir_base(ruta)
+
+    for grupo, casos in (
+        ("lectura", casos_lectura(db, productos)),
+        ("python", casos_python(db, productos)),
+        ("escritura", casos_escritura(db, productos)),
+    ):
+        for nombre, funcion, veces in casos:
+            print(f"  {grupo}: {nombre}...", end="", flush=True)
+            tiempos = medir(funcion, veces or repeticiones)
+            resultados[nombre] = resumir(grupo, tiempos)
+            print(f" {resultados[nombre]['mediana_ms']:.2f} ms")
+
+    if con_interfaz:
+        interfaz = casos_interfaz(db, repeticiones) or {}
+        for nombre, resumen in interfaz.items():
+            print(f"  interfaz: {nombre}... {resumen['mediana_ms']:.2f} ms")
+        resultados.update(interfaz)
+    db.cerrar()
+    return resultados
+
+
+def comparar(resultados, base, umbral):
+    """
+    Imprime la variación de la mediana de cada caso respecto de la línea base.
+    Retorna la lista de casos que empeoraron más del 'umbral' (%).
+    """
+    empeorados = []
+    print(f"\n{'Caso':<52} {'Base ms':>10} {'Actual ms':>10} {'Cambio':>9}")
+    for nombre, resumen in resultados.items():
+        anterior = base.get(nombre)
+        if anterior is None:
+            print(f"{nombre:<52} {'-':>10} {resumen['mediana_ms']:>10.2f} {'nuevo':>9}")
+            continue
+        cambio = (resumen["mediana_ms"] - anterior["mediana_ms"]) / anterior["mediana_ms"] * 100 if anterior["mediana_ms"] else 0.0
+        marca = ""
+        if cambio > umbral:
+            marca = "  <- EMPEORÓ"
+            empeorados.append(nombre)
+        elif cambio < -umbral:
+            marca = "  <- mejoró"
+        print(f"{nombre:<52} {anterior['mediana_ms']:>10.2f} {resumen['mediana_ms']:>10.2f} {cambio:>+8.1f}%{marca}")
+    return empeorados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento del Sistema de Inventario.")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena", help="Tamaño de la base sintética.")
+    parser.add_argument("--productos", type=int, help="Cantidad de productos (reemplaza la escala).")
+    parser.add_argument("--movimientos", type=int, help="Cantidad de movimientos (reemplaza la escala).")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--datos", default="benchmark_datos", help="Carpeta donde se guardan las bases generadas.")
+    parser.add_argument("--regenerar", action="store_true", help="Vuelve a generar la base aunque exista.")
+    parser.add_argument("--sin-interfaz", action="store_true", help="No mide el redibujado de la tabla.")
+    parser.add_argument("--salida", default="benchmark_resultados.json", help="Archivo JSON con los resultados.")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para comparar.")
+    parser.add_argument("--umbral", type=float, default=20.0, help="Porcentaje a partir del cual un caso se marca como peor.")
+    parser.add_argument("--fallar-si-empeora", action="store_true", help="Termina con código 1 si algún caso empeoró.")
+    args = parser.parse_args()
+
+    productos, movimientos = ESCALAS[args.escala]
+    productos = args.productos or productos
+    movimientos = args.movimientos if args.movimientos is not None else movimientos
+
+    carpeta = Path(args.datos)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    original = carpeta / f"farmacia_{productos}p_{movimientos}m_s{args.semilla}.db"
+    if args.regenerar or not original.exists():
+        print(f"Generando base sintética: {productos} productos, {movimientos} movimientos...")
+        inicio = time.perf_counter()
+        generar_base(original, productos, movimientos, args.semilla)
+        print(f"Base generada en {time.perf_counter() - inicio:.1f} s: {original}")
+
+    # Se trabaja sobre una copia: los casos de escritura modifican la base
+    copia = carpeta / "trabajo.db"
+    for sufijo in ("-wal", "-shm"):
+        Path(f"{copia}{sufijo}").unlink(missing_ok=True)
+    shutil.copyfile(original, copia)
+
+    print(f"Midiendo con {args.repeticiones} repeticiones...")
+    resultados = ejecutar(copia, productos, args.repeticiones, con_interfaz=not args.sin_interfaz)
+
+    salida = {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "productos": productos,
+        "movimientos": movimientos,
+        "semilla": args.semilla,
+        "repeticiones": args.repeticiones,
+        "resultados": resultados,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(salida, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if (base.get("productos"), base.get("movimientos")) != (productos, movimientos):
+            print("Aviso: la línea base se midió con otra escala; la comparación no es directa.")
+        empeorados = comparar(resultados, base["resultados"], args.umbral)
+        if empeorados:
+            print(f"\n{len(empeorados)} casos empeoraron más de {args.umbral:.0f}%.")
+            if args.fallar_si_empeora:
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import threading
+
+# Tipos de cambio que se publican a los suscriptores
+CAMBIO_CATEGORIAS = "categorias"
+CAMBIO_PRODUCTOS = "productos"
+
+
+class CatalogoCache:
+    """
+    Copia en memoria de las categorías y productos (nombre <-> id <-> código) que
+    DBManager mantiene al día al escribir (write-through): así los combos y la
+    resolución de nombres no consultan la base. Después de cada cambio se avisa a
+    los suscriptores con el tipo de cambio ('categorias' o 'productos').
+
+    Se escribe desde el hilo de la DB y se lee desde cualquier hilo.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._oyentes = []
+        self.cargar([], [])
+
+    # --- Carga y suscripciones ---
+
+    def cargar(self, categorias, productos):
+        """Reemplaza el contenido: categorias [(id, nombre)], productos [(id, codigo, nombre)]."""
+        with self._lock:
+            self._categorias = dict(categorias)
+            self._id_categoria = {nombre: categoria_id for categoria_id, nombre in categorias}
+            self._productos = {}
+            self._id_por_codigo = {}
+            self._ids_por_nombre = {}
+            for producto_id, codigo, nombre in productos:
+                self._poner_producto(producto_id, codigo, nombre)
+            self._combo_categorias = None
+            self._combo_productos = None
+
+    def suscribir(self, oyente):
+        """Registra oyente(tipo_de_cambio); se llama en el hilo que hizo la escritura."""
+        with self._lock:
+            self._oyentes.append(oyente)
+
+    def desuscribir(self, oyente):
+        with self._lock:
+            if oyente in self._oyentes:
+                self._oyentes.remove(oyente)
+
+    def _notificar(self, tipo):
+        with self._lock:
+            oyentes = list(self._oyentes)
+        for oyente in oyentes:
+            try:
+                oyente(tipo)
+            except Exception as e:
+                print(f"Error al notificar un cambio del catálogo: {e}")
+
+    # --- Consultas ---
+
+    def nombres_categorias(self):
+        """Nombres de todas las categorías en orden alfabético (para ComboBox)."""
+        with self._lock:
+            if self._combo_categorias is None:
+                self._combo_categorias = sorted(self._id_categoria)
+            return list(self._combo_categorias)
+
+    def id_categoria(self, nombre):
+        with self._lock:
+            return self._id_categoria.get(nombre)
+
+    def productos_combo(self):
+        """[(id, nombre)] de todos los productos ordenados por nombre (para ComboBox)."""
+        with self._lock:
+            if self._combo_productos is None:
+                self._combo_productos = sorted(
+                    ((producto_id, nombre) for producto_id, (_, nombre) in self._productos.items()),
+                    key=lambda fila: (fila[1], fila[0]),
+                )
+            return list(self._combo_productos)
+
+    def id_producto(self, nombre):
+        """ID del producto con ese nombre (el más antiguo si hay varios), o None."""
+        with self._lock:
+            ids = self._ids_por_nombre.get(nombre)
+            return min(ids) if ids else None
+
+    def id_por_codigo(self, codigo):
+        with self._lock:
+            return self._id_por_codigo.get(codigo)
+
+    def producto(self, producto_id):
+        """(codigo, nombre) del producto, o None si no existe."""
+        with self._lock:
+            return self._productos.get(producto_id)
+
+    # --- Escritura (la llama DBManager después de confirmar la transacción) ---
+
+    def guardar_categorias(self, categorias):
+        """Agrega categorías o cambia su nombre: secuencia de (id, nombre)."""
+        with self._lock:
+            for categoria_id, nombre in categorias:
+                anterior = self._categorias.get(categoria_id)
+                if anterior is not None:
+                    del self._id_categoria[anterior]
+                self._categorias[categoria_id] = nombre
+                self._id_categoria[nombre] = categoria_id
+            self._combo_categorias = None
+        self._notificar(CAMBIO_CATEGORIAS)
+
+    def quitar_categoria(self, categoria_id):
+        with self._lock:
+            nombre = self._categorias.pop(categoria_id, None)
+            if nombre is None:
+                return
+            del self._id_categoria[nombre]
+            self._combo_categorias = None
+        self._notificar(CAMBIO_CATEGORIAS)
+
+    def guardar_productos(self, productos):
+        """Agrega o actualiza productos: secuencia de (id, codigo, nombre)."""
+        with self._lock:
+            for producto_id, codigo, nombre in productos:
+                self._quitar_producto(producto_id)
+                self._poner_producto(producto_id, codigo, nombre)
+            self._combo_productos = None
+        self._notificar(CAMBIO_PRODUCTOS)
+
+    def quitar_producto(self, producto_id):
+        with self._lock:
+            if producto_id not in self._productos:
+                return
+            self._quitar_producto(producto_id)
+            self._combo_productos = None
+        self._notificar(CAMBIO_PRODUCTOS)
+
+    def _poner_producto(self, producto_id, codigo, nombre):
+        self._productos[producto_id] = (codigo, nombre)
+        self._id_por_codigo[codigo] = producto_id
+        self._ids_por_nombre.setdefault(nombre, set()).add(producto_id)
+
+    def _quitar_producto(self, producto_id):
+        anterior = self._productos.pop(producto_id, None)
+        if anterior is None:
+            return
+        codigo, nombre = anterior
+        self._id_por_codigo.pop(codigo, None)
+        ids = self._ids_por_nombre[nombre]
+        ids.discard(producto_id)
+        if not ids:
+            del self._ids_por_nombre[nombre]
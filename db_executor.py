@@ -0,0 +1,212 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from db_manager import DBManager
+
+
+class DBExecutor:
+    """
+    Ejecuta las operaciones de la base de datos fuera del hilo de Tk para que el
+    bucle principal nunca se bloquee esperando a SQLite. Las escrituras pasan por
+    un único hilo (dueño de la conexión de escritura) y las lecturas por un pool
+    de hilos, uno por conexión de lectura de DBManager, que corren en paralelo.
+    Los resultados vuelven al hilo de Tk mediante after() y se entregan al callback.
+    """
+    INTERVALO_SONDEO_MS = 15
+
+    def __init__(self, raiz_tk, db_factory=DBManager):
+        self.raiz = raiz_tk
+        self._tareas = queue.Queue()
+        self._tareas_lectura = queue.Queue()
+        self._resultados = queue.Queue()
+        # Avisos (cambios del catálogo y de stock) pendientes de entregar en el hilo de Tk
+        self._eventos = queue.Queue()
+        self._pendientes = 0
+        self._sondeo = None
+
+        # Métricas por operación: nombre -> [llamadas, espera total, ejecución total, ejecución máxima]
+        self._lock_metricas = threading.Lock()
+        self._metricas = {}
+
+        # Viajes a la base por acción del usuario: nombre -> [veces, operaciones enviadas].
+        # Sólo se usan desde el hilo de Tk, igual que enviar().
+        self._accion = None
+        self._acciones = {}
+
+        self._hilo = threading.Thread(target=self._bucle, args=(self._tareas,), name="DBExecutor", daemon=True)
+        self._hilo.start()
+
+        # La conexión (y las migraciones) se crean dentro del hilo de escritura.
+        self.db = self.enviar(db_factory).result()
+
+        self._hilos_lectura = [
+            threading.Thread(target=self._bucle, args=(self._tareas_lectura,), name=f"DBExecutor-lector-{i}", daemon=True)
+            for i in range(self.db.total_lectores)
+        ]
+        for hilo in self._hilos_lectura:
+            hilo.start()
+
+    # --- API para la interfaz ---
+
+    def enviar(self, funcion, *args, al_terminar=None, **kwargs):
+        """
+        Encola funcion(*args, **kwargs) para ejecutarse en el hilo de escritura.
+        Si se indica al_terminar(resultado), se llama en el hilo de Tk al finalizar.
+        Retorna un Future con el resultado. Debe llamarse desde el hilo de Tk.
+        """
+        return self._encolar(self._tareas, funcion, args, kwargs, al_terminar)
+
+    def enviar_lectura(self, funcion, *args, al_terminar=None, **kwargs):
+        """
+        Igual que enviar() pero para operaciones que sólo leen: se ejecutan en el
+        pool de hilos de lectura, en paralelo con las escrituras.
+        """
+        cola = self._tareas_lectura if self._hilos_lectura else self._tareas
+        return self._encolar(cola, funcion, args, kwargs, al_terminar)
+
+    @contextmanager
+    def accion(self, nombre):
+        """
+        Cuenta como parte de la acción del usuario 'nombre' (por ejemplo
+        "Registrar movimiento") las operaciones enviadas dentro del bloque y las
+        que envíen después sus al_terminar, para medir cuántos viajes a la base
+        cuesta cada acción (ver reporte_acciones()).
+        """
+        self._acciones.setdefault(nombre, [0, 0])[0] += 1
+        anterior, self._accion = self._accion, nombre
+        try:
+            yield
+        finally:
+            self._accion = anterior
+
+    def _encolar(self, cola, funcion, args, kwargs, al_terminar):
+        futuro = Future()
+        self._pendientes += 1
+        if self._accion is not None:
+            self._acciones[self._accion][1] += 1
+        cola.put((funcion, args, kwargs, futuro, (al_terminar, self._accion), time.perf_counter()))
+        if self._sondeo is None and self.raiz is not None:
+            self._sondeo = self.raiz.after(self.INTERVALO_SONDEO_MS, self._sondear)
+        return futuro
+
+    def suscribir_catalogo(self, oyente):
+        """
+        Registra oyente(tipo_de_cambio) para los cambios de la caché del catálogo
+        ('categorias' o 'productos'). A diferencia de los oyentes de CatalogoCache,
+        se llama en el hilo de Tk, en el mismo sondeo que entrega los resultados.
+        """
+        self.db.catalogo.suscribir(lambda tipo: self._eventos.put((oyente, tipo)))
+
+    def suscribir_stock(self, oyente):
+        """
+        Registra oyente(cambios) para los registros de cambio de stock
+        [(producto_id, diferencia)] que publica DBManager en cada escritura.
+        Igual que suscribir_catalogo(), se llama en el hilo de Tk.
+        """
+        self.db.suscribir_stock(lambda cambios: self._eventos.put((oyente, cambios)))
+
+    def pendientes(self):
+        """Cantidad de operaciones enviadas cuyo resultado todavía no se entregó al hilo de Tk."""
+        return self._pendientes
+
+    def profundidad_cola(self):
+        """Cantidad de operaciones encoladas (escritura + lectura) que aún no empezaron a ejecutarse."""
+        return self._tareas.qsize() + self._tareas_lectura.qsize()
+
+    def estadisticas(self):
+        """
+        Retorna {operación: (llamadas, espera media ms, ejecución media ms, ejecución máxima ms)},
+        donde la espera es el tiempo en cola antes de ejecutarse.
+        """
+        with self._lock_metricas:
+            return {
+                nombre: (n, espera / n * 1000, ejecucion / n * 1000, maximo * 1000)
+                for nombre, (n, espera, ejecucion, maximo) in self._metricas.items()
+            }
+
+    def reporte_acciones(self):
+        """Texto con cuántas veces se hizo cada acción del usuario y cuántos viajes a la base costó."""
+        lineas = ["Viajes a la base por acción:"]
+        for nombre, (veces, viajes) in sorted(self._acciones.items()):
+            lineas.append(f"  {nombre}: {veces} veces, {viajes} viajes ({viajes / veces:.1f} por acción)")
+        return "\n".join(lineas)
+
+    def reporte(self):
+        """Texto con la profundidad de la cola, la latencia de cada operación y los viajes por acción."""
+        lineas = [f"Operaciones en cola: {self.profundidad_cola()}"]
+        for nombre, (n, espera, ejecucion, maximo) in sorted(self.estadisticas().items()):
+            lineas.append(
+                f"  {nombre}: {n} llamadas, espera {espera:.1f} ms, "
+                f"ejecución {ejecucion:.1f} ms (máx. {maximo:.1f} ms)"
+            )
+        if self._acciones:
+            lineas.append(self.reporte_acciones())
+        return "\n".join(lineas)
+
+    def cerrar(self):
+        """Termina las operaciones encoladas, detiene los hilos y cierra las conexiones."""
+        for _ in self._hilos_lectura:
+            self._tareas_lectura.put(None)
+        for hilo in self._hilos_lectura:
+            hilo.join()
+        self._tareas.put(None)
+        self._hilo.join()
+        print(self.reporte())
+
+    # --- Hilos trabajadores ---
+
+    def _bucle(self, cola):
+        while True:
+            tarea = cola.get()
+            if tarea is None:
+                break
+            # 'entrega' = (al_terminar, acción del usuario), se devuelve tal cual al hilo de Tk
+            funcion, args, kwargs, futuro, entrega, encolada = tarea
+            inicio = time.perf_counter()
+            try:
+                futuro.set_result(funcion(*args, **kwargs))
+            except Exception as e:
+                futuro.set_exception(e)
+            fin = time.perf_counter()
+            self._registrar(getattr(funcion, "__name__", repr(funcion)), inicio - encolada, fin - inicio)
+            self._resultados.put((futuro, entrega))
+
+        # El hilo de escritura es el último en terminar y cierra todas las conexiones.
+        db = getattr(self, "db", None)
+        if cola is self._tareas and db is not None:
+            db.cerrar()
+
+    def _registrar(self, nombre, espera, ejecucion):
+        with self._lock_metricas:
+            metrica = self._metricas.setdefault(nombre, [0, 0.0, 0.0, 0.0])
+            metrica[0] += 1
+            metrica[1] += espera
+            metrica[2] += ejecucion
+            metrica[3] = max(metrica[3], ejecucion)
+
+    # --- Regreso al hilo de Tk ---
+
+    def _sondear(self):
+        self._sondeo = None
+        # Los cambios se publican antes de que termine la escritura que los causó,
+        # así que se entregan antes que su resultado.
+        while not self._eventos.empty():
+            oyente, aviso = self._eventos.get_nowait()
+            oyente(aviso)
+        while not self._resultados.empty():
+            futuro, (al_terminar, accion) = self._resultados.get_nowait()
+            self._pendientes -= 1
+            if futuro.exception() is not None:
+                print(f"Error en operación de base de datos: {futuro.exception()}")
+            elif al_terminar is not None:
+                # Lo que envíe el callback se cuenta en la misma acción que lo originó
+                anterior, self._accion = self._accion, accion
+                try:
+                    al_terminar(futuro.result())
+                finally:
+                    self._accion = anterior
+        if self._pendientes > 0 and self._sondeo is None:
+            self._sondeo = self.raiz.after(self.INTERVALO_SONDEO_MS, self._sondear)
@@ -1,30 +1,727 @@
+import configparser
+import json
+import queue
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
 from sqlite3 import Error
 
+from catalogo import CatalogoCache
+from diagnostico import ConexionDiagnostico, Diagnostico
+from instrumentacion import medir_metodos
+from valoracion import EstadoValoracion
+
 # Nombre del archivo de la base de datos
 DB_FILE = 'inventario.db'
 
+# Archivo opcional con los ajustes de la conexión (sección [base_de_datos])
+CONFIG_FILE = 'config.ini'
+
+# Ajustes usados cuando el archivo de configuración no existe o no define una clave
+CONFIGURACION_POR_DEFECTO = {
+    "archivo": DB_FILE,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,          # negativo = KiB (≈20 MB por conexión)
+    "mmap_size": 268435456,        # 256 MB
+    "temp_store": "MEMORY",
+    "busy_timeout_ms": 5000,
+    "lectores": 3,                 # conexiones de sólo lectura del pool
+    "detalles_en_cache": 128,      # fichas de producto guardadas en memoria (LRU)
+    "cached_statements": 256,      # sentencias preparadas que sqlite3 guarda por conexión
+    "diagnostico": False,          # captura planes y tiempos de cada sentencia (ver diagnostico.py)
+    "umbral_lento_ms": 100,        # sentencias más lentas que esto van al registro de consultas lentas
+    "registro_lento": "consultas_lentas.log",
+}
+VALORES_PERMITIDOS = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+# Las fechas se guardan en ISO-8601 (aaaa-mm-dd), que ordena y se indexa como texto.
+# La interfaz sigue mostrando y pidiendo dd/mm/aaaa.
+FORMATO_FECHA_UI = "%d/%m/%Y"
+FECHA_MINIMA = "0000-01-01"
+FECHA_MAXIMA = "9999-12-31"
+
+TIPOS_MOVIMIENTO = ("Compra", "Venta")
+
+
+def _sql_acumular_resumenes(fila, signo):
+    """
+    Sentencias de trigger que suman (signo '+') o restan ('-') el movimiento
+    NEW / OLD en las tres tablas de resumen. Usado por la migración 8.
+    """
+    valores = f"""
+            {signo}CASE WHEN {fila}.tipo = 'Compra' THEN {fila}.cantidad ELSE 0 END,
+            {signo}CASE WHEN {fila}.tipo = 'Compra' THEN {fila}.cantidad * {fila}.precio ELSE 0 END,
+            {signo}CASE WHEN {fila}.tipo = 'Venta' THEN {fila}.cantidad ELSE 0 END,
+            {signo}CASE WHEN {fila}.tipo = 'Venta' THEN {fila}.cantidad * {fila}.precio ELSE 0 END"""
+    acumular = """
+            compras_cantidad = compras_cantidad + excluded.compras_cantidad,
+            compras_importe = compras_importe + excluded.compras_importe,
+            ventas_cantidad = ventas_cantidad + excluded.ventas_cantidad,
+            ventas_importe = ventas_importe + excluded.ventas_importe"""
+    return f"""
+            INSERT INTO resumen_diario VALUES ({fila}.fecha, {fila}.producto_id, {valores})
+            ON CONFLICT (fecha, producto_id) DO UPDATE SET {acumular};
+            INSERT INTO resumen_mensual_producto VALUES (substr({fila}.fecha, 1, 7), {fila}.producto_id, {valores})
+            ON CONFLICT (mes, producto_id) DO UPDATE SET {acumular};
+            INSERT INTO resumen_mensual_categoria VALUES (
+                substr({fila}.fecha, 1, 7),
+                IFNULL((SELECT categoria_id FROM productos WHERE id = {fila}.producto_id), 0),
+                {valores})
+            ON CONFLICT (mes, categoria_id) DO UPDATE SET {acumular};"""
+
+
+def _sql_mover_categoria(fila, signo):
+    """
+    Sentencia de trigger que suma o resta los totales mensuales del producto
+    NEW / OLD en su categoría. Usado por la migración 8.
+    """
+    return f"""
+            INSERT INTO resumen_mensual_categoria
+            SELECT mes, IFNULL({fila}.categoria_id, 0),
+                {signo}compras_cantidad, {signo}compras_importe, {signo}ventas_cantidad, {signo}ventas_importe
+            FROM resumen_mensual_producto
+            WHERE producto_id = {fila}.id
+            ON CONFLICT (mes, categoria_id) DO UPDATE SET
+                compras_cantidad = compras_cantidad + excluded.compras_cantidad,
+                compras_importe = compras_importe + excluded.compras_importe,
+                ventas_cantidad = ventas_cantidad + excluded.ventas_cantidad,
+                ventas_importe = ventas_importe + excluded.ventas_importe;"""
+
+
+# --- Migraciones del esquema ---
+# Cada entrada es (versión, descripción, script SQL). La versión aplicada se guarda en
+# PRAGMA user_version; para cambiar el esquema se agrega una entrada nueva al final,
+# nunca se edita una ya publicada.
+MIGRACIONES = [
+    (1, "Tabla 'stock' con saldo materializado por producto", """
+        -- Saldo materializado por producto. Los triggers lo mantienen al día en cada
+        -- escritura sobre 'movimientos', así el inventario no re-agrega el libro completo.
+        CREATE TABLE IF NOT EXISTS stock (
+            producto_id INTEGER PRIMARY KEY,
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
+        );
+
+        CREATE TRIGGER IF NOT EXISTS trg_productos_stock_insert
+        AFTER INSERT ON productos
+        BEGIN
+            INSERT OR IGNORE INTO stock (producto_id, cantidad) VALUES (NEW.id, 0);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_stock_insert
+        AFTER INSERT ON movimientos
+        BEGIN
+            UPDATE stock
+            SET cantidad = cantidad + CASE NEW.tipo WHEN 'Compra' THEN NEW.cantidad ELSE -NEW.cantidad END
+            WHERE producto_id = NEW.producto_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_stock_delete
+        AFTER DELETE ON movimientos
+        BEGIN
+            UPDATE stock
+            SET cantidad = cantidad - CASE OLD.tipo WHEN 'Compra' THEN OLD.cantidad ELSE -OLD.cantidad END
+            WHERE producto_id = OLD.producto_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_stock_update
+        AFTER UPDATE OF producto_id, tipo, cantidad ON movimientos
+        BEGIN
+            UPDATE stock
+            SET cantidad = cantidad - CASE OLD.tipo WHEN 'Compra' THEN OLD.cantidad ELSE -OLD.cantidad END
+            WHERE producto_id = OLD.producto_id;
+            UPDATE stock
+            SET cantidad = cantidad + CASE NEW.tipo WHEN 'Compra' THEN NEW.cantidad ELSE -NEW.cantidad END
+            WHERE producto_id = NEW.producto_id;
+        END;
+
+        -- Carga inicial de saldos desde el libro para las bases existentes.
+        INSERT OR IGNORE INTO stock (producto_id, cantidad)
+        SELECT
+            p.id,
+            COALESCE(SUM(CASE WHEN m.tipo = 'Compra' THEN m.cantidad ELSE -m.cantidad END), 0)
+        FROM productos p
+        LEFT JOIN movimientos m ON m.producto_id = p.id
+        GROUP BY p.id;
+    """),
+    (2, "Índices secundarios sobre 'movimientos' y 'productos'", """
+        CREATE INDEX IF NOT EXISTS idx_movimientos_producto ON movimientos (producto_id);
+        CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos (fecha);
+        CREATE INDEX IF NOT EXISTS idx_productos_nombre ON productos (nombre);
+        CREATE INDEX IF NOT EXISTS idx_productos_categoria ON productos (categoria_id);
+    """),
+    (3, "Fechas de movimientos en formato ISO (aaaa-mm-dd)", """
+        -- dd/mm/aaaa (con o sin ceros a la izquierda) -> aaaa-mm-dd
+        UPDATE movimientos
+        SET fecha = (
+            SELECT printf(
+                '%04d-%02d-%02d',
+                CAST(substr(resto, instr(resto, '/') + 1) AS INTEGER),
+                CAST(substr(resto, 1, instr(resto, '/') - 1) AS INTEGER),
+                CAST(dia AS INTEGER)
+            )
+            FROM (
+                SELECT
+                    substr(movimientos.fecha, 1, instr(movimientos.fecha, '/') - 1) AS dia,
+                    substr(movimientos.fecha, instr(movimientos.fecha, '/') + 1) AS resto
+            )
+        )
+        WHERE fecha LIKE '%/%/%';
+
+        -- El índice compuesto cubre tanto la búsqueda por producto como el rango de fechas.
+        DROP INDEX IF EXISTS idx_movimientos_producto;
+        CREATE INDEX IF NOT EXISTS idx_movimientos_producto_fecha ON movimientos (producto_id, fecha);
+    """),
+    (4, "Índice de stock para filtrar y ordenar el inventario por saldo", """
+        CREATE INDEX IF NOT EXISTS idx_stock_cantidad ON stock (cantidad, producto_id);
+    """),
+    (5, "Índices de texto completo (FTS5) para productos y categorías", """
+        -- unicode61 con remove_diacritics ignora mayúsculas y acentos ("Paracetamól" = "paracetamol");
+        -- los índices de prefijo hacen rápidas las búsquedas mientras se escribe.
+        CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+            codigo, nombre, categoria, laboratorio,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '1 2 3'
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS categorias_fts USING fts5(
+            nombre,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '1 2 3'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS trg_productos_fts_insert
+        AFTER INSERT ON productos
+        BEGIN
+            INSERT INTO productos_fts (rowid, codigo, nombre, categoria, laboratorio)
+            VALUES (NEW.id, NEW.codigo, NEW.nombre,
+                    (SELECT nombre FROM categorias WHERE id = NEW.categoria_id), NEW.laboratorio);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_productos_fts_delete
+        AFTER DELETE ON productos
+        BEGIN
+            DELETE FROM productos_fts WHERE rowid = OLD.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_productos_fts_update
+        AFTER UPDATE ON productos
+        BEGIN
+            DELETE FROM productos_fts WHERE rowid = OLD.id;
+            INSERT INTO productos_fts (rowid, codigo, nombre, categoria, laboratorio)
+            VALUES (NEW.id, NEW.codigo, NEW.nombre,
+                    (SELECT nombre FROM categorias WHERE id = NEW.categoria_id), NEW.laboratorio);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_categorias_fts_insert
+        AFTER INSERT ON categorias
+        BEGIN
+            INSERT INTO categorias_fts (rowid, nombre) VALUES (NEW.id, NEW.nombre);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_categorias_fts_delete
+        AFTER DELETE ON categorias
+        BEGIN
+            DELETE FROM categorias_fts WHERE rowid = OLD.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_categorias_fts_update
+        AFTER UPDATE OF nombre ON categorias
+        BEGIN
+            UPDATE categorias_fts SET nombre = NEW.nombre WHERE rowid = NEW.id;
+            UPDATE productos_fts SET categoria = NEW.nombre
+            WHERE rowid IN (SELECT id FROM productos WHERE categoria_id = NEW.id);
+        END;
+
+        INSERT INTO productos_fts (rowid, codigo, nombre, categoria, laboratorio)
+        SELECT p.id, p.codigo, p.nombre, c.nombre, p.laboratorio
+        FROM productos p
+        LEFT JOIN categorias c ON c.id = p.categoria_id;
+        INSERT INTO categorias_fts (rowid, nombre) SELECT id, nombre FROM categorias;
+    """),
+    (6, "Cierres de stock (saldos por producto a una fecha)", """
+        -- Un cierre guarda el saldo de cada producto con todos los movimientos hasta
+        -- su fecha inclusive. El stock histórico se calcula como el último cierre
+        -- anterior más los movimientos posteriores, sin recorrer el libro completo.
+        CREATE TABLE IF NOT EXISTS cierres (
+            fecha TEXT PRIMARY KEY,
+            creado_en TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS cierres_stock (
+            producto_id INTEGER NOT NULL,
+            fecha TEXT NOT NULL,
+            cantidad INTEGER NOT NULL,
+            PRIMARY KEY (producto_id, fecha),
+            FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE,
+            FOREIGN KEY (fecha) REFERENCES cierres (fecha) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_cierres_stock_fecha ON cierres_stock (fecha, producto_id);
+
+        -- Un movimiento con fecha anterior o igual a un cierre (carga atrasada o corrección)
+        -- ajusta el saldo de ese producto en todos los cierres afectados.
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_cierres_insert
+        AFTER INSERT ON movimientos
+        WHEN NEW.fecha <= (SELECT MAX(fecha) FROM cierres)
+        BEGIN
+            INSERT INTO cierres_stock (producto_id, fecha, cantidad)
+            SELECT NEW.producto_id, fecha, CASE NEW.tipo WHEN 'Compra' THEN NEW.cantidad ELSE -NEW.cantidad END
+            FROM cierres WHERE fecha >= NEW.fecha
+            ON CONFLICT (producto_id, fecha) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_cierres_delete
+        AFTER DELETE ON movimientos
+        WHEN OLD.fecha <= (SELECT MAX(fecha) FROM cierres)
+        BEGIN
+            INSERT INTO cierres_stock (producto_id, fecha, cantidad)
+            SELECT OLD.producto_id, fecha, CASE OLD.tipo WHEN 'Compra' THEN -OLD.cantidad ELSE OLD.cantidad END
+            FROM cierres WHERE fecha >= OLD.fecha
+            ON CONFLICT (producto_id, fecha) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_cierres_update
+        AFTER UPDATE OF producto_id, fecha, tipo, cantidad ON movimientos
+        WHEN MIN(OLD.fecha, NEW.fecha) <= (SELECT MAX(fecha) FROM cierres)
+        BEGIN
+            INSERT INTO cierres_stock (producto_id, fecha, cantidad)
+            SELECT OLD.producto_id, fecha, CASE OLD.tipo WHEN 'Compra' THEN -OLD.cantidad ELSE OLD.cantidad END
+            FROM cierres WHERE fecha >= OLD.fecha
+            ON CONFLICT (producto_id, fecha) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+            INSERT INTO cierres_stock (producto_id, fecha, cantidad)
+            SELECT NEW.producto_id, fecha, CASE NEW.tipo WHEN 'Compra' THEN NEW.cantidad ELSE -NEW.cantidad END
+            FROM cierres WHERE fecha >= NEW.fecha
+            ON CONFLICT (producto_id, fecha) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+        END;
+    """),
+    (7, "Caché de valoración de inventario (costo promedio y FIFO)", """
+        -- Estado del costeo de cada producto por método, hasta el movimiento
+        -- (ultima_fecha, ultimo_id). Al refrescar sólo se procesan los movimientos
+        -- posteriores; 'capas' guarda las capas FIFO pendientes en JSON.
+        CREATE TABLE IF NOT EXISTS valoracion (
+            producto_id INTEGER NOT NULL,
+            metodo TEXT NOT NULL,
+            ultima_fecha TEXT NOT NULL,
+            ultimo_id INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            valor REAL NOT NULL,
+            costo_ventas REAL NOT NULL,
+            ingresos REAL NOT NULL,
+            ultimo_costo REAL NOT NULL,
+            faltante INTEGER NOT NULL,
+            capas TEXT,
+            PRIMARY KEY (producto_id, metodo),
+            FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+
+        -- Un movimiento que cae antes de lo ya procesado (o que cambia o se borra)
+        -- descarta el estado del producto, que se recalcula desde el principio.
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_valoracion_insert
+        AFTER INSERT ON movimientos
+        BEGIN
+            DELETE FROM valoracion
+            WHERE producto_id = NEW.producto_id AND (ultima_fecha, ultimo_id) > (NEW.fecha, NEW.id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_valoracion_delete
+        AFTER DELETE ON movimientos
+        BEGIN
+            DELETE FROM valoracion
+            WHERE producto_id = OLD.producto_id AND (ultima_fecha, ultimo_id) >= (OLD.fecha, OLD.id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_valoracion_update
+        AFTER UPDATE OF producto_id, fecha, tipo, precio, cantidad ON movimientos
+        BEGIN
+            DELETE FROM valoracion
+            WHERE producto_id = OLD.producto_id AND (ultima_fecha, ultimo_id) >= (OLD.fecha, OLD.id);
+            DELETE FROM valoracion
+            WHERE producto_id = NEW.producto_id AND (ultima_fecha, ultimo_id) >= (NEW.fecha, NEW.id);
+        END;
+    """),
+    (8, "Tablas de resumen de compras y ventas (diario y mensual)", """
+        -- Totales pre-agregados para el tablero de ventas: por día y producto, por mes
+        -- y producto, y por mes y categoría ('mes' = aaaa-mm; categoría 0 = sin categoría).
+        -- Los triggers los mantienen en cada escritura sobre 'movimientos'.
+        CREATE TABLE IF NOT EXISTS resumen_diario (
+            fecha TEXT NOT NULL,
+            producto_id INTEGER NOT NULL,
+            compras_cantidad INTEGER NOT NULL DEFAULT 0,
+            compras_importe REAL NOT NULL DEFAULT 0,
+            ventas_cantidad INTEGER NOT NULL DEFAULT 0,
+            ventas_importe REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (fecha, producto_id),
+            FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS resumen_mensual_producto (
+            mes TEXT NOT NULL,
+            producto_id INTEGER NOT NULL,
+            compras_cantidad INTEGER NOT NULL DEFAULT 0,
+            compras_importe REAL NOT NULL DEFAULT 0,
+            ventas_cantidad INTEGER NOT NULL DEFAULT 0,
+            ventas_importe REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, producto_id),
+            FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS resumen_mensual_categoria (
+            mes TEXT NOT NULL,
+            categoria_id INTEGER NOT NULL,
+            compras_cantidad INTEGER NOT NULL DEFAULT 0,
+            compras_importe REAL NOT NULL DEFAULT 0,
+            ventas_cantidad INTEGER NOT NULL DEFAULT 0,
+            ventas_importe REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, categoria_id)
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_resumen_insert
+        AFTER INSERT ON movimientos
+        BEGIN
+            {sumar_nuevo}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_resumen_delete
+        AFTER DELETE ON movimientos
+        BEGIN
+            {restar_viejo}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_movimientos_resumen_update
+        AFTER UPDATE OF producto_id, fecha, tipo, precio, cantidad ON movimientos
+        BEGIN
+            {restar_viejo}
+            {sumar_nuevo}
+        END;
+
+        -- Si un producto cambia de categoría, sus totales mensuales pasan a la nueva.
+        CREATE TRIGGER IF NOT EXISTS trg_productos_resumen_categoria
+        AFTER UPDATE OF categoria_id ON productos
+        WHEN OLD.categoria_id IS NOT NEW.categoria_id
+        BEGIN
+            {mover_categoria_vieja}
+            {mover_categoria_nueva}
+        END;
+
+        -- Carga inicial desde el libro para las bases existentes.
+        INSERT INTO resumen_diario
+        SELECT m.fecha, m.producto_id, {columnas_agregadas}
+        FROM movimientos m
+        GROUP BY m.fecha, m.producto_id;
+        INSERT INTO resumen_mensual_producto
+        SELECT substr(fecha, 1, 7), producto_id,
+            SUM(compras_cantidad), SUM(compras_importe), SUM(ventas_cantidad), SUM(ventas_importe)
+        FROM resumen_diario
+        GROUP BY substr(fecha, 1, 7), producto_id;
+        INSERT INTO resumen_mensual_categoria
+        SELECT r.mes, IFNULL(p.categoria_id, 0),
+            SUM(r.compras_cantidad), SUM(r.compras_importe), SUM(r.ventas_cantidad), SUM(r.ventas_importe)
+        FROM resumen_mensual_producto r
+        INNER JOIN productos p ON p.id = r.producto_id
+        GROUP BY r.mes, IFNULL(p.categoria_id, 0);
+    """.format(
+        sumar_nuevo=_sql_acumular_resumenes("NEW", "+"),
+        restar_viejo=_sql_acumular_resumenes("OLD", "-"),
+        mover_categoria_vieja=_sql_mover_categoria("OLD", "-"),
+        mover_categoria_nueva=_sql_mover_categoria("NEW", "+"),
+        columnas_agregadas="""
+            SUM(CASE WHEN m.tipo = 'Compra' THEN m.cantidad ELSE 0 END),
+            SUM(CASE WHEN m.tipo = 'Compra' THEN m.cantidad * m.precio ELSE 0 END),
+            SUM(CASE WHEN m.tipo = 'Venta' THEN m.cantidad ELSE 0 END),
+            SUM(CASE WHEN m.tipo = 'Venta' THEN m.cantidad * m.precio ELSE 0 END)""",
+    )),
+    (9, "Índice del resumen mensual por producto para el detalle de producto", """
+        -- Cubre el total vendido de un producto sin recorrer sus movimientos.
+        CREATE INDEX IF NOT EXISTS idx_resumen_mensual_producto_producto
+            ON resumen_mensual_producto (producto_id, ventas_cantidad);
+    """),
+]
+
+# Claves de orden permitidas para consultar_inventario: (expresión SQL, posición en la fila).
+# La posición se usa para leer la clave de la fila que delimita la página (keyset).
+ORDENES_INVENTARIO = {
+    "nombre": ("p.nombre", 2),
+    "codigo": ("p.codigo", 1),
+    "stock": ("COALESCE(s.cantidad, 0)", 5),
+}
+
+# Sentencias con nombre que comparten las operaciones simples y las compuestas.
+# Como el texto es siempre el mismo, sqlite3 reutiliza la sentencia ya preparada
+# de su caché por conexión (ver 'cached_statements') en lugar de compilarla de nuevo.
+CONSULTAS = {
+    "insertar_movimiento": """
+        INSERT INTO movimientos (producto_id, fecha, tipo, precio, cantidad, observaciones)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "insertar_producto": "INSERT INTO productos (codigo, nombre, categoria_id, laboratorio) VALUES (?, ?, ?, ?)",
+    "id_categoria": "SELECT id FROM categorias WHERE nombre = ?",
+    "stock_producto": "SELECT COALESCE((SELECT cantidad FROM stock WHERE producto_id = ?), 0)",
+    # Los ids llegan como un arreglo JSON: el texto no cambia con la cantidad de ids
+    "filas_inventario": """
+        SELECT
+            p.id,
+            p.codigo,
+            p.nombre,
+            c.nombre as categoria,
+            p.laboratorio,
+            COALESCE(s.cantidad, 0) AS stock_actual,
+            COALESCE(v.valor, 0) AS valor,
+            COALESCE(v.costo_ventas, 0) AS costo_ventas
+        FROM productos p
+        INNER JOIN categorias c ON p.categoria_id = c.id
+        LEFT JOIN stock s ON s.producto_id = p.id
+        LEFT JOIN valoracion v ON v.producto_id = p.id AND v.metodo = ?
+        WHERE p.id IN (SELECT value FROM json_each(?))
+    """,
+}
+
+
+def cargar_configuracion(ruta=CONFIG_FILE):
+    """
+    Lee los ajustes de la conexión desde la sección [base_de_datos] del archivo
+    indicado. Las claves ausentes o con valores inválidos toman el valor por defecto.
+    """
+    config = dict(CONFIGURACION_POR_DEFECTO)
+    parser = configparser.ConfigParser(inline_comment_prefixes=(";", "#"))
+    if not parser.read(ruta, encoding="utf-8") or not parser.has_section("base_de_datos"):
+        return config
+
+    seccion = parser["base_de_datos"]
+    for clave, por_defecto in CONFIGURACION_POR_DEFECTO.items():
+        if clave not in seccion:
+            continue
+        valor = seccion[clave].strip()
+        try:
+            if isinstance(por_defecto, bool):
+                valor = seccion.getboolean(clave)
+            elif isinstance(por_defecto, int):
+                valor = int(valor)
+            elif clave in VALORES_PERMITIDOS:
+                valor = valor.upper()
+                if valor not in VALORES_PERMITIDOS[clave]:
+                    raise ValueError(f"debe ser uno de {sorted(VALORES_PERMITIDOS[clave])}")
+        except ValueError as e:
+            print(f"Valor inválido para '{clave}' en {ruta} ({e}); se usa {por_defecto}.")
+            continue
+        config[clave] = valor
+    return config
+
+
+def consulta_fts(texto):
+    """
+    Convierte el texto escrito por el usuario en una consulta FTS5 donde cada
+    palabra es un prefijo obligatorio ("para 500" -> "para"* "500"*).
+    Retorna None si el texto no tiene palabras buscables.
+    """
+    palabras = re.findall(r"\w+", texto)
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+
+def fecha_a_iso(fecha_ui):
+    """Convierte una fecha dd/mm/aaaa a aaaa-mm-dd. Lanza ValueError si no es válida."""
+    return datetime.strptime(fecha_ui, FORMATO_FECHA_UI).date().isoformat()
+
+
+def fecha_desde_iso(fecha_iso):
+    """Convierte una fecha aaaa-mm-dd guardada en la base al formato dd/mm/aaaa."""
+    return date.fromisoformat(fecha_iso).strftime(FORMATO_FECHA_UI)
+
+
+def validar_movimiento(fecha, tipo, precio, cantidad):
+    """
+    Valida los datos de un movimiento con las mismas reglas que el formulario de
+    Movimientos y los retorna normalizados como (fecha_iso, tipo, precio, cantidad).
+    Lanza ValueError con el motivo si algún dato no es válido.
+    """
+    precio = str(precio).strip()
+    cantidad = str(cantidad).strip()
+    if not all([fecha, tipo, precio, cantidad]):
+        raise ValueError("Faltan datos: fecha, tipo, precio y cantidad son obligatorios.")
+    try:
+        fecha_iso = fecha_a_iso(fecha.strip())
+    except ValueError:
+        raise ValueError("El formato de la fecha debe ser dd/mm/aaaa.")
+    if tipo not in TIPOS_MOVIMIENTO:
+        raise ValueError("El tipo de movimiento debe ser 'Compra' o 'Venta'.")
+    try:
+        precio = float(precio)
+        cantidad = int(cantidad)
+        if precio <= 0 or cantidad <= 0:
+            raise ValueError("Los valores deben ser positivos.")
+    except ValueError:
+        raise ValueError("Precio y Cantidad deben ser números positivos válidos.")
+    return fecha_iso, tipo, precio, cantidad
+
+
+def diferencia_stock(tipo, cantidad):
+    """Cuánto cambia el stock un movimiento (igual que el trigger trg_movimientos_stock_insert)."""
+    return cantidad if tipo == "Compra" else -cantidad
+
+
+@medir_metodos("db")
 class DBManager:
-    """Clase para manejar las operaciones de la base de datos SQLite."""
+    """
+    Clase para manejar las operaciones de la base de datos SQLite.
+    Usa una única conexión de escritura (self.conn) y un pool de conexiones de
+    sólo lectura, de modo que las consultas no esperan a las escrituras en modo WAL.
+    Cada método público se mide con instrumentacion.medir() (ver "db.<método>").
+    """
 
-    def __init__(self):
+    def __init__(self, config=None):
         """Inicializa la conexión y se asegura de que las tablas existan."""
+        self.config = config or cargar_configuracion()
+        self._lectores = queue.Queue()
+        self.total_lectores = 0
+        # Caché LRU de fichas de producto: producto_id -> (ultimos, detalle).
+        # La versión sube con cada escritura que invalida fichas.
+        self._detalles = OrderedDict()
+        self._lock_detalles = threading.Lock()
+        self._version_detalles = 0
+        # Categorías y productos en memoria, actualizados en cada escritura
+        self.catalogo = CatalogoCache()
+        # Oyentes de los registros de cambio de stock [(producto_id, diferencia)] (ver suscribir_stock)
+        self._oyentes_stock = []
+        # En modo diagnóstico las conexiones registran el plan y el tiempo de cada sentencia
+        self.diagnostico = None
+        if self.config.get("diagnostico"):
+            self.diagnostico = Diagnostico(self.config["umbral_lento_ms"], self.config["registro_lento"])
         self.conn = self._create_connection()
         if self.conn:
             self._create_tables()
+            self._cargar_catalogo()
+            self._crear_lectores()
+            self._reportar_configuracion()
 
     def _create_connection(self):
-        """Crea una conexión a la base de datos SQLite especificada por DB_FILE."""
+        """Crea la conexión de escritura a la base de datos SQLite indicada en la configuración."""
         conn = None
         try:
-            conn = sqlite3.connect(DB_FILE, check_same_thread=False) 
+            conn = sqlite3.connect(
+                self.config["archivo"], check_same_thread=False, timeout=self.config["busy_timeout_ms"] / 1000,
+                factory=self._fabrica_conexion(), cached_statements=self.config["cached_statements"]
+            ) 
+            if self.diagnostico is not None:
+                conn.diagnostico = self.diagnostico
             conn.execute("PRAGMA foreign_keys = ON;")
+            conn.execute(f"PRAGMA journal_mode = {self.config['journal_mode']};")
+            conn.execute(f"PRAGMA synchronous = {self.config['synchronous']};")
+            self._aplicar_pragmas(conn)
             print("Conexión a la base de datos SQLite exitosa.")
             return conn
         except Error as e:
             print(f"Error al conectar a la base de datos: {e}")
             return conn
 
+    def _fabrica_conexion(self):
+        """Clase de conexión a usar: la de diagnóstico sólo si está activado en la configuración."""
+        return ConexionDiagnostico if self.diagnostico is not None else sqlite3.Connection
+
+    def _aplicar_pragmas(self, conn):
+        """Ajustes de caché, mmap, temporales y espera por bloqueo comunes a todas las conexiones."""
+        conn.execute(f"PRAGMA cache_size = {int(self.config['cache_size'])};")
+        conn.execute(f"PRAGMA mmap_size = {int(self.config['mmap_size'])};")
+        conn.execute(f"PRAGMA temp_store = {self.config['temp_store']};")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.config['busy_timeout_ms'])};")
+
+    def _crear_lectores(self):
+        """Abre el pool de conexiones de sólo lectura (no aplica a bases en memoria)."""
+        if self.config["archivo"] == ":memory:":
+            return
+        uri = Path(self.config["archivo"]).resolve().as_uri() + "?mode=ro"
+        try:
+            for _ in range(self.config["lectores"]):
+                lector = sqlite3.connect(
+                    uri, uri=True, check_same_thread=False, timeout=self.config["busy_timeout_ms"] / 1000,
+                    factory=self._fabrica_conexion(), cached_statements=self.config["cached_statements"]
+                )
+                if self.diagnostico is not None:
+                    lector.diagnostico = self.diagnostico
+                self._aplicar_pragmas(lector)
+                lector.execute("PRAGMA query_only = ON;")
+                self._lectores.put(lector)
+                self.total_lectores += 1
+        except Error as e:
+            print(f"Error al abrir las conexiones de lectura: {e}")
+
+    @contextmanager
+    def _conexion_lectura(self):
+        """
+        Presta una conexión de sólo lectura del pool (espera si todas están en uso).
+        Sin pool disponible se usa la conexión de escritura.
+        """
+        if self.total_lectores == 0:
+            yield self.conn
+            return
+        conn = self._lectores.get()
+        try:
+            yield conn
+        finally:
+            self._lectores.put(conn)
+
+    def _cargar_catalogo(self):
+        """Llena la caché del catálogo con las categorías y productos de la base."""
+        try:
+            categorias = self.conn.execute("SELECT id, nombre FROM categorias").fetchall()
+            productos = self.conn.execute("SELECT id, codigo, nombre FROM productos").fetchall()
+        except Error as e:
+            print(f"Error al cargar el catálogo en memoria: {e}")
+            return
+        self.catalogo.cargar(categorias, productos)
+
+    def _sincronizar_productos(self, productos):
+        """
+        Pasa a la caché del catálogo los productos (codigo, nombre) recién guardados.
+        Los códigos que la caché aún no conoce se resuelven en la base.
+        """
+        filas = []
+        for codigo, nombre in productos:
+            producto_id = self.catalogo.id_por_codigo(codigo)
+            if producto_id is None:
+                fila = self.conn.execute("SELECT id FROM productos WHERE codigo = ?", (codigo,)).fetchone()
+                if fila is None:
+                    continue
+                producto_id = fila[0]
+            filas.append((producto_id, codigo, nombre))
+        self.catalogo.guardar_productos(filas)
+
+    def suscribir_stock(self, oyente):
+        """
+        Registra oyente(cambios), que recibe después de cada escritura confirmada
+        la lista de registros de cambio [(producto_id, diferencia de stock)].
+        Un producto nuevo se publica con diferencia 0. Se llama en el hilo que escribió.
+        """
+        self._oyentes_stock.append(oyente)
+
+    def _publicar_stock(self, cambios):
+        for oyente in list(self._oyentes_stock):
+            try:
+                oyente(cambios)
+            except Exception as e:
+                print(f"Error al notificar un cambio de stock: {e}")
+
+    def _reportar_configuracion(self):
+        """Muestra los ajustes efectivos de la conexión al iniciar."""
+        try:
+            ajustes = {
+                pragma: self.conn.execute(f"PRAGMA {pragma}").fetchone()
+                for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
+            }
+            # En una base en memoria 'mmap_size' no devuelve fila
+            ajustes = {pragma: fila[0] if fila else "-" for pragma, fila in ajustes.items()}
+        except Error as e:
+            print(f"Error al leer la configuración de la conexión: {e}")
+            return
+        resumen = ", ".join(f"{pragma}={valor}" for pragma, valor in ajustes.items())
+        print(f"Base de datos '{self.config['archivo']}': {resumen}, lectores={self.total_lectores}.")
+
     def _create_tables(self):
         """Crea las tablas 'categorias', 'productos' y 'movimientos' si aún no existen."""
         create_categorias_table = """
@@ -64,31 +761,50 @@ class DBManager:
             print("Tablas 'categorias', 'productos' y 'movimientos' verificadas/creadas exitosamente.")
         except Error as e:
             print(f"Error al crear las tablas: {e}")
+            return
+
+        self._aplicar_migraciones()
+
+    def _aplicar_migraciones(self):
+        """
+        Lleva el esquema a la última versión aplicando, en orden, las migraciones
+        de MIGRACIONES cuya versión sea mayor que PRAGMA user_version.
+        Cada migración corre en su propia transacción junto con el cambio de versión.
+        """
+        try:
+            version_actual = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        except Error as e:
+            print(f"Error al leer la versión del esquema: {e}")
+            return
+
+        pendientes = [m for m in MIGRACIONES if m[0] > version_actual]
+        if not pendientes:
+            print(f"Esquema de la base de datos actualizado (versión {version_actual}).")
+            return
+
+        for version, descripcion, script in pendientes:
+            inicio = time.perf_counter()
+            try:
+                self.conn.executescript(
+                    f"BEGIN;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;"
+                )
+            except Error as e:
+                if self.conn.in_transaction:
+                    self.conn.rollback()
+                print(f"Error en la migración {version} ({descripcion}): {e}")
+                return
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            print(f"Migración {version} aplicada: {descripcion} ({duracion_ms:.1f} ms).")
 
     # --- Operaciones de Utilidad General ---
     
     def obtener_productos_combo(self):
-        """Recupera el ID y el Nombre de todos los productos para usar en ComboBox."""
-        sql = "SELECT id, nombre FROM productos ORDER BY nombre ASC"
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql)
-            return cursor.fetchall()
-        except Error as e:
-            print(f"Error al obtener productos para combo: {e}")
-            return []
+        """Recupera el ID y el Nombre de todos los productos para usar en ComboBox (desde la caché)."""
+        return self.catalogo.productos_combo()
 
     def obtener_id_producto_por_nombre(self, nombre):
-        """Busca el ID de un producto a partir de su nombre."""
-        sql = "SELECT id FROM productos WHERE nombre = ?"
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, (nombre,))
-            resultado = cursor.fetchone()
-            return resultado[0] if resultado else None
-        except Error as e:
-            print(f"Error al obtener ID de producto: {e}")
-            return None
+        """Busca el ID de un producto a partir de su nombre (desde la caché)."""
+        return self.catalogo.id_producto(nombre)
 
     def obtener_producto_por_id(self, producto_id):
         """Recupera todos los datos de un producto por su ID."""
@@ -103,13 +819,100 @@ class DBManager:
         WHERE p.id = ?
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, (producto_id,))
-            return cursor.fetchone()
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (producto_id,))
+                return cursor.fetchone()
         except Error as e:
             print(f"Error al obtener producto por ID: {e}")
             return None
 
+    def obtener_detalle_producto(self, producto_id, ultimos=10):
+        """
+        Ficha de un producto para la vista de detalle, en una sola consulta: datos
+        del catálogo, stock actual, último precio de compra, total vendido y sus
+        'ultimos' movimientos (del más reciente al más antiguo).
+        Las fichas se guardan en una caché LRU que se invalida con las escrituras.
+        Retorna un diccionario, o None si el producto no existe.
+        """
+        with self._lock_detalles:
+            guardado = self._detalles.get(producto_id)
+            if guardado is not None and guardado[0] == ultimos:
+                self._detalles.move_to_end(producto_id)
+                return guardado[1]
+            version = self._version_detalles
+
+        # El stock sale de la tabla materializada, el total vendido del resumen mensual
+        # (idx_resumen_mensual_producto_producto) y los movimientos de idx_movimientos_producto_fecha.
+        sql = """
+        WITH ultimos AS (
+            SELECT id, fecha, tipo, precio, cantidad, observaciones
+            FROM movimientos
+            WHERE producto_id = :id
+            ORDER BY fecha DESC, id DESC
+            LIMIT :ultimos
+        )
+        SELECT
+            p.codigo,
+            p.nombre,
+            c.nombre AS categoria,
+            p.laboratorio,
+            COALESCE(s.cantidad, 0) AS stock_actual,
+            (SELECT precio FROM movimientos
+             WHERE producto_id = :id AND tipo = 'Compra'
+             ORDER BY fecha DESC, id DESC LIMIT 1) AS ultimo_precio_compra,
+            (SELECT COALESCE(SUM(ventas_cantidad), 0) FROM resumen_mensual_producto
+             WHERE producto_id = :id) AS total_vendido,
+            u.fecha, u.tipo, u.precio, u.cantidad, u.observaciones
+        FROM productos p
+        LEFT JOIN categorias c ON c.id = p.categoria_id
+        LEFT JOIN stock s ON s.producto_id = p.id
+        LEFT JOIN ultimos u
+        WHERE p.id = :id
+        ORDER BY u.fecha DESC, u.id DESC
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, {"id": producto_id, "ultimos": ultimos})
+                filas = cursor.fetchall()
+        except Error as e:
+            print(f"Error al obtener el detalle del producto: {e}")
+            return None
+        if not filas:
+            return None
+
+        codigo, nombre, categoria, laboratorio, stock, ultimo_precio, total_vendido = filas[0][:7]
+        detalle = {
+            "codigo": codigo,
+            "nombre": nombre,
+            "categoria": categoria,
+            "laboratorio": laboratorio,
+            "stock_actual": stock,
+            "ultimo_precio_compra": ultimo_precio,
+            "total_vendido": total_vendido,
+            # (fecha ISO, tipo, precio, cantidad, observaciones)
+            "movimientos": [fila[7:] for fila in filas if fila[7] is not None],
+        }
+        with self._lock_detalles:
+            # Si hubo una escritura mientras se consultaba, la ficha puede estar vieja
+            if version == self._version_detalles:
+                self._detalles[producto_id] = (ultimos, detalle)
+                self._detalles.move_to_end(producto_id)
+                while len(self._detalles) > self.config["detalles_en_cache"]:
+                    self._detalles.popitem(last=False)
+        return detalle
+
+    def _invalidar_detalles(self, productos=None):
+        """Descarta de la caché las fichas de los productos indicados (todas si es None)."""
+        with self._lock_detalles:
+            self._version_detalles += 1
+            if productos is None:
+                self._detalles.clear()
+            else:
+                for producto_id in productos:
+                    self._detalles.pop(producto_id, None)
+
     def eliminar_producto_completo(self, producto_id):
         """
         Elimina el producto y todos sus movimientos asociados (CASCADE LIKE).
@@ -125,6 +928,8 @@ class DBManager:
             self.conn.execute("DELETE FROM productos WHERE id = ?", (producto_id,))
             
             self.conn.commit()
+            self._invalidar_detalles([producto_id])
+            self.catalogo.quitar_producto(producto_id)
             return True
         except Error as e:
             self.conn.rollback()
@@ -135,8 +940,9 @@ class DBManager:
     
     def obtener_datos_inventario(self):
         """
-        Consulta todos los productos y calcula su stock actual 
-        basándose en los movimientos (compras suman, ventas restan).
+        Consulta todos los productos con su stock actual.
+        El stock se lee de la tabla 'stock', que se mantiene al día con cada
+        movimiento, por lo que el costo es O(productos) y no O(movimientos).
         """
         sql = """
         SELECT
@@ -145,28 +951,596 @@ class DBManager:
             p.nombre,
             c.nombre as categoria,
             p.laboratorio,
-            COALESCE(SUM(
-                CASE 
-                    WHEN m.tipo = 'Compra' THEN m.cantidad 
-                    WHEN m.tipo = 'Venta' THEN -m.cantidad
-                    ELSE 0 
-                END
-            ), 0) AS stock_actual
+            COALESCE(s.cantidad, 0) AS stock_actual
         FROM productos p
         INNER JOIN categorias c ON p.categoria_id = c.id
-        LEFT JOIN movimientos m ON p.id = m.producto_id
-        GROUP BY p.id, p.codigo, p.nombre, c.nombre, p.laboratorio
+        LEFT JOIN stock s ON s.producto_id = p.id
         ORDER BY p.nombre ASC;
         """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                # Retorna una lista de tuplas con (id, codigo, nombre, categoria, laboratorio, stock_actual)
+                return cursor.fetchall()
+        except Error as e:
+            print(f"Error al obtener datos de inventario: {e}")
+            return []
+
+    def _filtros_inventario(self, texto, alerta, stock_minimo):
+        """
+        Arma la cláusula WHERE (y sus parámetros) para el texto de búsqueda sobre
+        código, nombre, categoría y laboratorio (índice FTS) y para el filtro de alerta de stock.
+        """
+        condiciones = []
+        params = []
+        consulta = consulta_fts(texto) if texto else None
+        if consulta:
+            condiciones.append("p.id IN (SELECT rowid FROM productos_fts WHERE productos_fts MATCH ?)")
+            params.append(consulta)
+        if alerta == "Sin stock":
+            condiciones.append("COALESCE(s.cantidad, 0) = 0")
+        elif alerta == "Stock bajo":
+            condiciones.append("COALESCE(s.cantidad, 0) <> 0 AND COALESCE(s.cantidad, 0) <= ?")
+            params.append(stock_minimo)
+        where = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+        return where, params
+
+    def contar_inventario(self, texto="", alerta="Todos", stock_minimo=10):
+        """Cuenta los productos que cumplen el filtro de texto y de alerta."""
+        where, params = self._filtros_inventario(texto, alerta, stock_minimo)
+        sql = f"""
+        SELECT COUNT(*)
+        FROM productos p
+        INNER JOIN categorias c ON p.categoria_id = c.id
+        LEFT JOIN stock s ON s.producto_id = p.id
+        {where}
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                return cursor.fetchone()[0]
+        except Error as e:
+            print(f"Error al contar el inventario: {e}")
+            return 0
+
+    def consultar_inventario(self, texto="", alerta="Todos", stock_minimo=10, orden="nombre",
+                             despues_de=None, antes_de=None, limite=15, metodo="promedio"):
+        """
+        Recupera una página del inventario filtrada por texto y alerta ('Todos',
+        'Stock bajo', 'Sin stock'), ordenada por 'nombre', 'codigo' o 'stock'.
+        La paginación es por clave (keyset): despues_de / antes_de reciben la última /
+        primera fila de la página actual y se leen sólo las 'limite' filas vecinas.
+        Retorna tuplas (id, codigo, nombre, categoria, laboratorio, stock_actual,
+        valor, costo_ventas) con la valoración guardada para 'metodo' (ver actualizar_valoracion).
+        """
+        expresion, posicion = ORDENES_INVENTARIO[orden]
+        where, params = self._filtros_inventario(texto, alerta, stock_minimo)
+        direccion = "ASC"
+        if despues_de is not None or antes_de is not None:
+            fila_limite = despues_de if despues_de is not None else antes_de
+            operador = ">" if despues_de is not None else "<"
+            direccion = "ASC" if despues_de is not None else "DESC"
+            where += (" AND " if where else "WHERE ") + f"({expresion}, p.id) {operador} (?, ?)"
+            params.extend([fila_limite[posicion], fila_limite[0]])
+
+        sql = f"""
+        SELECT
+            p.id,
+            p.codigo,
+            p.nombre,
+            c.nombre as categoria,
+            p.laboratorio,
+            COALESCE(s.cantidad, 0) AS stock_actual,
+            COALESCE(v.valor, 0) AS valor,
+            COALESCE(v.costo_ventas, 0) AS costo_ventas
+        FROM productos p
+        INNER JOIN categorias c ON p.categoria_id = c.id
+        LEFT JOIN stock s ON s.producto_id = p.id
+        LEFT JOIN valoracion v ON v.producto_id = p.id AND v.metodo = ?
+        {where}
+        ORDER BY {expresion} {direccion}, p.id {direccion}
+        LIMIT ?
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, [metodo] + params + [limite])
+                filas = cursor.fetchall()
+                # Al retroceder se lee en orden inverso; se devuelve en el orden de la página.
+                return filas if direccion == "ASC" else filas[::-1]
+        except Error as e:
+            print(f"Error al consultar el inventario: {e}")
+            return []
+
+    def obtener_filas_inventario(self, producto_ids, metodo="promedio"):
+        """
+        Relee sólo las filas de inventario de los productos indicados (por ejemplo,
+        las visibles que cambiaron) para actualizarlas sin recargar la página.
+        Retorna {id: fila} con filas como las de consultar_inventario.
+        """
+        producto_ids = list(producto_ids)
+        if not producto_ids:
+            return {}
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(CONSULTAS["filas_inventario"], (metodo, json.dumps(producto_ids)))
+                return {fila[0]: fila for fila in cursor.fetchall()}
+        except Error as e:
+            print(f"Error al releer filas del inventario: {e}")
+            return {}
+
+    def iterar_inventario(self, texto="", alerta="Todos", stock_minimo=10, orden="nombre", tamano_bloque=5000):
+        """
+        Recorre todo el inventario filtrado y ordenado como consultar_inventario(),
+        produciendo listas de hasta 'tamano_bloque' filas leídas con fetchmany().
+        Mantiene una conexión de lectura prestada hasta agotar el generador.
+        """
+        expresion, _ = ORDENES_INVENTARIO[orden]
+        where, params = self._filtros_inventario(texto, alerta, stock_minimo)
+        sql = f"""
+        SELECT
+            p.id,
+            p.codigo,
+            p.nombre,
+            c.nombre as categoria,
+            p.laboratorio,
+            COALESCE(s.cantidad, 0) AS stock_actual
+        FROM productos p
+        INNER JOIN categorias c ON p.categoria_id = c.id
+        LEFT JOIN stock s ON s.producto_id = p.id
+        {where}
+        ORDER BY {expresion} ASC, p.id ASC
+        """
+        with self._conexion_lectura() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            while True:
+                filas = cursor.fetchmany(tamano_bloque)
+                if not filas:
+                    break
+                yield filas
+
+    def buscar_productos(self, texto, limite=20, columnas=None):
+        """
+        Busca productos por prefijos de palabras en código, nombre, categoría y
+        laboratorio usando el índice FTS5, sin distinguir mayúsculas ni acentos.
+        'columnas' limita la búsqueda a algunas de ellas, p. ej. ("codigo", "nombre").
+        Retorna hasta 'limite' tuplas (id, codigo, nombre, categoria, laboratorio, stock_actual)
+        ordenadas por relevancia (las coincidencias en código y nombre pesan más).
+        """
+        consulta = consulta_fts(texto)
+        if consulta is None:
+            return []
+        if columnas:
+            consulta = f"{{{' '.join(columnas)}}} : ({consulta})"
+        sql = """
+        SELECT
+            p.id,
+            p.codigo,
+            p.nombre,
+            c.nombre as categoria,
+            p.laboratorio,
+            COALESCE(s.cantidad, 0) AS stock_actual
+        FROM productos_fts f
+        INNER JOIN productos p ON p.id = f.rowid
+        INNER JOIN categorias c ON p.categoria_id = c.id
+        LEFT JOIN stock s ON s.producto_id = p.id
+        WHERE productos_fts MATCH ?
+        ORDER BY bm25(productos_fts, 10.0, 5.0, 1.0, 1.0)
+        LIMIT ?
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (consulta, limite))
+                return cursor.fetchall()
+        except Error as e:
+            print(f"Error al buscar productos: {e}")
+            return []
+
+    def verificar_stock(self, reparar=False):
+        """
+        Recalcula el stock de cada producto desde el libro de movimientos
+        (compras suman, ventas restan) y lo compara con la tabla 'stock'.
+        Retorna una lista de tuplas (producto_id, stock_registrado, stock_calculado)
+        con las diferencias encontradas; stock_registrado es None si falta el saldo.
+        Con reparar=True además reescribe los saldos con diferencias.
+        """
+        sql = """
+        SELECT
+            p.id,
+            s.cantidad AS stock_registrado,
+            COALESCE(l.total, 0) AS stock_calculado
+        FROM productos p
+        LEFT JOIN stock s ON s.producto_id = p.id
+        LEFT JOIN (
+            SELECT
+                producto_id,
+                SUM(CASE WHEN tipo = 'Compra' THEN cantidad ELSE -cantidad END) AS total
+            FROM movimientos
+            GROUP BY producto_id
+        ) l ON l.producto_id = p.id
+        WHERE s.cantidad IS NULL OR s.cantidad <> COALESCE(l.total, 0)
+        """
+        sql_reparar = """
+        INSERT INTO stock (producto_id, cantidad) VALUES (?, ?)
+        ON CONFLICT (producto_id) DO UPDATE SET cantidad = excluded.cantidad
+        """
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql)
-            # Retorna una lista de tuplas con (id, codigo, nombre, categoria, laboratorio, stock_actual)
-            return cursor.fetchall()
+            diferencias = cursor.fetchall()
+            if reparar and diferencias:
+                cursor.executemany(sql_reparar, [(pid, calculado) for pid, _, calculado in diferencias])
+                self.conn.commit()
+                self._invalidar_detalles([pid for pid, _, _ in diferencias])
+            return diferencias
         except Error as e:
-            print(f"Error al obtener datos de inventario: {e}")
+            self.conn.rollback()
+            print(f"Error al verificar el stock: {e}")
+            return []
+
+    # --- Cierres de stock ---
+
+    def crear_cierre(self, fecha):
+        """
+        Crea un cierre con el saldo de cada producto al final de 'fecha' (ISO).
+        Se calcula desde el cierre anterior más los movimientos del período, por lo
+        que el costo no depende del tamaño total del libro. Sólo se guardan saldos
+        distintos de cero. Retorna la cantidad de saldos guardados, "DUPLICATE" si ya
+        existe un cierre en esa fecha o None si falló.
+        """
+        sql = """
+        INSERT INTO cierres_stock (producto_id, fecha, cantidad)
+        SELECT producto_id, ?, SUM(cantidad)
+        FROM (
+            SELECT producto_id, cantidad FROM cierres_stock WHERE fecha = ?
+            UNION ALL
+            SELECT producto_id, CASE WHEN tipo = 'Compra' THEN cantidad ELSE -cantidad END
+            FROM movimientos
+            WHERE fecha > ? AND fecha <= ?
+        )
+        GROUP BY producto_id
+        HAVING SUM(cantidad) <> 0
+        """
+        try:
+            self.conn.execute("BEGIN TRANSACTION")
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT MAX(fecha) FROM cierres WHERE fecha < ?", (fecha,))
+            anterior = cursor.fetchone()[0]
+            cursor.execute("INSERT INTO cierres (fecha, creado_en) VALUES (?, datetime('now', 'localtime'))", (fecha,))
+            cursor.execute(sql, (fecha, anterior, anterior or "", fecha))
+            saldos = cursor.rowcount
+            self.conn.commit()
+            return saldos
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+            return "DUPLICATE"
+        except Error as e:
+            self.conn.rollback()
+            print(f"Error al crear el cierre: {e}")
+            return None
+
+    def crear_cierres_mensuales(self, hasta=None):
+        """
+        Crea los cierres de fin de mes que falten, desde el mes del primer movimiento
+        hasta el último mes terminado antes de 'hasta' (ISO; por defecto hoy).
+        Cada cierre parte del anterior. Retorna una lista de (fecha, saldos guardados).
+        """
+        try:
+            primera = self.conn.execute("SELECT MIN(fecha) FROM movimientos").fetchone()[0]
+            existentes = {fila[0] for fila in self.conn.execute("SELECT fecha FROM cierres")}
+        except Error as e:
+            print(f"Error al buscar los cierres pendientes: {e}")
+            return []
+        if primera is None:
+            return []
+
+        limite = date.fromisoformat(hasta) if hasta else date.today()
+        anio, mes = int(primera[:4]), int(primera[5:7])
+        creados = []
+        while True:
+            # Último día del mes = día anterior al primero del mes siguiente
+            siguiente = date(anio + mes // 12, mes % 12 + 1, 1)
+            if siguiente > limite:
+                break
+            fin_de_mes = date.fromordinal(siguiente.toordinal() - 1).isoformat()
+            if fin_de_mes not in existentes:
+                resultado = self.crear_cierre(fin_de_mes)
+                if resultado is None:
+                    break
+                creados.append((fin_de_mes, resultado))
+            anio, mes = siguiente.year, siguiente.month
+        return creados
+
+    def obtener_cierres(self):
+        """Retorna los cierres como tuplas (fecha, creado_en, saldos guardados), del más reciente al más antiguo."""
+        sql = """
+        SELECT c.fecha, c.creado_en, COUNT(s.producto_id)
+        FROM cierres c
+        LEFT JOIN cierres_stock s ON s.fecha = c.fecha
+        GROUP BY c.fecha
+        ORDER BY c.fecha DESC
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                return cursor.fetchall()
+        except Error as e:
+            print(f"Error al obtener los cierres: {e}")
+            return []
+
+    def verificar_cierres(self, reparar=False):
+        """
+        Recalcula los saldos de todos los cierres desde el libro de movimientos (una
+        sola pasada, con suma acumulada entre cierres) y los compara con los guardados.
+        Retorna una lista de tuplas (fecha, producto_id, saldo_registrado, saldo_calculado)
+        con las diferencias; saldo_registrado es None si falta el saldo.
+        Con reparar=True además reescribe los saldos con diferencias.
+        """
+        sql = """
+        WITH delta AS (
+            SELECT
+                m.producto_id,
+                (SELECT MIN(c.fecha) FROM cierres c WHERE c.fecha >= m.fecha) AS fecha,
+                SUM(CASE WHEN m.tipo = 'Compra' THEN m.cantidad ELSE -m.cantidad END) AS total
+            FROM movimientos m
+            WHERE m.fecha <= (SELECT MAX(fecha) FROM cierres)
+            GROUP BY 1, 2
+        ),
+        calculado AS (
+            SELECT
+                p.producto_id,
+                c.fecha,
+                SUM(COALESCE(d.total, 0)) OVER (PARTITION BY p.producto_id ORDER BY c.fecha) AS cantidad
+            FROM (SELECT producto_id FROM delta UNION SELECT producto_id FROM cierres_stock) p
+            CROSS JOIN cierres c
+            LEFT JOIN delta d ON d.producto_id = p.producto_id AND d.fecha = c.fecha
+        )
+        SELECT k.fecha, k.producto_id, r.cantidad AS saldo_registrado, k.cantidad AS saldo_calculado
+        FROM calculado k
+        LEFT JOIN cierres_stock r ON r.producto_id = k.producto_id AND r.fecha = k.fecha
+        WHERE COALESCE(r.cantidad, 0) <> k.cantidad
+        ORDER BY k.fecha, k.producto_id
+        """
+        sql_reparar = """
+        INSERT INTO cierres_stock (producto_id, fecha, cantidad) VALUES (?, ?, ?)
+        ON CONFLICT (producto_id, fecha) DO UPDATE SET cantidad = excluded.cantidad
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql)
+            diferencias = cursor.fetchall()
+            if reparar and diferencias:
+                cursor.executemany(sql_reparar, [(pid, fecha, calculado) for fecha, pid, _, calculado in diferencias])
+                self.conn.commit()
+            return diferencias
+        except Error as e:
+            self.conn.rollback()
+            print(f"Error al verificar los cierres: {e}")
+            return []
+
+    def stock_en_fecha(self, producto_id, fecha):
+        """
+        Stock al final de 'fecha' (ISO): saldo del último cierre anterior o igual a
+        la fecha más los movimientos posteriores a ese cierre. Con producto_id
+        retorna un entero; con producto_id=None retorna {producto_id: stock} de los
+        productos con saldo distinto de cero. Retorna None si falla.
+        """
+        sql_producto = """
+        SELECT
+            COALESCE((SELECT cantidad FROM cierres_stock WHERE producto_id = :producto_id AND fecha = :cierre), 0)
+            + COALESCE((
+                SELECT SUM(CASE WHEN tipo = 'Compra' THEN cantidad ELSE -cantidad END)
+                FROM movimientos
+                WHERE producto_id = :producto_id AND fecha > :desde AND fecha <= :fecha
+            ), 0)
+        """
+        sql_todos = """
+        SELECT producto_id, SUM(cantidad)
+        FROM (
+            SELECT producto_id, cantidad FROM cierres_stock WHERE fecha = :cierre
+            UNION ALL
+            SELECT producto_id, CASE WHEN tipo = 'Compra' THEN cantidad ELSE -cantidad END
+            FROM movimientos
+            WHERE fecha > :desde AND fecha <= :fecha
+        )
+        GROUP BY producto_id
+        HAVING SUM(cantidad) <> 0
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT MAX(fecha) FROM cierres WHERE fecha <= ?", (fecha,))
+                cierre = cursor.fetchone()[0]
+                params = {"producto_id": producto_id, "cierre": cierre, "desde": cierre or "", "fecha": fecha}
+                if producto_id is None:
+                    cursor.execute(sql_todos, params)
+                    return dict(cursor.fetchall())
+                cursor.execute(sql_producto, params)
+                return cursor.fetchone()[0]
+        except Error as e:
+            print(f"Error al calcular el stock en fecha: {e}")
+            return None
+
+    # --- Valoración de inventario ---
+
+    def actualizar_valoracion(self, metodo="promedio", tamano_bloque=5000):
+        """
+        Actualiza la caché de valoración de 'metodo' ('promedio' o 'fifo') procesando
+        sólo los movimientos posteriores al último procesado de cada producto, en una
+        pasada ordenada por (producto, fecha, id) leída por bloques. Los productos
+        cuyo estado fue descartado por los triggers se recalculan desde el principio.
+        Retorna la cantidad de movimientos procesados, o None si falló.
+        """
+        sql = """
+        SELECT
+            p.id, v.ultima_fecha, v.ultimo_id, v.cantidad, v.valor, v.costo_ventas,
+            v.ingresos, v.ultimo_costo, v.faltante, v.capas,
+            m.id, m.fecha, m.tipo, m.precio, m.cantidad
+        FROM productos p
+        LEFT JOIN valoracion v ON v.producto_id = p.id AND v.metodo = ?
+        INNER JOIN movimientos m
+            ON m.producto_id = p.id
+            AND m.fecha >= COALESCE(v.ultima_fecha, '')
+            AND (m.fecha, m.id) > (COALESCE(v.ultima_fecha, ''), COALESCE(v.ultimo_id, 0))
+        ORDER BY p.id, m.fecha, m.id
+        """
+        sql_guardar = """
+        INSERT OR REPLACE INTO valoracion (
+            producto_id, metodo, ultima_fecha, ultimo_id, cantidad, valor,
+            costo_ventas, ingresos, ultimo_costo, faltante, capas
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        estados = {}
+        procesados = 0
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (metodo,))
+            while True:
+                filas = cursor.fetchmany(tamano_bloque)
+                if not filas:
+                    break
+                for fila in filas:
+                    producto_id = fila[0]
+                    estado = estados.get(producto_id)
+                    if estado is None:
+                        guardado = fila[1:10] if fila[1] is not None else ()
+                        estado = estados[producto_id] = EstadoValoracion(metodo, *guardado)
+                    estado.aplicar(*fila[10:])
+                procesados += len(filas)
+
+            if estados:
+                self.conn.execute("BEGIN TRANSACTION")
+                self.conn.executemany(sql_guardar, [e.como_fila(pid) for pid, e in estados.items()])
+                self.conn.commit()
+            return procesados
+        except Error as e:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            print(f"Error al actualizar la valoración: {e}")
+            return None
+
+    def resumen_valoracion(self, metodo="promedio"):
+        """
+        Totales de la valoración guardada para 'metodo':
+        (valor del inventario, costo de ventas, ingresos por ventas).
+        """
+        sql = """
+        SELECT COALESCE(SUM(valor), 0), COALESCE(SUM(costo_ventas), 0), COALESCE(SUM(ingresos), 0)
+        FROM valoracion
+        WHERE metodo = ?
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (metodo,))
+                return cursor.fetchone()
+        except Error as e:
+            print(f"Error al obtener el resumen de valoración: {e}")
+            return (0, 0, 0)
+
+    def valoracion_por_categoria(self, metodo="promedio"):
+        """
+        Valoración guardada para 'metodo' agrupada por categoría:
+        tuplas (categoria, valor, costo_ventas, ingresos) ordenadas por valor descendente.
+        """
+        sql = """
+        SELECT c.nombre, SUM(v.valor), SUM(v.costo_ventas), SUM(v.ingresos)
+        FROM valoracion v
+        INNER JOIN productos p ON p.id = v.producto_id
+        INNER JOIN categorias c ON c.id = p.categoria_id
+        WHERE v.metodo = ?
+        GROUP BY c.id
+        ORDER BY SUM(v.valor) DESC
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (metodo,))
+                return cursor.fetchall()
+        except Error as e:
+            print(f"Error al obtener la valoración por categoría: {e}")
             return []
 
+    # --- Tablero de ventas (lee sólo las tablas de resumen) ---
+
+    def obtener_tablero(self, desde_mes, hasta_mes, por_dia=False, limite=10):
+        """
+        Datos del tablero de ventas entre dos meses 'aaaa-mm' (inclusive), leídos de
+        las tablas de resumen en una sola conexión. Retorna un diccionario con:
+          'serie': (período, compras_importe, ventas_importe, compras_cantidad, ventas_cantidad)
+                   por día si por_dia=True, si no por mes;
+          'productos', 'laboratorios', 'categorias': (nombre, ventas_cantidad, ventas_importe)
+                   ordenados por importe vendido (los dos primeros hasta 'limite');
+          'milisegundos': duración de las consultas.
+        """
+        columnas = "SUM(compras_importe), SUM(ventas_importe), SUM(compras_cantidad), SUM(ventas_cantidad)"
+        if por_dia:
+            sql_serie = f"""
+            SELECT fecha, {columnas}
+            FROM resumen_diario
+            WHERE fecha BETWEEN :desde || '-01' AND :hasta || '-31'
+            GROUP BY fecha
+            ORDER BY fecha
+            """
+        else:
+            sql_serie = f"""
+            SELECT mes, {columnas}
+            FROM resumen_mensual_categoria
+            WHERE mes BETWEEN :desde AND :hasta
+            GROUP BY mes
+            ORDER BY mes
+            """
+        sql_productos = """
+        SELECT p.nombre, SUM(r.ventas_cantidad), SUM(r.ventas_importe)
+        FROM resumen_mensual_producto r
+        INNER JOIN productos p ON p.id = r.producto_id
+        WHERE r.mes BETWEEN :desde AND :hasta
+        GROUP BY r.producto_id
+        HAVING SUM(r.ventas_cantidad) > 0
+        ORDER BY SUM(r.ventas_importe) DESC
+        LIMIT :limite
+        """
+        sql_laboratorios = """
+        SELECT COALESCE(NULLIF(p.laboratorio, ''), 'Sin laboratorio'), SUM(r.ventas_cantidad), SUM(r.ventas_importe)
+        FROM resumen_mensual_producto r
+        INNER JOIN productos p ON p.id = r.producto_id
+        WHERE r.mes BETWEEN :desde AND :hasta
+        GROUP BY 1
+        HAVING SUM(r.ventas_cantidad) > 0
+        ORDER BY SUM(r.ventas_importe) DESC
+        LIMIT :limite
+        """
+        sql_categorias = """
+        SELECT COALESCE(c.nombre, 'Sin categoría'), SUM(r.ventas_cantidad), SUM(r.ventas_importe)
+        FROM resumen_mensual_categoria r
+        LEFT JOIN categorias c ON c.id = r.categoria_id
+        WHERE r.mes BETWEEN :desde AND :hasta
+        GROUP BY r.categoria_id
+        HAVING SUM(r.ventas_cantidad) > 0
+        ORDER BY SUM(r.ventas_importe) DESC
+        """
+        params = {"desde": desde_mes, "hasta": hasta_mes, "limite": limite}
+        inicio = time.perf_counter()
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                tablero = {}
+                for clave, sql in (("serie", sql_serie), ("productos", sql_productos),
+                                   ("laboratorios", sql_laboratorios), ("categorias", sql_categorias)):
+                    cursor.execute(sql, params)
+                    tablero[clave] = cursor.fetchall()
+        except Error as e:
+            print(f"Error al obtener el tablero de ventas: {e}")
+            tablero = {"serie": [], "productos": [], "laboratorios": [], "categorias": []}
+        tablero["milisegundos"] = (time.perf_counter() - inicio) * 1000
+        return tablero
+
     # --- Operaciones CRUD para Categorías ---
     # ... [Todas las funciones de Categorías se mantienen igual] ...
     def insertar_categoria(self, nombre):
@@ -175,39 +1549,50 @@ class DBManager:
             cursor = self.conn.cursor()
             cursor.execute(sql, (nombre,))
             self.conn.commit()
+            self.catalogo.guardar_categorias([(cursor.lastrowid, nombre)])
             return cursor.lastrowid
         except sqlite3.IntegrityError:
+            self.conn.rollback()
             return "DUPLICATE"
         except Error as e:
+            self.conn.rollback()
             return None
 
     def obtener_categorias(self):
         sql = "SELECT id, nombre FROM categorias ORDER BY id DESC"
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql)
-            return cursor.fetchall()
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                return cursor.fetchall()
         except Error as e:
             return []
 
-    def obtener_todas_categorias_combo(self):
-        sql = "SELECT nombre FROM categorias ORDER BY nombre ASC"
+    def buscar_categorias(self, texto):
+        """Busca categorías por prefijos de palabras (índice FTS5, sin distinguir acentos)."""
+        consulta = consulta_fts(texto)
+        if consulta is None:
+            return []
+        sql = """
+        SELECT c.id, c.nombre
+        FROM categorias_fts f
+        INNER JOIN categorias c ON c.id = f.rowid
+        WHERE categorias_fts MATCH ?
+        ORDER BY c.id DESC
+        """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql)
-            return [row[0] for row in cursor.fetchall()]
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (consulta,))
+                return cursor.fetchall()
         except Error as e:
             return []
+
+    def obtener_todas_categorias_combo(self):
+        return self.catalogo.nombres_categorias()
             
     def obtener_id_categoria_por_nombre(self, nombre):
-        sql = "SELECT id FROM categorias WHERE nombre = ?"
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, (nombre,))
-            resultado = cursor.fetchone()
-            return resultado[0] if resultado else None
-        except Error as e:
-            return None
+        return self.catalogo.id_categoria(nombre)
 
     def actualizar_categoria(self, categoria_id, nuevo_nombre):
         sql = "UPDATE categorias SET nombre = ? WHERE id = ?"
@@ -215,10 +1600,15 @@ class DBManager:
             cursor = self.conn.cursor()
             cursor.execute(sql, (nuevo_nombre, categoria_id))
             self.conn.commit()
+            self._invalidar_detalles()
+            if cursor.rowcount:
+                self.catalogo.guardar_categorias([(categoria_id, nuevo_nombre)])
             return True
         except sqlite3.IntegrityError:
+            self.conn.rollback()
             return "DUPLICATE"
         except Error as e:
+            self.conn.rollback()
             return False
 
     def eliminar_categoria(self, categoria_id):
@@ -227,45 +1617,319 @@ class DBManager:
             cursor = self.conn.cursor()
             cursor.execute(sql, (categoria_id,))
             self.conn.commit()
+            self._invalidar_detalles()
+            self.catalogo.quitar_categoria(categoria_id)
             return True
         except Error as e:
+            self.conn.rollback()
             return False
             
     # --- Operaciones CRUD para Productos ---
     
     def insertar_producto(self, codigo, nombre, categoria_id, laboratorio):
         """Inserta un nuevo producto en la base de datos."""
-        sql = "INSERT INTO productos (codigo, nombre, categoria_id, laboratorio) VALUES (?, ?, ?, ?)"
         try:
             cursor = self.conn.cursor()
-            cursor.execute(sql, (codigo, nombre, categoria_id, laboratorio))
+            cursor.execute(CONSULTAS["insertar_producto"], (codigo, nombre, categoria_id, laboratorio))
             self.conn.commit()
+            self.catalogo.guardar_productos([(cursor.lastrowid, codigo, nombre)])
+            self._publicar_stock([(cursor.lastrowid, 0)])
             return cursor.lastrowid
         except sqlite3.IntegrityError:
+            self.conn.rollback()
             return "DUPLICATE_CODE"
         except Error as e:
+            self.conn.rollback()
+            return None
+
+    def obtener_mapa_categorias(self):
+        """Retorna un diccionario {nombre: id} con todas las categorías, para resolverlas en memoria."""
+        sql = "SELECT nombre, id FROM categorias"
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                return dict(cursor.fetchall())
+        except Error as e:
+            print(f"Error al obtener el mapa de categorías: {e}")
+            return {}
+
+    def guardar_productos_lote(self, productos, categorias, simular=False):
+        """
+        Inserta o actualiza (por 'codigo') muchos productos en una sola transacción.
+        'productos' es una secuencia de tuplas (codigo, nombre, nombre_categoria, laboratorio).
+        'categorias' es el mapa {nombre: id} compartido entre lotes: las categorías que
+        faltan se crean en la misma transacción y se agregan al mapa. Los productos que
+        ya existen con los mismos datos no se reescriben.
+        Con simular=True todo se revierte al final (el mapa queda como estaba).
+        Retorna (filas escritas, nombres de categorías creadas), o None si falló.
+        """
+        sql = """
+        INSERT INTO productos (codigo, nombre, categoria_id, laboratorio) VALUES (?, ?, ?, ?)
+        ON CONFLICT(codigo) DO UPDATE SET
+            nombre = excluded.nombre,
+            categoria_id = excluded.categoria_id,
+            laboratorio = excluded.laboratorio
+        WHERE nombre IS NOT excluded.nombre
+           OR categoria_id IS NOT excluded.categoria_id
+           OR laboratorio IS NOT excluded.laboratorio
+        """
+        creadas = []
+        try:
+            self.conn.execute("BEGIN TRANSACTION")
+            cursor = self.conn.cursor()
+            filas = []
+            for codigo, nombre, nombre_categoria, laboratorio in productos:
+                if nombre_categoria not in categorias:
+                    cursor.execute("INSERT OR IGNORE INTO categorias (nombre) VALUES (?)", (nombre_categoria,))
+                    if cursor.rowcount:
+                        categorias[nombre_categoria] = cursor.lastrowid
+                        creadas.append(nombre_categoria)
+                    else:
+                        # La creó otra ventana después de leer el mapa
+                        cursor.execute("SELECT id FROM categorias WHERE nombre = ?", (nombre_categoria,))
+                        categorias[nombre_categoria] = cursor.fetchone()[0]
+                filas.append((codigo, nombre, categorias[nombre_categoria], laboratorio))
+            cursor.executemany(sql, filas)
+            escritas = cursor.rowcount
+            if simular:
+                self.conn.rollback()
+                for nombre_categoria in creadas:
+                    del categorias[nombre_categoria]
+            else:
+                self.conn.commit()
+                if creadas:
+                    self.catalogo.guardar_categorias([(categorias[nombre], nombre) for nombre in creadas])
+                if escritas:
+                    self._invalidar_detalles()
+                    self._sincronizar_productos([(codigo, nombre) for codigo, nombre, _, _ in filas])
+            return escritas, creadas
+        except Error as e:
+            self.conn.rollback()
+            for nombre_categoria in creadas:
+                categorias.pop(nombre_categoria, None)
+            print(f"Error al guardar lote de productos: {e}")
             return None
             
     # --- Operación para Movimientos ---
     
     def insertar_movimiento(self, producto_id, fecha, tipo, precio, cantidad, observaciones):
-        """Inserta un nuevo movimiento (Compra/Venta) en la base de datos."""
-        sql = """
-        INSERT INTO movimientos (producto_id, fecha, tipo, precio, cantidad, observaciones) 
-        VALUES (?, ?, ?, ?, ?, ?)
+        """
+        Inserta un nuevo movimiento (Compra/Venta) en la base de datos.
+        La fecha debe venir en formato ISO (aaaa-mm-dd), ver fecha_a_iso().
         """
         try:
             cursor = self.conn.cursor()
-            cursor.execute(sql, (producto_id, fecha, tipo, precio, cantidad, observaciones))
+            cursor.execute(CONSULTAS["insertar_movimiento"], (producto_id, fecha, tipo, precio, cantidad, observaciones))
             self.conn.commit()
+            self._invalidar_detalles([producto_id])
+            self._publicar_stock([(producto_id, diferencia_stock(tipo, cantidad))])
             return cursor.lastrowid
         except Error as e:
+            self.conn.rollback()
             print(f"Error al insertar movimiento: {e}")
             return None
 
-    def __del__(self):
-        """Cierra la conexión cuando el objeto es destruido."""
+    def insertar_movimientos_lote(self, movimientos):
+        """
+        Inserta muchos movimientos en una sola transacción con executemany.
+        'movimientos' es una secuencia de tuplas
+        (producto_id, fecha_iso, tipo, precio, cantidad, observaciones).
+        Retorna la cantidad insertada, o None si falló (no se inserta ninguno).
+        """
+        try:
+            self.conn.execute("BEGIN TRANSACTION")
+            self.conn.executemany(CONSULTAS["insertar_movimiento"], movimientos)
+            self.conn.commit()
+        except Error as e:
+            self.conn.rollback()
+            print(f"Error al insertar lote de movimientos: {e}")
+            return None
+        # Un registro de cambio por producto, con la suma de sus movimientos
+        cambios = {}
+        for producto_id, _, tipo, _, cantidad, _ in movimientos:
+            cambios[producto_id] = cambios.get(producto_id, 0) + diferencia_stock(tipo, cantidad)
+        self._invalidar_detalles(cambios)
+        self._publicar_stock(list(cambios.items()))
+        return len(movimientos)
+
+    # --- Operaciones compuestas (un solo viaje desde la interfaz) ---
+
+    def registrar_movimiento(self, producto_id, fecha, tipo, precio, cantidad, observaciones):
+        """
+        Inserta un movimiento y lee el stock resultante (lo actualizan los triggers)
+        en una sola transacción. Retorna (id del movimiento, stock actual del
+        producto), o None si falló (por ejemplo, si el producto ya no existe).
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(CONSULTAS["insertar_movimiento"], (producto_id, fecha, tipo, precio, cantidad, observaciones))
+            movimiento_id = cursor.lastrowid
+            stock = cursor.execute(CONSULTAS["stock_producto"], (producto_id,)).fetchone()[0]
+            self.conn.commit()
+        except Error as e:
+            self.conn.rollback()
+            print(f"Error al registrar movimiento: {e}")
+            return None
+        self._invalidar_detalles([producto_id])
+        self._publicar_stock([(producto_id, diferencia_stock(tipo, cantidad))])
+        return movimiento_id, stock
+
+    def registrar_producto(self, codigo, nombre, nombre_categoria, laboratorio):
+        """
+        Resuelve la categoría por nombre e inserta el producto en una sola transacción.
+        La categoría se busca primero en el catálogo en memoria y, si no está (la
+        pudo crear otro proceso, como herramientas.py), en la base.
+        Retorna el id del producto, "NO_CATEGORY", "DUPLICATE_CODE" o None si falló.
+        """
+        categoria_id = self.catalogo.id_categoria(nombre_categoria)
+        try:
+            cursor = self.conn.cursor()
+            if categoria_id is None:
+                fila = cursor.execute(CONSULTAS["id_categoria"], (nombre_categoria,)).fetchone()
+                if fila is None:
+                    return "NO_CATEGORY"
+                categoria_id = fila[0]
+            cursor.execute(CONSULTAS["insertar_producto"], (codigo, nombre, categoria_id, laboratorio))
+            self.conn.commit()
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+            return "DUPLICATE_CODE"
+        except Error as e:
+            self.conn.rollback()
+            print(f"Error al registrar producto: {e}")
+            return None
+        if self.catalogo.id_categoria(nombre_categoria) is None:
+            self.catalogo.guardar_categorias([(categoria_id, nombre_categoria)])
+        self.catalogo.guardar_productos([(cursor.lastrowid, codigo, nombre)])
+        self._publicar_stock([(cursor.lastrowid, 0)])
+        return cursor.lastrowid
+
+    def obtener_mapa_codigos(self):
+        """Retorna un diccionario {codigo: id} con todos los productos, para resolver códigos en memoria."""
+        sql = "SELECT codigo, id FROM productos"
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                return dict(cursor.fetchall())
+        except Error as e:
+            print(f"Error al obtener el mapa de códigos: {e}")
+            return {}
+
+    def obtener_ultimo_movimiento(self, producto_id, tipo):
+        """
+        Retorna (precio, cantidad) del movimiento más reciente de ese tipo para el
+        producto, o None si no tiene. Recorre idx_movimientos_producto_fecha hacia atrás.
+        """
+        sql = """
+        SELECT precio, cantidad FROM movimientos
+        WHERE producto_id = ? AND tipo = ?
+        ORDER BY fecha DESC, id DESC
+        LIMIT 1
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (producto_id, tipo))
+                return cursor.fetchone()
+        except Error as e:
+            print(f"Error al obtener el último movimiento: {e}")
+            return None
+
+    def obtener_movimientos_producto(self, producto_id, desde=None, hasta=None):
+        """
+        Recupera los movimientos de un producto entre dos fechas ISO (inclusive),
+        ordenados por fecha. Usa un rango sobre el índice (producto_id, fecha).
+        """
+        sql = """
+        SELECT id, fecha, tipo, precio, cantidad, observaciones
+        FROM movimientos
+        WHERE producto_id = ? AND fecha BETWEEN ? AND ?
+        ORDER BY fecha ASC, id ASC
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (producto_id, desde or FECHA_MINIMA, hasta or FECHA_MAXIMA))
+                return cursor.fetchall()
+        except Error as e:
+            print(f"Error al obtener movimientos del producto: {e}")
+            return []
+
+    def obtener_movimientos_por_fecha(self, desde=None, hasta=None, tipo=None):
+        """
+        Recupera los movimientos de todos los productos entre dos fechas ISO (inclusive),
+        opcionalmente sólo de un tipo ('Compra' o 'Venta'). Usa un rango sobre el índice de fecha.
+        """
+        sql = """
+        SELECT m.id, m.producto_id, p.nombre, m.fecha, m.tipo, m.precio, m.cantidad, m.observaciones
+        FROM movimientos m
+        INNER JOIN productos p ON p.id = m.producto_id
+        WHERE m.fecha BETWEEN ? AND ? AND (? IS NULL OR m.tipo = ?)
+        ORDER BY m.fecha ASC, m.id ASC
+        """
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (desde or FECHA_MINIMA, hasta or FECHA_MAXIMA, tipo, tipo))
+                return cursor.fetchall()
+        except Error as e:
+            print(f"Error al obtener movimientos por fecha: {e}")
+            return []
+
+    def contar_movimientos(self, desde=None, hasta=None):
+        """Cuenta los movimientos entre dos fechas ISO (inclusive) usando el índice de fecha."""
+        sql = "SELECT COUNT(*) FROM movimientos WHERE fecha BETWEEN ? AND ?"
+        try:
+            with self._conexion_lectura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (desde or FECHA_MINIMA, hasta or FECHA_MAXIMA))
+                return cursor.fetchone()[0]
+        except Error as e:
+            print(f"Error al contar movimientos: {e}")
+            return 0
+
+    def iterar_movimientos(self, desde=None, hasta=None, tamano_bloque=5000):
+        """
+        Recorre los movimientos entre dos fechas ISO (inclusive) en orden de fecha,
+        produciendo listas de hasta 'tamano_bloque' filas
+        (id, fecha, codigo, producto, tipo, precio, cantidad, observaciones) leídas con fetchmany().
+        Mantiene una conexión de lectura prestada hasta agotar el generador.
+        """
+        sql = """
+        SELECT m.id, m.fecha, p.codigo, p.nombre, m.tipo, m.precio, m.cantidad, m.observaciones
+        FROM movimientos m
+        INNER JOIN productos p ON p.id = m.producto_id
+        WHERE m.fecha BETWEEN ? AND ?
+        ORDER BY m.fecha ASC, m.id ASC
+        """
+        with self._conexion_lectura() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (desde or FECHA_MINIMA, hasta or FECHA_MAXIMA))
+            while True:
+                filas = cursor.fetchmany(tamano_bloque)
+                if not filas:
+                    break
+                yield filas
+
+    def reporte_diagnostico(self, solo_problemas=False):
+        """Planes y tiempos de las sentencias ejecutadas (None si el modo diagnóstico está apagado)."""
+        if self.diagnostico is None:
+            return None
+        return self.diagnostico.reporte(solo_problemas)
+
+    def cerrar(self):
+        """Cierra la conexión de escritura y las del pool de lectura."""
+        while self.total_lectores > 0:
+            self._lectores.get().close()
+            self.total_lectores -= 1
         if self.conn:
             self.conn.close()
+            self.conn = None
+
+    def __del__(self):
+        """Cierra las conexiones cuando el objeto es destruido."""
+        self.cerrar()
 
 # --- Fin de db_manager.py ---
\ No newline at end of file
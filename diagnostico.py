@@ -0,0 +1,304 @@
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from time import perf_counter
+
+# Tablas grandes en las que un SCAN (recorrido completo) se marca como problema
+TABLAS_VIGILADAS = ("movimientos", "productos")
+
+# Sólo estas sentencias tienen un plan que valga la pena mostrar (no PRAGMA, CREATE, BEGIN...)
+_CON_PLAN = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+_PALABRAS_RESERVADAS = {
+    "WHERE", "JOIN", "LEFT", "INNER", "CROSS", "ON", "USING", "GROUP", "ORDER", "LIMIT", "SET", "VALUES",
+    "UNION", "EXCEPT", "INTERSECT", "HAVING", "WINDOW", "NATURAL", "AS", "INDEXED", "NOT",
+}
+_TABLA_CON_ALIAS = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_ESCANEO = re.compile(r"^SCAN (\w+)")
+
+
+def normalizar_sql(sql):
+    """Sentencia en una sola línea y sin espacios repetidos: identifica a las sentencias distintas."""
+    return " ".join(sql.split())
+
+
+def tablas_escaneadas(sql, plan):
+    """
+    Tablas vigiladas que el plan recorre completas. Los alias de la sentencia
+    ('FROM movimientos m' -> 'SCAN m') se traducen al nombre de la tabla. No
+    cuenta el recorrido de un índice ya ordenado con LIMIT (la primera página
+    de un listado), porque se detiene al juntar las filas pedidas.
+    """
+    con_limite = re.search(r"\bLIMIT\b", sql, re.IGNORECASE) and not any("FOR ORDER BY" in detalle for detalle in plan)
+    alias = {}
+    for tabla, nombre in _TABLA_CON_ALIAS.findall(sql):
+        alias[tabla.lower()] = tabla.lower()
+        if nombre and nombre.upper() not in _PALABRAS_RESERVADAS:
+            alias[nombre.lower()] = tabla.lower()
+    escaneadas = []
+    for detalle in plan:
+        coincidencia = _ESCANEO.match(detalle)
+        if coincidencia and not (con_limite and "INDEX" in detalle):
+            tabla = alias.get(coincidencia.group(1).lower(), coincidencia.group(1).lower())
+            if tabla in TABLAS_VIGILADAS and tabla not in escaneadas:
+                escaneadas.append(tabla)
+    return escaneadas
+
+
+class Diagnostico:
+    """
+    Acumula, por cada sentencia distinta que ejecutan las conexiones de
+    diagnóstico, su plan (EXPLAIN QUERY PLAN, capturado la primera vez), las
+    tablas vigiladas que recorre completas, cantidad de ejecuciones y tiempos.
+    Las ejecuciones que superan 'umbral_ms' se agregan a 'registro' junto con
+    sus parámetros. Lo comparten la conexión de escritura y las de lectura.
+    """
+
+    def __init__(self, umbral_ms=100, registro=None):
+        self.umbral = umbral_ms / 1000
+        self.registro = registro
+        self._lock = threading.Lock()
+        # sql normalizada -> [plan, escaneos, ejecuciones, tiempo total, máximo]
+        self.sentencias = {}
+        self.lentas = 0
+
+    def necesita_plan(self, sql):
+        with self._lock:
+            return sql not in self.sentencias
+
+    def guardar_plan(self, sql, plan):
+        with self._lock:
+            if sql not in self.sentencias:
+                self.sentencias[sql] = [plan, tablas_escaneadas(sql, plan), 0, 0.0, 0.0]
+                for tabla in self.sentencias[sql][1]:
+                    print(f"Diagnóstico: recorrido completo de '{tabla}' en: {sql[:120]}")
+
+    def registrar(self, sql, parametros, segundos):
+        with self._lock:
+            sentencia = self.sentencias.setdefault(sql, [[], [], 0, 0.0, 0.0])
+            sentencia[2] += 1
+            sentencia[3] += segundos
+            sentencia[4] = max(sentencia[4], segundos)
+            escaneos = sentencia[1]
+            lenta = segundos >= self.umbral
+            if lenta:
+                self.lentas += 1
+        if lenta:
+            self._registrar_lenta(sql, parametros, segundos, escaneos)
+
+    def _registrar_lenta(self, sql, parametros, segundos, escaneos):
+        if not self.registro:
+            return
+        linea = f"{datetime.now():%Y-%m-%d %H:%M:%S} | {segundos * 1000:.1f} ms | {sql} | parámetros: {parametros!r}"
+        if escaneos:
+            linea += f" | recorre: {', '.join(escaneos)}"
+        try:
+            with self._lock, open(self.registro, "a", encoding="utf-8") as archivo:
+                archivo.write(linea + "\n")
+        except OSError as e:
+            print(f"Error al escribir el registro de consultas lentas en {self.registro}: {e}")
+
+    def reporte(self, solo_problemas=False):
+        """
+        Texto con cada sentencia, sus tiempos y su plan. Primero las que recorren
+        tablas vigiladas y después por tiempo total. Con solo_problemas=True se
+        omiten las que no recorren tablas vigiladas ni superan el umbral.
+        """
+        with self._lock:
+            sentencias = [(sql, list(datos)) for sql, datos in self.sentencias.items()]
+        sentencias.sort(key=lambda item: (not item[1][1], -item[1][3]))
+        lineas = []
+        con_escaneo = 0
+        for sql, (plan, escaneos, n, total, maximo) in sentencias:
+            if escaneos:
+                con_escaneo += 1
+            elif solo_problemas and maximo < self.umbral:
+                continue
+            media = total / n * 1000 if n else 0.0
+            marca = f"  [RECORRE {', '.join(escaneos).upper()}]" if escaneos else ""
+            lineas.append(f"{n} ejecuciones, media {media:.2f} ms, máx. {maximo * 1000:.2f} ms{marca}")
+            lineas.append(f"  {sql}")
+            for detalle in plan:
+                lineas.append(f"    -> {detalle}")
+            lineas.append("")
+        lineas.append(
+            f"{len(sentencias)} sentencias distintas, {con_escaneo} con recorridos completos de "
+            f"{'/'.join(TABLAS_VIGILADAS)}, {self.lentas} ejecuciones sobre {self.umbral * 1000:.0f} ms."
+        )
+        return "\n".join(lineas)
+
+
+class CursorDiagnostico(sqlite3.Cursor):
+    """
+    Cursor que captura el plan de cada sentencia nueva y mide cuánto tarda:
+    execute() más las lecturas de filas hasta que se termina de leer (fetchall,
+    fetchone, el último fetchmany o el fin de la iteración).
+    """
+
+    def execute(self, sql, parametros=()):
+        self._terminar()
+        inicio = perf_counter()
+        super().execute(sql, parametros)
+        self._empezar(sql, parametros, perf_counter() - inicio)
+        return self
+
+    def executemany(self, sql, secuencia):
+        self._terminar()
+        secuencia = list(secuencia)
+        inicio = perf_counter()
+        super().executemany(sql, secuencia)
+        muestra = secuencia[0] if secuencia else ()
+        self._empezar(sql, (f"{len(secuencia)} filas; primera:", muestra), perf_counter() - inicio, plan_con=muestra)
+        return self
+
+    def fetchone(self):
+        inicio = perf_counter()
+        fila = super().fetchone()
+        self._sumar(perf_counter() - inicio, terminar=True)
+        return fila
+
+    def fetchmany(self, size=None):
+        inicio = perf_counter()
+        filas = super().fetchmany(self.arraysize if size is None else size)
+        self._sumar(perf_counter() - inicio, terminar=len(filas) < (self.arraysize if size is None else size))
+        return filas
+
+    def fetchall(self):
+        inicio = perf_counter()
+        filas = super().fetchall()
+        self._sumar(perf_counter() - inicio, terminar=True)
+        return filas
+
+    def __next__(self):
+        inicio = perf_counter()
+        try:
+            fila = super().__next__()
+        except StopIteration:
+            self._sumar(perf_counter() - inicio, terminar=True)
+            raise
+        self._sumar(perf_counter() - inicio)
+        return fila
+
+    def close(self):
+        self._terminar()
+        super().close()
+
+    def __del__(self):
+        # Sentencias que nadie terminó de leer (por ejemplo un PRAGMA que sólo se ejecuta)
+        self._terminar()
+
+    # --- Medición ---
+
+    def _empezar(self, sql, parametros, segundos, plan_con=None):
+        diagnostico = self.connection.diagnostico
+        sql = normalizar_sql(sql)
+        if diagnostico.necesita_plan(sql):
+            diagnostico.guardar_plan(sql, self.connection.plan(sql, parametros if plan_con is None else plan_con))
+        self._en_curso = [sql, parametros, segundos]
+        # Las sentencias que no devuelven filas ya terminaron
+        if self.description is None:
+            self._terminar()
+
+    def _sumar(self, segundos, terminar=False):
+        en_curso = getattr(self, "_en_curso", None)
+        if en_curso is None:
+            return
+        en_curso[2] += segundos
+        if terminar:
+            self._terminar()
+
+    def _terminar(self):
+        en_curso = getattr(self, "_en_curso", None)
+        if en_curso is not None:
+            self._en_curso = None
+            self.connection.diagnostico.registrar(*en_curso)
+
+
+class ConexionDiagnostico(sqlite3.Connection):
+    """
+    Conexión (para sqlite3.connect(factory=...)) cuyos cursores reportan a
+    self.diagnostico, que DBManager asigna al abrirla. executescript() no se
+    mide: sólo lo usan las migraciones.
+    """
+    diagnostico = None
+
+    def cursor(self, factory=CursorDiagnostico):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        return self.cursor().executemany(sql, secuencia)
+
+    def plan(self, sql, parametros=()):
+        """Detalle de EXPLAIN QUERY PLAN para la sentencia (vacío si no corresponde o falla)."""
+        if sql.lstrip("( ").split(" ", 1)[0].upper() not in _CON_PLAN:
+            return []
+        try:
+            # Con la clase base para que la consulta del plan no se mida ni se explique a sí misma
+            filas = sqlite3.Connection.execute(self, f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+        except sqlite3.Error as e:
+            return [f"(no se pudo obtener el plan: {e})"]
+        return [fila[3] for fila in filas]
+
+
+# --- Consultas predefinidas para el reporte de herramientas.py ---
+
+def consultas_predefinidas(db):
+    """
+    (nombre, función) para los métodos de DBManager que sólo leen, con parámetros
+    tomados de la propia base (un producto, una categoría y el último mes con movimientos).
+    """
+    productos = db.obtener_productos_combo()
+    producto_id, nombre = productos[len(productos) // 2] if productos else (0, "")
+    codigo = (db.catalogo.producto(producto_id) or ("", ""))[0]
+    categorias = db.obtener_todas_categorias_combo()
+    categoria = categorias[0] if categorias else ""
+    # Con MIN y MAX en subconsultas separadas cada una usa el índice de fecha
+    primera, ultima = db.conn.execute(
+        "SELECT (SELECT MIN(fecha) FROM movimientos), (SELECT MAX(fecha) FROM movimientos)"
+    ).fetchone()
+    primera = primera or datetime.now().date().isoformat()
+    ultima = ultima or primera
+    mes = ultima[:7]
+    pagina = db.consultar_inventario(limite=15)
+    palabra = nombre.split()[0] if nombre.split() else "a"
+
+    return [
+        ("obtener_productos_combo", db.obtener_productos_combo),
+        ("obtener_id_producto_por_nombre", lambda: db.obtener_id_producto_por_nombre(nombre)),
+        ("obtener_producto_por_id", lambda: db.obtener_producto_por_id(producto_id)),
+        ("obtener_detalle_producto", lambda: (db._invalidar_detalles(), db.obtener_detalle_producto(producto_id))),
+        ("obtener_datos_inventario", db.obtener_datos_inventario),
+        ("contar_inventario", db.contar_inventario),
+        ("contar_inventario (texto y alerta)", lambda: db.contar_inventario(palabra, "Stock bajo")),
+        ("consultar_inventario", lambda: db.consultar_inventario(limite=15)),
+        ("consultar_inventario (siguiente página)",
+         lambda: db.consultar_inventario(despues_de=pagina[-1], limite=15) if pagina else None),
+        ("consultar_inventario (orden stock)", lambda: db.consultar_inventario(orden="stock", limite=15)),
+        ("consultar_inventario (texto)", lambda: db.consultar_inventario(palabra, limite=15)),
+        ("obtener_filas_inventario", lambda: db.obtener_filas_inventario([fila[0] for fila in pagina])),
+        ("iterar_inventario", lambda: sum(len(filas) for filas in db.iterar_inventario())),
+        ("buscar_productos", lambda: db.buscar_productos(palabra)),
+        ("buscar_productos (código)", lambda: db.buscar_productos(codigo, columnas=("codigo",))),
+        ("obtener_cierres", db.obtener_cierres),
+        ("stock_en_fecha (un producto)", lambda: db.stock_en_fecha(producto_id, mes + "-01")),
+        ("stock_en_fecha (todos)", lambda: db.stock_en_fecha(None, mes + "-01")),
+        ("resumen_valoracion", db.resumen_valoracion),
+        ("valoracion_por_categoria", db.valoracion_por_categoria),
+        ("obtener_tablero (mes por día)", lambda: db.obtener_tablero(mes, mes, por_dia=True)),
+        ("obtener_tablero (por mes)", lambda: db.obtener_tablero(primera[:7], mes)),
+        ("obtener_categorias", db.obtener_categorias),
+        ("buscar_categorias", lambda: db.buscar_categorias(categoria[:4])),
+        ("obtener_id_categoria_por_nombre", lambda: db.obtener_id_categoria_por_nombre(categoria)),
+        ("obtener_mapa_categorias", db.obtener_mapa_categorias),
+        ("obtener_mapa_codigos", db.obtener_mapa_codigos),
+        ("obtener_ultimo_movimiento", lambda: db.obtener_ultimo_movimiento(producto_id, "Compra")),
+        ("obtener_movimientos_producto", lambda: db.obtener_movimientos_producto(producto_id)),
+        ("obtener_movimientos_por_fecha (un mes)", lambda: db.obtener_movimientos_por_fecha(mes + "-01", ultima)),
+        ("contar_movimientos (un mes)", lambda: db.contar_movimientos(mes + "-01", ultima)),
+        ("iterar_movimientos (un mes)", lambda: sum(len(filas) for filas in db.iterar_movimientos(mes + "-01", ultima))),
+        ("verificar_stock", db.verificar_stock),
+        ("verificar_cierres", db.verificar_cierres),
+    ]
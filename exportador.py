@@ -0,0 +1,136 @@
+import csv
+import time
+from pathlib import Path
+
+# Columnas de cada exportación: (nombre, tipo para Parquet)
+COLUMNAS_INVENTARIO = [
+    ("id", "int64"), ("codigo", "string"), ("nombre", "string"), ("categoria", "string"),
+    ("laboratorio", "string"), ("stock_actual", "int64"),
+]
+COLUMNAS_MOVIMIENTOS = [
+    ("id", "int64"), ("fecha", "string"), ("codigo", "string"), ("producto", "string"), ("tipo", "string"),
+    ("precio", "float64"), ("cantidad", "int64"), ("observaciones", "string"),
+]
+TAMANO_BLOQUE = 5000
+
+
+class EscritorCSV:
+    """Escribe las filas en un CSV (UTF-8 con BOM para que Excel respete los acentos)."""
+
+    def __init__(self, ruta, columnas):
+        self._archivo = open(ruta, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._archivo)
+        self._writer.writerow([nombre for nombre, tipo in columnas])
+
+    def escribir(self, filas):
+        self._writer.writerows(filas)
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+class EscritorXLSX:
+    """Escribe las filas en un libro de Excel en modo write_only (requiere 'openpyxl')."""
+
+    def __init__(self, ruta, columnas):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ImportError("Para exportar a Excel (.xlsx) instale el paquete 'openpyxl'.")
+        self.ruta = ruta
+        self._libro = Workbook(write_only=True)
+        self._hoja = self._libro.create_sheet()
+        self._hoja.append([nombre for nombre, tipo in columnas])
+
+    def escribir(self, filas):
+        for fila in filas:
+            self._hoja.append(fila)
+
+    def cerrar(self):
+        self._libro.save(self.ruta)
+
+
+class EscritorParquet:
+    """Escribe las filas en un archivo Parquet, un grupo de filas por bloque (requiere 'pyarrow')."""
+
+    def __init__(self, ruta, columnas):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Para exportar a Parquet instale el paquete 'pyarrow'.")
+        self._pa = pa
+        self._esquema = pa.schema([(nombre, getattr(pa, tipo)()) for nombre, tipo in columnas])
+        self._writer = pq.ParquetWriter(ruta, self._esquema)
+
+    def escribir(self, filas):
+        columnas = [list(columna) for columna in zip(*filas)]
+        self._writer.write_table(self._pa.Table.from_arrays(columnas, schema=self._esquema))
+
+    def cerrar(self):
+        self._writer.close()
+
+
+ESCRITORES = {
+    ".csv": EscritorCSV,
+    ".xlsx": EscritorXLSX,
+    ".parquet": EscritorParquet,
+}
+
+
+def exportar_bloques(ruta, columnas, bloques, total, al_progresar=None):
+    """
+    Escribe en 'ruta' los bloques de filas a medida que llegan, de modo que en
+    memoria sólo hay un bloque a la vez. El formato se elige por la extensión
+    (.csv, .xlsx o .parquet). Si algo falla se borra el archivo incompleto.
+
+    al_progresar(escritas, total) se llama después de cada bloque.
+    Retorna un diccionario con el resumen de la exportación.
+    """
+    inicio = time.perf_counter()
+    extension = Path(ruta).suffix.lower()
+    if extension not in ESCRITORES:
+        raise ValueError(f"Formato no soportado: '{extension}'. Use .csv, .xlsx o .parquet.")
+
+    escritor = ESCRITORES[extension](ruta, columnas)
+    escritas = 0
+    try:
+        for filas in bloques:
+            escritor.escribir(filas)
+            escritas += len(filas)
+            if al_progresar:
+                al_progresar(escritas, total)
+        escritor.cerrar()
+    except BaseException:
+        try:
+            escritor.cerrar()
+        finally:
+            Path(ruta).unlink(missing_ok=True)
+        raise
+    finally:
+        # Devuelve la conexión de lectura al pool aunque no se haya leído todo
+        if hasattr(bloques, "close"):
+            bloques.close()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "filas": escritas,
+        "segundos": segundos,
+        "filas_por_segundo": escritas / segundos if segundos > 0 else 0.0,
+        "archivo": str(ruta),
+    }
+
+
+def exportar_inventario(db_manager, ruta, texto="", alerta="Todos", stock_minimo=10, orden="nombre",
+                        tamano_bloque=TAMANO_BLOQUE, al_progresar=None):
+    """Exporta el inventario con los mismos filtros y orden que la pantalla de Inventario."""
+    total = db_manager.contar_inventario(texto, alerta, stock_minimo)
+    bloques = db_manager.iterar_inventario(texto, alerta, stock_minimo, orden, tamano_bloque)
+    return exportar_bloques(ruta, COLUMNAS_INVENTARIO, bloques, total, al_progresar)
+
+
+def exportar_movimientos(db_manager, ruta, desde=None, hasta=None, tamano_bloque=TAMANO_BLOQUE, al_progresar=None):
+    """Exporta los movimientos entre dos fechas ISO (inclusive); sin fechas exporta todos."""
+    total = db_manager.contar_movimientos(desde, hasta)
+    bloques = db_manager.iterar_movimientos(desde, hasta, tamano_bloque)
+    return exportar_bloques(ruta, COLUMNAS_MOVIMIENTOS, bloques, total, al_progresar)
@@ -0,0 +1,293 @@
+"""
+Herramientas de línea de comandos para tareas masivas sobre la base de datos.
+
+Uso:
+    python herramientas.py importar-movimientos archivo.csv [--lote 5000] [--rechazos rechazos.csv]
+    python herramientas.py importar-productos catalogo.csv [--lote 5000] [--rechazos rechazos.csv] [--simular]
+    python herramientas.py exportar-inventario inventario.xlsx [--buscar texto] [--alerta "Stock bajo"] [--orden stock]
+    python herramientas.py exportar-movimientos movimientos.parquet [--desde dd/mm/aaaa] [--hasta dd/mm/aaaa]
+    python herramientas.py verificar-stock [--reparar]
+    python herramientas.py crear-cierre [--fecha dd/mm/aaaa | --mensuales]
+    python herramientas.py verificar-cierres [--reparar]
+    python herramientas.py stock-en-fecha dd/mm/aaaa [--codigo PROD001]
+    python herramientas.py valoracion [--metodo fifo]
+    python herramientas.py diagnostico [--base otra.db] [--umbral-ms 50] [--solo-problemas]
+"""
+import argparse
+import time
+from datetime import date
+
+from db_manager import DBManager, ORDENES_INVENTARIO, cargar_configuracion, fecha_a_iso, fecha_desde_iso
+from diagnostico import consultas_predefinidas
+from exportador import TAMANO_BLOQUE, exportar_inventario, exportar_movimientos
+from importador import TAMANO_LOTE, importar_movimientos, importar_productos
+from valoracion import METODOS_VALORACION
+
+
+def mostrar_progreso(procesadas, total, guardadas, rechazadas):
+    porcentaje = procesadas / total * 100 if total else 100.0
+    print(f"\r  {procesadas}/{total} filas ({porcentaje:.0f}%) - {guardadas} guardadas, {rechazadas} rechazadas", end="", flush=True)
+
+
+def comando_importar_movimientos(args):
+    db_manager = DBManager()
+    resumen = importar_movimientos(
+        db_manager, args.archivo, tamano_lote=args.lote, ruta_rechazos=args.rechazos, al_progresar=mostrar_progreso
+    )
+    print()
+    print(
+        f"Importación terminada en {resumen['segundos']:.2f} s "
+        f"({resumen['filas_por_segundo']:.0f} filas/s): "
+        f"{resumen['insertadas']} insertadas, {resumen['rechazadas']} rechazadas."
+    )
+    if resumen["archivo_rechazos"]:
+        print(f"Filas rechazadas y motivos en '{resumen['archivo_rechazos']}'.")
+
+
+def comando_importar_productos(args):
+    db_manager = DBManager()
+    resumen = importar_productos(
+        db_manager, args.archivo, tamano_lote=args.lote, ruta_rechazos=args.rechazos,
+        simular=args.simular, al_progresar=mostrar_progreso
+    )
+    print()
+    if resumen["simulacion"]:
+        print("Simulación: no se guardó ningún cambio.")
+    print(
+        f"Importación terminada en {resumen['segundos']:.2f} s "
+        f"({resumen['segundos_base_datos']:.2f} s en la base de datos, {resumen['filas_por_segundo']:.0f} filas/s): "
+        f"{resumen['insertadas']} insertados, {resumen['actualizadas']} actualizados, "
+        f"{resumen['sin_cambios']} sin cambios, {resumen['rechazadas']} rechazados."
+    )
+    if resumen["categorias_creadas"]:
+        print(f"Categorías nuevas: {', '.join(resumen['categorias_creadas'])}.")
+    if resumen["archivo_rechazos"]:
+        print(f"Filas rechazadas y motivos en '{resumen['archivo_rechazos']}'.")
+
+
+def fecha_argumento(texto):
+    """Convierte una fecha dd/mm/aaaa de la línea de comandos a ISO."""
+    try:
+        return fecha_a_iso(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida '{texto}', use dd/mm/aaaa")
+
+
+def mostrar_progreso_exportacion(escritas, total):
+    porcentaje = escritas / total * 100 if total else 100.0
+    print(f"\r  {escritas}/{total} filas ({porcentaje:.0f}%)", end="", flush=True)
+
+
+def mostrar_resumen_exportacion(resumen):
+    print()
+    print(
+        f"Se exportaron {resumen['filas']} filas a '{resumen['archivo']}' en {resumen['segundos']:.2f} s "
+        f"({resumen['filas_por_segundo']:.0f} filas/s)."
+    )
+
+
+def comando_exportar_inventario(args):
+    db_manager = DBManager()
+    resumen = exportar_inventario(
+        db_manager, args.archivo, texto=args.buscar, alerta=args.alerta, stock_minimo=args.stock_minimo,
+        orden=args.orden, tamano_bloque=args.bloque, al_progresar=mostrar_progreso_exportacion
+    )
+    mostrar_resumen_exportacion(resumen)
+
+
+def comando_exportar_movimientos(args):
+    db_manager = DBManager()
+    resumen = exportar_movimientos(
+        db_manager, args.archivo, args.desde, args.hasta, tamano_bloque=args.bloque, al_progresar=mostrar_progreso_exportacion
+    )
+    mostrar_resumen_exportacion(resumen)
+
+
+def comando_verificar_stock(args):
+    db_manager = DBManager()
+    inicio = time.perf_counter()
+    diferencias = db_manager.verificar_stock(reparar=args.reparar)
+    codigos = {producto_id: codigo for codigo, producto_id in db_manager.obtener_mapa_codigos().items()}
+    for producto_id, registrado, calculado in diferencias:
+        registrado = "sin saldo" if registrado is None else registrado
+        print(f"  Producto {codigos.get(producto_id, producto_id)}: registrado {registrado}, según el libro {calculado}")
+    if not diferencias:
+        print(f"El stock de todos los productos coincide con el libro ({time.perf_counter() - inicio:.2f} s).")
+    elif args.reparar:
+        print(f"Se repararon {len(diferencias)} saldos.")
+    else:
+        print(f"{len(diferencias)} productos con diferencias. Use --reparar para corregirlos.")
+
+
+def comando_crear_cierre(args):
+    db_manager = DBManager()
+    if args.mensuales:
+        inicio = time.perf_counter()
+        creados = db_manager.crear_cierres_mensuales()
+        for fecha, saldos in creados:
+            print(f"Cierre {fecha_desde_iso(fecha)}: {saldos} saldos.")
+        print(f"Se crearon {len(creados)} cierres mensuales en {time.perf_counter() - inicio:.2f} s.")
+        return
+
+    fecha = args.fecha or date.today().isoformat()
+    inicio = time.perf_counter()
+    resultado = db_manager.crear_cierre(fecha)
+    if resultado == "DUPLICATE":
+        print(f"Ya existe un cierre el {fecha_desde_iso(fecha)}.")
+    elif resultado is not None:
+        print(f"Cierre {fecha_desde_iso(fecha)} creado con {resultado} saldos en {time.perf_counter() - inicio:.2f} s.")
+
+
+def comando_verificar_cierres(args):
+    db_manager = DBManager()
+    cierres = db_manager.obtener_cierres()
+    print(f"Cierres registrados: {len(cierres)}.")
+    inicio = time.perf_counter()
+    diferencias = db_manager.verificar_cierres(reparar=args.reparar)
+    for fecha, producto_id, registrado, calculado in diferencias:
+        print(f"  Cierre {fecha_desde_iso(fecha)}, producto {producto_id}: registrado {registrado}, según el libro {calculado}")
+    if not diferencias:
+        print(f"Todos los cierres coinciden con el libro ({time.perf_counter() - inicio:.2f} s).")
+    elif args.reparar:
+        print(f"Se repararon {len(diferencias)} saldos.")
+    else:
+        print(f"{len(diferencias)} saldos con diferencias. Use --reparar para corregirlos.")
+
+
+def comando_stock_en_fecha(args):
+    db_manager = DBManager()
+    if args.codigo:
+        producto_id = db_manager.obtener_mapa_codigos().get(args.codigo)
+        if producto_id is None:
+            print(f"No existe un producto con código '{args.codigo}'.")
+            return
+        print(f"Stock de {args.codigo} al {fecha_desde_iso(args.fecha)}: {db_manager.stock_en_fecha(producto_id, args.fecha)}")
+        return
+
+    saldos = db_manager.stock_en_fecha(None, args.fecha) or {}
+    codigos = {producto_id: codigo for codigo, producto_id in db_manager.obtener_mapa_codigos().items()}
+    print(f"Stock al {fecha_desde_iso(args.fecha)} ({len(saldos)} productos con saldo):")
+    for producto_id, cantidad in sorted(saldos.items()):
+        print(f"  {codigos.get(producto_id, producto_id)}: {cantidad}")
+
+
+def comando_valoracion(args):
+    db_manager = DBManager()
+    inicio = time.perf_counter()
+    procesados = db_manager.actualizar_valoracion(args.metodo)
+    print(f"Valoración ({METODOS_VALORACION[args.metodo]}): {procesados} movimientos nuevos procesados en {time.perf_counter() - inicio:.2f} s.")
+    for categoria, valor, costo_ventas, ingresos in db_manager.valoracion_por_categoria(args.metodo):
+        print(f"  {categoria}: stock ${valor:,.2f}, costo de ventas ${costo_ventas:,.2f}, ventas ${ingresos:,.2f}")
+    valor, costo_ventas, ingresos = db_manager.resumen_valoracion(args.metodo)
+    print(
+        f"Total: stock ${valor:,.2f}, costo de ventas ${costo_ventas:,.2f}, ventas ${ingresos:,.2f}, "
+        f"margen bruto ${ingresos - costo_ventas:,.2f}"
+    )
+
+
+def comando_diagnostico(args):
+    config = cargar_configuracion()
+    if args.base:
+        config["archivo"] = args.base
+    if args.umbral_ms is not None:
+        config["umbral_lento_ms"] = args.umbral_ms
+    config["diagnostico"] = True
+    db_manager = DBManager(config)
+    if db_manager.conn is None:
+        return
+
+    print(f"Ejecutando las consultas predefinidas sobre '{config['archivo']}':")
+    for nombre, funcion in consultas_predefinidas(db_manager):
+        inicio = time.perf_counter()
+        try:
+            funcion()
+        except Exception as e:
+            print(f"  {nombre}: error ({e})")
+            continue
+        print(f"  {nombre}: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    print()
+    print(db_manager.reporte_diagnostico(args.solo_problemas))
+    if db_manager.diagnostico.lentas:
+        print(f"Sentencias lentas y sus parámetros en '{config['registro_lento']}'.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Herramientas del Sistema de Inventario.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    importar = subparsers.add_parser(
+        "importar-movimientos", help="Importa movimientos desde un archivo CSV, JSON o JSON Lines."
+    )
+    importar.add_argument("archivo", help="Archivo con columnas codigo, fecha, tipo, precio, cantidad, observaciones.")
+    importar.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por transacción.")
+    importar.add_argument("--rechazos", help="Archivo CSV para las filas rechazadas.")
+    importar.set_defaults(funcion=comando_importar_movimientos)
+
+    productos = subparsers.add_parser(
+        "importar-productos", help="Inserta o actualiza productos (por código) desde un archivo CSV, JSON o JSON Lines."
+    )
+    productos.add_argument("archivo", help="Archivo con columnas codigo, nombre, categoria, laboratorio.")
+    productos.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por transacción.")
+    productos.add_argument("--rechazos", help="Archivo CSV para las filas rechazadas.")
+    productos.add_argument("--simular", action="store_true", help="Valida y cuenta los cambios sin guardarlos.")
+    productos.set_defaults(funcion=comando_importar_productos)
+
+    inventario = subparsers.add_parser(
+        "exportar-inventario", help="Exporta el inventario a CSV, XLSX o Parquet (según la extensión)."
+    )
+    inventario.add_argument("archivo", help="Archivo de salida (.csv, .xlsx o .parquet).")
+    inventario.add_argument("--buscar", default="", help="Texto de búsqueda (código, nombre, categoría o laboratorio).")
+    inventario.add_argument("--alerta", default="Todos", choices=["Todos", "Stock bajo", "Sin stock"])
+    inventario.add_argument("--stock-minimo", type=int, default=10, help="Límite de 'Stock bajo'.")
+    inventario.add_argument("--orden", default="nombre", choices=sorted(ORDENES_INVENTARIO))
+    inventario.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Filas leídas por bloque.")
+    inventario.set_defaults(funcion=comando_exportar_inventario)
+
+    movimientos = subparsers.add_parser(
+        "exportar-movimientos", help="Exporta los movimientos de un rango de fechas a CSV, XLSX o Parquet."
+    )
+    movimientos.add_argument("archivo", help="Archivo de salida (.csv, .xlsx o .parquet).")
+    movimientos.add_argument("--desde", type=fecha_argumento, help="Fecha inicial dd/mm/aaaa (inclusive).")
+    movimientos.add_argument("--hasta", type=fecha_argumento, help="Fecha final dd/mm/aaaa (inclusive).")
+    movimientos.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Filas leídas por bloque.")
+    movimientos.set_defaults(funcion=comando_exportar_movimientos)
+
+    stock_actual = subparsers.add_parser("verificar-stock", help="Compara la tabla de stock con el libro de movimientos.")
+    stock_actual.add_argument("--reparar", action="store_true", help="Corrige los saldos con diferencias.")
+    stock_actual.set_defaults(funcion=comando_verificar_stock)
+
+    cierre = subparsers.add_parser("crear-cierre", help="Guarda el saldo de cada producto a una fecha.")
+    grupo_cierre = cierre.add_mutually_exclusive_group()
+    grupo_cierre.add_argument("--fecha", type=fecha_argumento, help="Fecha del cierre dd/mm/aaaa (por defecto hoy).")
+    grupo_cierre.add_argument("--mensuales", action="store_true", help="Crea los cierres de fin de mes que falten.")
+    cierre.set_defaults(funcion=comando_crear_cierre)
+
+    verificar = subparsers.add_parser("verificar-cierres", help="Compara los cierres con el libro de movimientos.")
+    verificar.add_argument("--reparar", action="store_true", help="Corrige los saldos con diferencias.")
+    verificar.set_defaults(funcion=comando_verificar_cierres)
+
+    stock = subparsers.add_parser("stock-en-fecha", help="Stock al final de una fecha, usando el último cierre.")
+    stock.add_argument("fecha", type=fecha_argumento, help="Fecha dd/mm/aaaa.")
+    stock.add_argument("--codigo", help="Código del producto (por defecto todos).")
+    stock.set_defaults(funcion=comando_stock_en_fecha)
+
+    valoracion = subparsers.add_parser("valoracion", help="Actualiza y muestra la valoración del inventario por categoría.")
+    valoracion.add_argument("--metodo", default="promedio", choices=sorted(METODOS_VALORACION))
+    valoracion.set_defaults(funcion=comando_valoracion)
+
+    diagnostico = subparsers.add_parser(
+        "diagnostico", help="Ejecuta las consultas predefinidas y muestra el plan y la latencia de cada sentencia."
+    )
+    diagnostico.add_argument("--base", help="Archivo de base de datos (por defecto el de config.ini).")
+    diagnostico.add_argument("--umbral-ms", type=int, help="Latencia a partir de la cual una sentencia es lenta.")
+    diagnostico.add_argument(
+        "--solo-problemas", action="store_true", help="Muestra sólo las sentencias lentas o con recorridos completos."
+    )
+    diagnostico.set_defaults(funcion=comando_diagnostico)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
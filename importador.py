@@ -0,0 +1,263 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from db_manager import validar_movimiento
+
+# Columnas esperadas en los archivos de movimientos
+COLUMNAS_MOVIMIENTOS = ["codigo", "fecha", "tipo", "precio", "cantidad", "observaciones"]
+# Columnas esperadas en los archivos de catálogo de productos
+COLUMNAS_PRODUCTOS = ["codigo", "nombre", "categoria", "laboratorio"]
+TAMANO_LOTE = 5000
+
+
+def contar_filas(ruta):
+    """
+    Cuenta las filas de datos del archivo para poder mostrar el progreso.
+    En CSV y JSON Lines cuenta saltos de línea leyendo en bloques binarios.
+    """
+    ruta = Path(ruta)
+    if ruta.suffix.lower() == ".json":
+        with open(ruta, encoding="utf-8") as f:
+            return len(json.load(f))
+    lineas = 0
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            lineas += bloque.count(b"\n")
+    # En CSV la primera línea es la cabecera
+    return max(lineas - 1, 0) if ruta.suffix.lower() == ".csv" else lineas
+
+
+def leer_filas(ruta):
+    """
+    Recorre el archivo fila a fila y produce (número de línea, dict).
+    Soporta CSV (separado por ',' o ';', con cabecera), JSON Lines (.jsonl/.ndjson,
+    un objeto por línea) y JSON (.json, una lista de objetos; se carga completo).
+    """
+    ruta = Path(ruta)
+    extension = ruta.suffix.lower()
+    if extension == ".csv":
+        with open(ruta, newline="", encoding="utf-8-sig") as f:
+            muestra = f.read(4096)
+            f.seek(0)
+            delimitador = ";" if muestra.count(";") > muestra.count(",") else ","
+            for fila in csv.DictReader(f, delimiter=delimitador):
+                yield None, fila
+    elif extension in (".jsonl", ".ndjson"):
+        with open(ruta, encoding="utf-8") as f:
+            for numero, linea in enumerate(f, start=1):
+                if linea.strip():
+                    yield numero, json.loads(linea)
+    elif extension == ".json":
+        with open(ruta, encoding="utf-8") as f:
+            for numero, fila in enumerate(json.load(f), start=1):
+                yield numero, fila
+    else:
+        raise ValueError(f"Formato no soportado: '{extension}'. Use .csv, .jsonl, .ndjson o .json.")
+
+
+class ArchivoRechazos:
+    """CSV con las filas rechazadas y el motivo. El archivo sólo se crea si hay rechazos."""
+
+    def __init__(self, ruta, columnas):
+        self.ruta = ruta
+        self.columnas = columnas + ["linea", "motivo"]
+        self._archivo = None
+        self._writer = None
+
+    def agregar(self, linea, fila, motivo):
+        if self._writer is None:
+            self._archivo = open(self.ruta, "w", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._archivo, fieldnames=self.columnas, extrasaction="ignore")
+            self._writer.writeheader()
+        self._writer.writerow({**fila, "linea": linea, "motivo": motivo})
+
+    def cerrar(self):
+        if self._archivo is not None:
+            self._archivo.close()
+
+
+def normalizar_fila(fila):
+    """Convierte los valores de la fila a texto sin espacios extremos. Retorna None si no es un objeto."""
+    if not isinstance(fila, dict):
+        return None
+    return {clave: ("" if valor is None else str(valor).strip()) for clave, valor in fila.items()}
+
+
+def importar_movimientos(db_manager, ruta, tamano_lote=TAMANO_LOTE, ruta_rechazos=None, al_progresar=None):
+    """
+    Importa movimientos desde un archivo CSV/JSON leyendo fila a fila.
+    Cada fila se valida igual que en el formulario de Movimientos y el producto se
+    resuelve por 'codigo' con un mapa en memoria. Las filas válidas se insertan en
+    lotes de 'tamano_lote' por transacción; las inválidas van al archivo de rechazos
+    (por defecto '<archivo>.rechazos.csv') con el motivo.
+
+    al_progresar(procesadas, total, insertadas, rechazadas) se llama cada 'tamano_lote' filas y al final.
+    Retorna un diccionario con el resumen de la importación.
+    """
+    inicio = time.perf_counter()
+    ruta_rechazos = ruta_rechazos or f"{ruta}.rechazos.csv"
+    total = contar_filas(ruta)
+    codigos = db_manager.obtener_mapa_codigos()
+    rechazos = ArchivoRechazos(ruta_rechazos, COLUMNAS_MOVIMIENTOS)
+
+    procesadas = insertadas = rechazadas = 0
+    lote = []
+    filas_lote = []
+
+    def guardar_lote():
+        nonlocal insertadas, rechazadas
+        if not lote:
+            return
+        if db_manager.insertar_movimientos_lote(lote) is None:
+            # El lote completo se revierte: se informan todas sus filas
+            for linea, fila in filas_lote:
+                rechazos.agregar(linea, fila, "Error de base de datos al insertar el lote.")
+            rechazadas += len(lote)
+        else:
+            insertadas += len(lote)
+        lote.clear()
+        filas_lote.clear()
+
+    try:
+        for numero, fila in leer_filas(ruta):
+            procesadas += 1
+            # En CSV la línea 1 es la cabecera
+            linea = numero if numero is not None else procesadas + 1
+            if al_progresar and procesadas % tamano_lote == 0:
+                al_progresar(procesadas, total, insertadas, rechazadas)
+            fila = normalizar_fila(fila)
+            if fila is None:
+                rechazos.agregar(linea, {}, "La fila no es un objeto con columnas.")
+                rechazadas += 1
+                continue
+            try:
+                producto_id = codigos.get(fila.get("codigo", ""))
+                if producto_id is None:
+                    raise ValueError(f"No existe un producto con código '{fila.get('codigo', '')}'.")
+                fecha_iso, tipo, precio, cantidad = validar_movimiento(
+                    fila.get("fecha", ""), fila.get("tipo", ""), fila.get("precio", ""), fila.get("cantidad", "")
+                )
+            except ValueError as e:
+                rechazos.agregar(linea, fila, str(e))
+                rechazadas += 1
+                continue
+
+            lote.append((producto_id, fecha_iso, tipo, precio, cantidad, fila.get("observaciones", "")))
+            filas_lote.append((linea, fila))
+            if len(lote) >= tamano_lote:
+                guardar_lote()
+        guardar_lote()
+        if al_progresar:
+            al_progresar(procesadas, total, insertadas, rechazadas)
+    finally:
+        rechazos.cerrar()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "procesadas": procesadas,
+        "insertadas": insertadas,
+        "rechazadas": rechazadas,
+        "segundos": segundos,
+        "filas_por_segundo": procesadas / segundos if segundos > 0 else 0.0,
+        "archivo_rechazos": ruta_rechazos if rechazadas else None,
+    }
+
+
+def importar_productos(db_manager, ruta, tamano_lote=TAMANO_LOTE, ruta_rechazos=None, simular=False, al_progresar=None):
+    """
+    Importa o actualiza el catálogo de productos desde un archivo CSV/JSON, usando
+    'codigo' como clave: los códigos nuevos se insertan y los existentes se actualizan.
+    Las categorías se resuelven con un mapa en memoria y las que faltan se crean en
+    la misma transacción del lote. Como en el formulario de Productos, código,
+    nombre, categoría y laboratorio son obligatorios.
+    Con simular=True se valida y se ejecuta todo, pero cada lote se revierte.
+
+    al_progresar(procesadas, total, escritas, rechazadas) se llama cada 'tamano_lote' filas y al final.
+    Retorna un diccionario con el resumen de la importación.
+    """
+    inicio = time.perf_counter()
+    ruta_rechazos = ruta_rechazos or f"{ruta}.rechazos.csv"
+    total = contar_filas(ruta)
+    codigos = set(db_manager.obtener_mapa_codigos())
+    categorias = db_manager.obtener_mapa_categorias()
+    rechazos = ArchivoRechazos(ruta_rechazos, COLUMNAS_PRODUCTOS)
+
+    procesadas = insertadas = actualizadas = sin_cambios = rechazadas = 0
+    categorias_creadas = set()
+    segundos_base_datos = 0.0
+    lote = []
+    filas_lote = []
+    nuevos_lote = []
+
+    def guardar_lote():
+        nonlocal insertadas, actualizadas, sin_cambios, rechazadas, segundos_base_datos
+        if not lote:
+            return
+        inicio_lote = time.perf_counter()
+        resultado = db_manager.guardar_productos_lote(lote, categorias, simular=simular)
+        segundos_base_datos += time.perf_counter() - inicio_lote
+        if resultado is None:
+            # El lote completo se revierte: se informan todas sus filas
+            for linea, fila in filas_lote:
+                rechazos.agregar(linea, fila, "Error de base de datos al guardar el lote.")
+            rechazadas += len(lote)
+            codigos.difference_update(nuevos_lote)
+        else:
+            escritas, creadas = resultado
+            insertadas += len(nuevos_lote)
+            actualizadas += escritas - len(nuevos_lote)
+            sin_cambios += len(lote) - escritas
+            categorias_creadas.update(creadas)
+        lote.clear()
+        filas_lote.clear()
+        nuevos_lote.clear()
+
+    try:
+        for numero, fila in leer_filas(ruta):
+            procesadas += 1
+            # En CSV la línea 1 es la cabecera
+            linea = numero if numero is not None else procesadas + 1
+            if al_progresar and procesadas % tamano_lote == 0:
+                al_progresar(procesadas, total, insertadas + actualizadas, rechazadas)
+            fila = normalizar_fila(fila)
+            if fila is None:
+                rechazos.agregar(linea, {}, "La fila no es un objeto con columnas.")
+                rechazadas += 1
+                continue
+            valores = [fila.get(columna, "") for columna in COLUMNAS_PRODUCTOS]
+            if not all(valores):
+                rechazos.agregar(linea, fila, "Faltan datos: código, nombre, categoría y laboratorio son obligatorios.")
+                rechazadas += 1
+                continue
+
+            codigo = valores[0]
+            if codigo not in codigos:
+                # Un código repetido más adelante en el archivo cuenta como actualización
+                codigos.add(codigo)
+                nuevos_lote.append(codigo)
+            lote.append(tuple(valores))
+            filas_lote.append((linea, fila))
+            if len(lote) >= tamano_lote:
+                guardar_lote()
+        guardar_lote()
+        if al_progresar:
+            al_progresar(procesadas, total, insertadas + actualizadas, rechazadas)
+    finally:
+        rechazos.cerrar()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "procesadas": procesadas,
+        "insertadas": insertadas,
+        "actualizadas": actualizadas,
+        "sin_cambios": sin_cambios,
+        "rechazadas": rechazadas,
+        "categorias_creadas": sorted(categorias_creadas),
+        "simulacion": simular,
+        "segundos": segundos,
+        "segundos_base_datos": segundos_base_datos,
+        "filas_por_segundo": procesadas / segundos if segundos > 0 else 0.0,
+        "archivo_rechazos": ruta_rechazos if rechazadas else None,
+    }
@@ -0,0 +1,231 @@
+import configparser
+import functools
+import inspect
+import math
+import threading
+from collections import deque
+from datetime import datetime
+from time import perf_counter
+
+CONFIG_FILE = "config.ini"
+
+CONFIGURACION_POR_DEFECTO = {
+    "activa": False,
+    # Archivo donde se agregan los reportes (vacío = no se guardan)
+    "registro": "rendimiento.log",
+    # Cantidad de mediciones recientes por operación sobre las que se calculan los percentiles
+    "ventana": 1000,
+}
+
+# Estado global: se consulta en cada llamada medida, por eso es una simple variable del módulo
+_activa = False
+_ventana = CONFIGURACION_POR_DEFECTO["ventana"]
+_lock = threading.Lock()
+# nombre -> [llamadas, tiempo total, máximo, deque con las últimas duraciones]
+_metricas = {}
+
+
+def cargar_configuracion(ruta=CONFIG_FILE):
+    """
+    Lee la sección [instrumentacion] del archivo indicado. Las claves ausentes o
+    con valores inválidos toman el valor por defecto.
+    """
+    config = dict(CONFIGURACION_POR_DEFECTO)
+    parser = configparser.ConfigParser(inline_comment_prefixes=(";", "#"))
+    if not parser.read(ruta, encoding="utf-8") or not parser.has_section("instrumentacion"):
+        return config
+
+    seccion = parser["instrumentacion"]
+    for clave, por_defecto in CONFIGURACION_POR_DEFECTO.items():
+        if clave not in seccion:
+            continue
+        try:
+            if isinstance(por_defecto, bool):
+                valor = seccion.getboolean(clave)
+            elif isinstance(por_defecto, int):
+                valor = int(seccion[clave])
+                if valor <= 0:
+                    raise ValueError("debe ser mayor que cero")
+            else:
+                valor = seccion[clave].strip()
+        except ValueError as e:
+            print(f"Valor inválido para '{clave}' en {ruta} ({e}); se usa {por_defecto}.")
+            continue
+        config[clave] = valor
+    return config
+
+
+def configurar(config):
+    """Aplica una configuración leída con cargar_configuracion()."""
+    global _ventana
+    _ventana = config["ventana"]
+    if config["activa"]:
+        activar()
+    else:
+        desactivar()
+
+
+# --- Encendido y apagado ---
+
+def activar():
+    global _activa
+    _activa = True
+
+
+def desactivar():
+    global _activa
+    _activa = False
+
+
+def activa():
+    return _activa
+
+
+def reiniciar():
+    """Descarta todas las mediciones acumuladas."""
+    with _lock:
+        _metricas.clear()
+
+
+# --- Medición ---
+
+def registrar(nombre, segundos):
+    """Agrega una duración (en segundos) a la operación indicada. Se puede llamar desde cualquier hilo."""
+    with _lock:
+        metrica = _metricas.get(nombre)
+        if metrica is None:
+            metrica = _metricas[nombre] = [0, 0.0, 0.0, deque(maxlen=_ventana)]
+        metrica[0] += 1
+        metrica[1] += segundos
+        if segundos > metrica[2]:
+            metrica[2] = segundos
+        metrica[3].append(segundos)
+
+
+def medir(nombre=None):
+    """
+    Decorador que mide cada llamada a la función bajo 'nombre' (por defecto su
+    nombre calificado). Apagada la instrumentación sólo agrega una comparación.
+    """
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__qualname__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activa:
+                return funcion(*args, **kwargs)
+            inicio = perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                registrar(etiqueta, perf_counter() - inicio)
+        return envoltura
+    return decorador
+
+
+def medir_metodos(prefijo):
+    """
+    Decorador de clase: aplica medir() a todos sus métodos públicos con el
+    nombre '<prefijo>.<método>'. Los generadores se omiten porque su tiempo
+    depende de quien los consume.
+    """
+    def decorador(clase):
+        for nombre, atributo in list(vars(clase).items()):
+            if nombre.startswith("_") or not inspect.isfunction(atributo) or inspect.isgeneratorfunction(atributo):
+                continue
+            setattr(clase, nombre, medir(f"{prefijo}.{nombre}")(atributo))
+        return clase
+    return decorador
+
+
+class _Tramo:
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        registrar(self.nombre, perf_counter() - self.inicio)
+        return False
+
+
+class _TramoNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+
+_TRAMO_NULO = _TramoNulo()
+
+
+def tramo(nombre):
+    """Context manager que mide el bloque: 'with tramo("inventario.pintar"): ...'."""
+    return _Tramo(nombre) if _activa else _TRAMO_NULO
+
+
+# --- Reportes ---
+
+def _percentil(ordenadas, fraccion):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    indice = max(0, min(len(ordenadas) - 1, math.ceil(fraccion * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+
+def estadisticas():
+    """
+    Retorna {operación: (llamadas, media ms, p50 ms, p95 ms, p99 ms, máximo ms)}.
+    La media y el máximo son de todas las llamadas; los percentiles, de las últimas 'ventana'.
+    """
+    with _lock:
+        copia = {nombre: (n, total, maximo, list(ultimas)) for nombre, (n, total, maximo, ultimas) in _metricas.items()}
+    resultado = {}
+    for nombre, (n, total, maximo, ultimas) in copia.items():
+        ultimas.sort()
+        resultado[nombre] = (
+            n, total / n * 1000,
+            _percentil(ultimas, 0.50) * 1000, _percentil(ultimas, 0.95) * 1000, _percentil(ultimas, 0.99) * 1000,
+            maximo * 1000,
+        )
+    return resultado
+
+
+def reporte(orden="p95"):
+    """Tabla de texto con las operaciones medidas, de la más lenta a la más rápida según 'orden'."""
+    columnas = ("llamadas", "media", "p50", "p95", "p99", "max")
+    posicion = columnas.index(orden) if orden in columnas else 3
+    filas = sorted(estadisticas().items(), key=lambda item: item[1][posicion], reverse=True)
+    if not filas:
+        return "Sin mediciones" + ("" if _activa else " (instrumentación apagada)")
+    ancho = max(len(nombre) for nombre, _ in filas)
+    lineas = [f"{'Operación':<{ancho}} {'n':>7} {'media':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'máx':>9}"]
+    for nombre, (n, media, p50, p95, p99, maximo) in filas:
+        lineas.append(
+            f"{nombre:<{ancho}} {n:>7} {media:>9.2f} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} {maximo:>9.2f}"
+        )
+    return "\n".join(lineas)
+
+
+def volcar(ruta, extra=""):
+    """
+    Agrega al archivo 'ruta' el reporte actual con fecha y hora (tiempos en ms),
+    seguido del texto 'extra' si se indica. Retorna True si se pudo escribir.
+    """
+    try:
+        with open(ruta, "a", encoding="utf-8") as archivo:
+            archivo.write(f"=== {datetime.now():%Y-%m-%d %H:%M:%S} (tiempos en ms) ===\n")
+            archivo.write(reporte() + "\n")
+            if extra:
+                archivo.write(extra + "\n")
+            archivo.write("\n")
+        return True
+    except OSError as e:
+        print(f"Error al guardar el registro de rendimiento en {ruta}: {e}")
+        return False
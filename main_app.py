@@ -1,6 +1,14 @@
+import time
 import customtkinter as ctk
-from tkinter import messagebox
-from db_manager import DBManager
+from tkinter import filedialog, messagebox
+import instrumentacion
+from instrumentacion import medir
+from db_executor import DBExecutor
+from catalogo import CAMBIO_CATEGORIAS, CAMBIO_PRODUCTOS
+from db_manager import fecha_a_iso, fecha_desde_iso, validar_movimiento
+from exportador import exportar_inventario, exportar_movimientos
+from importador import importar_movimientos, importar_productos
+from valoracion import METODOS_VALORACION
 from datetime import date 
 
 # Constante para el stock mínimo, como solicitaste
@@ -42,21 +50,493 @@ class AddEditCategoryModal(ctk.CTkToplevel):
         btn_cancelar.grid(row=0, column=1, padx=5)
 
     def save_action(self):
+        # El guardado es asíncrono: save_command llama a cerrar() si se guardó con éxito.
         nombre = self.entry_nombre.get().strip()
-        if self.save_command(nombre):
+        self.save_command(nombre, self.cerrar)
+
+    def cerrar(self):
+        if self.winfo_exists():
             self.destroy()
 
+# --- COMPONENTE: TABLA CON FILAS RECICLADAS ---
+
+class TablaReciclable(ctk.CTkFrame):
+    """
+    Tabla con un número fijo de filas de widgets creadas una sola vez.
+    Al cambiar los datos sólo se reconfiguran los textos y colores de las
+    celdas que cambiaron; las filas sobrantes se ocultan en lugar de destruirse.
+    """
+    def __init__(self, master, headers, column_widths, filas_visibles, acciones, mensaje_vacio):
+        super().__init__(master, fg_color="transparent")
+        self.column_widths = column_widths
+        # acciones: lista de (texto, comando(datos_fila), opciones extra del CTkButton)
+        self.acciones = acciones
+        self.n_celdas = len(column_widths) - (1 if acciones else 0)
+
+        self.filas = []      # (celdas [(frame, label)], frame de acciones) por fila
+        self.estado = []     # (textos, color) pintados por última vez en cada fila
+        self.visibles = []   # si la fila está actualmente en la cuadrícula
+        self.datos = []      # datos de la fila que reciben los comandos de acciones
+
+        # --- Cabecera de la Tabla (se crea una sola vez) ---
+        for i, header in enumerate(headers):
+            label = ctk.CTkLabel(self, text=header, font=ctk.CTkFont(weight="bold"), width=column_widths[i])
+            # El padding en la derecha del último elemento ayuda a que el scrollbar no tape el contenido.
+            padx_val = (5, 5) if i < len(headers) - 1 else (5, 10)
+            label.grid(row=0, column=i, padx=padx_val, pady=5, sticky="w")
+            self.grid_columnconfigure(i, weight=1)
+
+        for indice in range(filas_visibles):
+            self._crear_fila(indice)
+
+        # Hasta el primer mostrar() la tabla indica que los datos se están cargando
+        self.mensaje_vacio = mensaje_vacio
+        self.label_vacio = ctk.CTkLabel(self, text="Cargando...", fg_color="transparent")
+        self.label_vacio.grid(row=1, column=0, columnspan=len(column_widths), pady=10)
+
+    def _crear_fila(self, indice):
+        """Crea (ocultos) los widgets de una fila del pool."""
+        celdas = []
+        for col_index in range(self.n_celdas):
+            # Usar un CTkFrame como celda para aplicar el color de fondo y ancho
+            cell_frame = ctk.CTkFrame(self, fg_color="transparent", height=30, width=self.column_widths[col_index])
+            cell_frame.grid_propagate(False)
+            cell_frame.grid_columnconfigure(0, weight=1)
+            label = ctk.CTkLabel(cell_frame, text="", fg_color="transparent")
+            label.grid(row=0, column=0, padx=5, sticky="w")
+            celdas.append((cell_frame, label))
+
+        actions_frame = None
+        if self.acciones:
+            actions_frame = ctk.CTkFrame(self, fg_color="transparent", height=30, width=self.column_widths[-1])
+            actions_frame.grid_propagate(False)
+            for j, (texto, comando, opciones) in enumerate(self.acciones):
+                btn = ctk.CTkButton(
+                    actions_frame,
+                    text=texto,
+                    width=40,
+                    command=lambda i=indice, c=comando: c(self.datos[i]),
+                    **opciones
+                )
+                btn.grid(row=0, column=j, padx=(5, 5) if j == 0 else 0)
+
+        self.filas.append((celdas, actions_frame))
+        self.estado.append(((None,) * self.n_celdas, None))
+        self.visibles.append(False)
+        self.datos.append(None)
+
+    def _mostrar_fila(self, indice):
+        celdas, actions_frame = self.filas[indice]
+        for col_index, (cell_frame, _) in enumerate(celdas):
+            cell_frame.grid(row=indice + 1, column=col_index, padx=1, pady=1, sticky="nsew")
+        if actions_frame is not None:
+            actions_frame.grid(row=indice + 1, column=self.n_celdas, padx=1, pady=1, sticky="w")
+        self.visibles[indice] = True
+
+    def _ocultar_fila(self, indice):
+        celdas, actions_frame = self.filas[indice]
+        for cell_frame, _ in celdas:
+            cell_frame.grid_remove()
+        if actions_frame is not None:
+            actions_frame.grid_remove()
+        self.visibles[indice] = False
+
+    def _pintar_fila(self, indice, valores, color):
+        """Actualiza sólo las celdas cuyo texto o color cambió desde el último pintado."""
+        celdas, actions_frame = self.filas[indice]
+        textos_previos, color_previo = self.estado[indice]
+        textos = tuple(str(valor) for valor in valores)
+
+        if color != color_previo:
+            for cell_frame, label in celdas:
+                cell_frame.configure(fg_color=color)
+                label.configure(fg_color=color)
+            if actions_frame is not None:
+                actions_frame.configure(fg_color=color)
+
+        for (_, label), texto, previo in zip(celdas, textos, textos_previos):
+            if texto != previo:
+                label.configure(text=texto)
+
+        self.estado[indice] = (textos, color)
+
+    def mostrar(self, filas):
+        """
+        Muestra las filas indicadas, cada una como (valores, color, datos):
+        valores son los textos de las celdas, color el fondo (None = transparente)
+        y datos lo que reciben los comandos de las acciones.
+        """
+        for indice in range(len(self.filas)):
+            if indice < len(filas):
+                valores, color, datos = filas[indice]
+                self.datos[indice] = datos
+                self._pintar_fila(indice, valores, color or "transparent")
+                if not self.visibles[indice]:
+                    self._mostrar_fila(indice)
+            elif self.visibles[indice]:
+                self._ocultar_fila(indice)
+
+        if filas:
+            self.label_vacio.grid_remove()
+        else:
+            self.label_vacio.configure(text=self.mensaje_vacio)
+            self.label_vacio.grid(row=1, column=0, columnspan=len(self.column_widths), pady=10)
+
+# --- COMPONENTE: BÚSQUEDA DIFERIDA ---
+
+class BusquedaDiferida:
+    """
+    Agrupa las pulsaciones de un campo de búsqueda: espera 'retardo_ms' sin que
+    se escriba, lee los parámetros en el hilo de Tk con preparar(), ejecuta
+    consulta(parametros) en el hilo de la base de datos y entrega el resultado a
+    al_terminar(resultado) de nuevo en el hilo de Tk. Las búsquedas superadas por
+    otra más nueva no llegan a consultarse o su resultado se descarta.
+    """
+    # Teclas que no modifican el texto y por lo tanto no disparan una búsqueda
+    TECLAS_IGNORADAS = {
+        "Up", "Down", "Left", "Right", "Home", "End", "Prior", "Next", "Tab", "Escape",
+        "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R", "Caps_Lock",
+    }
+
+    def __init__(self, widget, db_executor, preparar, consulta, al_terminar, retardo_ms=250):
+        self.widget = widget
+        self.db_executor = db_executor
+        self.preparar = preparar
+        self.consulta = consulta
+        self.al_terminar = al_terminar
+        self.retardo_ms = retardo_ms
+
+        self._pendiente = None        # id del after() que lanzará la próxima búsqueda
+        self._generacion = 0          # contador de búsquedas lanzadas
+        self._esperando = None        # generación cuyo resultado se mostrará (None = ninguna)
+
+    def on_key(self, event=None):
+        """Manejador de <KeyRelease>: reprograma la búsqueda tras el retardo."""
+        if event is not None and event.keysym in self.TECLAS_IGNORADAS:
+            return
+        if self._pendiente is not None:
+            self.widget.after_cancel(self._pendiente)
+        self._pendiente = self.widget.after(self.retardo_ms, self.lanzar)
+
+    def cancelar(self):
+        """Cancela la búsqueda programada y descarta el resultado de la que esté en curso."""
+        if self._pendiente is not None:
+            self.widget.after_cancel(self._pendiente)
+            self._pendiente = None
+        self._esperando = None
+
+    def lanzar(self, event=None):
+        """Ejecuta la búsqueda ya, en segundo plano."""
+        self.cancelar()
+        self._generacion += 1
+        generacion = self._esperando = self._generacion
+        # Con la instrumentación encendida se mide desde el lanzamiento hasta mostrar el resultado
+        inicio = time.perf_counter() if instrumentacion.activa() else None
+
+        def ejecutar(parametros):
+            # Corre en el hilo de la base de datos: si ya hay una búsqueda más nueva, no consulta.
+            if generacion != self._esperando:
+                return None
+            return self.consulta(parametros)
+        ejecutar.__name__ = getattr(self.consulta, "__name__", "busqueda")
+
+        self.db_executor.enviar_lectura(
+            ejecutar, self.preparar(), al_terminar=lambda resultado: self._entregar(generacion, resultado, inicio)
+        )
+
+    def en_curso(self):
+        """True si hay una búsqueda programada o esperando su resultado."""
+        return self._pendiente is not None or self._esperando is not None
+
+    def _entregar(self, generacion, resultado, inicio=None):
+        if generacion == self._esperando:
+            self._esperando = None
+            self.al_terminar(resultado)
+            if inicio is not None:
+                nombre = getattr(self.consulta, "__qualname__", "consulta")
+                instrumentacion.registrar(f"busqueda.{nombre}", time.perf_counter() - inicio)
+
+# --- COMPONENTE: SELECTOR DE PRODUCTO CON BÚSQUEDA ---
+
+class SelectorProducto(ctk.CTkFrame):
+    """
+    Campo para elegir un producto escribiendo parte de su código o nombre. Mientras
+    se escribe muestra las primeras 'limite' coincidencias del índice FTS5 y, al
+    elegir una (clic, o flechas y Enter), guarda su id en 'producto_id'. Así no hace
+    falta resolver el nombre, que puede repetirse entre productos.
+    """
+    LIMITE = 8
+
+    def __init__(self, master, db_executor, limite=LIMITE, al_seleccionar=None):
+        super().__init__(master, fg_color="transparent")
+        self.db_manager = db_executor.db
+        self.limite = limite
+        self.al_seleccionar = al_seleccionar
+        self.producto_id = None
+        self.resultados = []
+        self.indice = -1        # resultado resaltado con las flechas
+
+        self.grid_columnconfigure(0, weight=1)
+        self.entry = ctk.CTkEntry(self, placeholder_text="Buscar por código o nombre...")
+        self.entry.grid(row=0, column=0, sticky="ew")
+
+        # Lista de coincidencias: los botones se crean una vez y se reutilizan
+        self.lista = ctk.CTkFrame(self)
+        self.lista.grid_columnconfigure(0, weight=1)
+        self.botones = []
+        for i in range(limite):
+            boton = ctk.CTkButton(
+                self.lista, text="", anchor="w", fg_color="transparent", text_color=("gray10", "gray90"),
+                hover_color=("gray75", "gray25"), command=lambda i=i: self.seleccionar(*self.resultados[i][:3])
+            )
+            self.botones.append(boton)
+        self.label_sin_resultados = ctk.CTkLabel(self.lista, text="Sin coincidencias", text_color="gray")
+
+        self.busqueda = BusquedaDiferida(
+            self, db_executor, lambda: self.entry.get().strip(), self._buscar, self._mostrar_resultados, retardo_ms=150
+        )
+        self.entry.bind("<KeyRelease>", self._on_key)
+        self.entry.bind("<Down>", lambda event: self._mover(1))
+        self.entry.bind("<Up>", lambda event: self._mover(-1))
+        self.entry.bind("<Return>", self._elegir_resaltado)
+        self.entry.bind("<Escape>", lambda event: self._ocultar_lista())
+
+    def _buscar(self, texto):
+        """Corre en el hilo de lectura."""
+        return self.db_manager.buscar_productos(texto, self.limite, columnas=("codigo", "nombre"))
+
+    def _on_key(self, event):
+        if event.keysym in BusquedaDiferida.TECLAS_IGNORADAS or event.keysym in ("Return", "KP_Enter"):
+            return
+        # Al cambiar el texto se pierde la selección anterior
+        self.producto_id = None
+        if not self.entry.get().strip():
+            self.busqueda.cancelar()
+            self._ocultar_lista()
+            return
+        self.busqueda.on_key(event)
+
+    def _mostrar_resultados(self, resultados):
+        self.resultados = resultados or []
+        self.indice = 0 if self.resultados else -1
+        for i, boton in enumerate(self.botones):
+            if i < len(self.resultados):
+                _, codigo, nombre, _, _, stock = self.resultados[i]
+                boton.configure(text=f"{codigo} - {nombre}   (stock: {stock})")
+                boton.grid(row=i, column=0, sticky="ew", padx=2, pady=1)
+            else:
+                boton.grid_remove()
+        if self.resultados:
+            self.label_sin_resultados.grid_remove()
+        else:
+            self.label_sin_resultados.grid(row=0, column=0, sticky="w", padx=10, pady=2)
+        self._resaltar()
+        self.lista.grid(row=1, column=0, sticky="ew", pady=(2, 0))
+
+    def _resaltar(self):
+        for i, boton in enumerate(self.botones):
+            boton.configure(fg_color=("gray75", "gray25") if i == self.indice else "transparent")
+
+    def _mover(self, paso):
+        if self.resultados:
+            self.indice = (self.indice + paso) % len(self.resultados)
+            self._resaltar()
+        return "break"
+
+    def _elegir_resaltado(self, event=None):
+        if 0 <= self.indice < len(self.resultados) and self.lista.winfo_ismapped():
+            self.seleccionar(*self.resultados[self.indice][:3])
+        return "break"
+
+    def _ocultar_lista(self):
+        self.lista.grid_remove()
+        self.indice = -1
+
+    def seleccionar(self, producto_id, codigo, nombre):
+        """Fija el producto elegido y muestra 'código - nombre' en el campo."""
+        self.busqueda.cancelar()
+        self.producto_id = producto_id
+        self.entry.delete(0, "end")
+        self.entry.insert(0, f"{codigo} - {nombre}")
+        self._ocultar_lista()
+        if self.al_seleccionar:
+            self.al_seleccionar(producto_id)
+
+    def limpiar(self):
+        self.busqueda.cancelar()
+        self.producto_id = None
+        self.entry.delete(0, "end")
+        self._ocultar_lista()
+
+# --- COMPONENTES: IMPORTACIÓN Y EXPORTACIÓN CON PROGRESO ---
+
+class PanelTarea(ctk.CTkFrame):
+    """
+    Botón que lanza una tarea larga sobre archivos en el hilo de la base de datos,
+    con una barra de progreso. La tarea recibe informar(fraccion, texto) para
+    publicar su avance; el hilo de Tk lo lee con after() y lo dibuja.
+    """
+    INTERVALO_PROGRESO_MS = 100
+
+    def __init__(self, master, db_executor, texto_boton, descripcion, comando):
+        super().__init__(master)
+        self.db_executor = db_executor
+        self.grid_columnconfigure(1, weight=1)
+
+        self.btn_accion = ctk.CTkButton(self, text=texto_boton, command=comando)
+        self.btn_accion.grid(row=0, column=0, padx=10, pady=10, sticky="w")
+        self.barra = ctk.CTkProgressBar(self)
+        self.barra.set(0)
+        self.barra.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
+        self.lbl_estado = ctk.CTkLabel(self, text=descripcion)
+        self.lbl_estado.grid(row=1, column=0, columnspan=3, padx=10, pady=(0, 10), sticky="w")
+
+        # El hilo de la DB deja aquí el último (fraccion, texto) y Tk lo lee con after()
+        self._progreso = None
+        self._sondeo = None
+
+    def iniciar(self, funcion, *args, al_terminar, lectura=False):
+        """Ejecuta funcion(*args, informar) en segundo plano y luego al_terminar(resultado) en Tk."""
+        self.btn_accion.configure(state="disabled")
+        self.barra.set(0)
+        self.lbl_estado.configure(text="Procesando...")
+        self._progreso = None
+        enviar = self.db_executor.enviar_lectura if lectura else self.db_executor.enviar
+        enviar(self._ejecutar, funcion, args, al_terminar=lambda resultado: self._terminar(resultado, al_terminar))
+        self._sondeo = self.after(self.INTERVALO_PROGRESO_MS, self._mostrar_progreso)
+
+    def informar(self, fraccion, texto):
+        """Publica el avance. Se llama desde el hilo de la DB."""
+        self._progreso = (fraccion, texto)
+
+    def _ejecutar(self, funcion, args):
+        """Corre en el hilo de la DB. Los errores se devuelven como texto para mostrarlos."""
+        try:
+            return funcion(*args, self.informar)
+        except Exception as e:
+            return f"No se pudo completar la operación: {e}"
+
+    def _mostrar_progreso(self):
+        progreso = self._progreso
+        if progreso is not None:
+            fraccion, texto = progreso
+            self.barra.set(fraccion)
+            self.lbl_estado.configure(text=texto)
+        self._sondeo = self.after(self.INTERVALO_PROGRESO_MS, self._mostrar_progreso)
+
+    def _terminar(self, resultado, al_terminar):
+        if self._sondeo is not None:
+            self.after_cancel(self._sondeo)
+            self._sondeo = None
+        self.btn_accion.configure(state="normal")
+
+        if isinstance(resultado, str):
+            self.lbl_estado.configure(text=resultado)
+            messagebox.showerror("Error", resultado)
+            return
+        self.barra.set(1)
+        al_terminar(resultado)
+
+
+class PanelImportacion(PanelTarea):
+    """
+    Importa un archivo elegido por el usuario. importar(ruta, al_progresar, simular)
+    corre en el hilo de la DB y retorna el resumen; resumir(resumen) arma el texto
+    para el usuario y al_terminar(resumen) se llama en el hilo de Tk al finalizar.
+    """
+    def __init__(self, master, db_executor, texto_boton, descripcion, importar, resumir, al_terminar=None, con_simulacion=False):
+        super().__init__(master, db_executor, texto_boton, descripcion, self.importar_archivo_action)
+        self.importar = importar
+        self.resumir = resumir
+        self.al_terminar = al_terminar
+        self.check_simular = None
+        if con_simulacion:
+            self.check_simular = ctk.CTkCheckBox(self, text="Simular (no guardar)")
+            self.check_simular.grid(row=0, column=2, padx=10, pady=10)
+
+    def importar_archivo_action(self):
+        ruta = filedialog.askopenfilename(
+            title="Importar archivo",
+            filetypes=[("CSV o JSON", "*.csv *.json *.jsonl *.ndjson"), ("Todos los archivos", "*.*")]
+        )
+        if not ruta:
+            return
+        simular = bool(self.check_simular.get()) if self.check_simular is not None else False
+        self.iniciar(self._importar_archivo, ruta, simular, al_terminar=self._importacion_terminada)
+
+    def _importar_archivo(self, ruta, simular, informar):
+        def al_progresar(procesadas, total, guardadas, rechazadas):
+            informar(
+                procesadas / total if total else 1,
+                f"{procesadas} de {total} filas: {guardadas} guardadas, {rechazadas} rechazadas"
+            )
+        return self.importar(ruta, al_progresar, simular)
+
+    def _importacion_terminada(self, resumen):
+        texto = self.resumir(resumen)
+        self.lbl_estado.configure(text=texto)
+        if resumen["archivo_rechazos"]:
+            texto += f"\n\nLas filas rechazadas y sus motivos se guardaron en:\n{resumen['archivo_rechazos']}"
+        messagebox.showinfo("Importación Terminada", texto)
+        if self.al_terminar is not None:
+            self.al_terminar(resumen)
+
+
+class PanelExportacion(PanelTarea):
+    """
+    Exporta a CSV, XLSX o Parquet (según la extensión elegida). preparar() lee en
+    el hilo de Tk los parámetros de la exportación (None cancela) y
+    exportar(ruta, parametros, al_progresar) corre en el pool de lectura.
+    """
+    def __init__(self, master, db_executor, texto_boton, descripcion, preparar, exportar, nombre_sugerido):
+        super().__init__(master, db_executor, texto_boton, descripcion, self.exportar_archivo_action)
+        self.preparar = preparar
+        self.exportar = exportar
+        self.nombre_sugerido = nombre_sugerido
+
+    def exportar_archivo_action(self):
+        parametros = self.preparar()
+        if parametros is None:
+            return
+        ruta = filedialog.asksaveasfilename(
+            title="Exportar", initialfile=self.nombre_sugerido, defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx"), ("Parquet", "*.parquet")]
+        )
+        if not ruta:
+            return
+        self.iniciar(self._exportar_archivo, ruta, parametros, al_terminar=self._exportacion_terminada, lectura=True)
+
+    def _exportar_archivo(self, ruta, parametros, informar):
+        def al_progresar(escritas, total):
+            informar(escritas / total if total else 1, f"{escritas} de {total} filas exportadas")
+        return self.exportar(ruta, parametros, al_progresar)
+
+    def _exportacion_terminada(self, resumen):
+        texto = (
+            f"Se exportaron {resumen['filas']} filas en {resumen['segundos']:.1f} s "
+            f"({resumen['filas_por_segundo']:.0f} filas/s)."
+        )
+        self.lbl_estado.configure(text=texto)
+        messagebox.showinfo("Exportación Terminada", f"{texto}\n\nArchivo: {resumen['archivo']}")
+
 # --- CLASE DE VISTA: VER PRODUCTO ---
 
 class VerProductoPage(ctk.CTkFrame):
-    """Muestra los detalles de un producto seleccionado."""
-    def __init__(self, master, db_manager, producto_id, parent_page):
+    """
+    Muestra los detalles de un producto seleccionado. La aplicación crea una sola
+    instancia y la reutiliza para cada producto con mostrar_producto().
+    """
+    ULTIMOS_MOVIMIENTOS = 10
+
+    def __init__(self, master, db_executor, parent_page):
         super().__init__(master, corner_radius=0)
-        self.db_manager = db_manager
-        self.producto_id = producto_id
+        self.db_executor = db_executor
+        self.db_manager = db_executor.db
+        self.producto_id = None
         self.parent_page = parent_page 
         
         self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(4, weight=1)
 
         # Título y Subtítulo
         self.title_label = ctk.CTkLabel(self, text="VER PRODUCTO", font=ctk.CTkFont(size=24, weight="bold"))
@@ -67,42 +547,87 @@ class VerProductoPage(ctk.CTkFrame):
         
         self.details_frame = ctk.CTkFrame(self)
         self.details_frame.grid(row=2, column=0, sticky="ew", padx=20, pady=10)
-        self.details_frame.grid_columnconfigure((0, 1), weight=1)
+        self.details_frame.grid_columnconfigure((1, 3), weight=1)
+
+        # Las etiquetas se crean una vez y sólo cambian su texto entre productos
+        campos = [
+            ("codigo", "Código:"), ("stock_actual", "Stock Actual:"),
+            ("nombre", "Nombre del Producto:"), ("ultimo_precio_compra", "Último Precio de Compra:"),
+            ("categoria", "Categoría:"), ("total_vendido", "Total Vendido:"),
+            ("laboratorio", "Laboratorio:"),
+        ]
+        self.valores = {}
+        for i, (clave, texto) in enumerate(campos):
+            fila, columna = divmod(i, 2)
+            ctk.CTkLabel(self.details_frame, text=texto, font=ctk.CTkFont(weight="bold")).grid(
+                row=fila, column=columna * 2, padx=10, pady=5, sticky="w"
+            )
+            self.valores[clave] = ctk.CTkLabel(self.details_frame, text="")
+            self.valores[clave].grid(row=fila, column=columna * 2 + 1, padx=10, pady=5, sticky="w")
 
-        self.load_product_details()
+        ctk.CTkLabel(self, text="Últimos movimientos", font=ctk.CTkFont(weight="bold")).grid(
+            row=3, column=0, padx=20, pady=(10, 0), sticky="w"
+        )
+        self.scrollable_frame = ctk.CTkScrollableFrame(self, label_text="")
+        self.scrollable_frame.grid(row=4, column=0, sticky="nsew", padx=20, pady=5)
+        self.scrollable_frame.grid_columnconfigure(0, weight=1)
+        self.tabla = TablaReciclable(
+            self.scrollable_frame,
+            headers=["Fecha", "Tipo", "Precio", "Cantidad", "Observaciones"],
+            column_widths=[100, 80, 100, 80, 250],
+            filas_visibles=self.ULTIMOS_MOVIMIENTOS,
+            acciones=[],
+            mensaje_vacio="El producto no tiene movimientos.",
+        )
+        self.tabla.grid(row=0, column=0, sticky="nsew")
         
         # Botón Volver
         btn_back = ctk.CTkButton(self, text="← Volver al Inventario", command=self.go_back)
-        btn_back.grid(row=3, column=0, padx=20, pady=20, sticky="w")
+        btn_back.grid(row=5, column=0, padx=20, pady=20, sticky="w")
+
+    def mostrar_producto(self, producto_id):
+        """Cambia el producto mostrado y pide su ficha a la DB en segundo plano."""
+        self.producto_id = producto_id
+        self.load_product_details()
         
     def load_product_details(self):
-        """Carga y muestra los detalles del producto desde la DB."""
-        for widget in self.details_frame.winfo_children():
-            widget.destroy()
+        """Pide los detalles del producto a la DB en segundo plano."""
+        producto_id = self.producto_id
 
-        datos_producto = self.db_manager.obtener_producto_por_id(self.producto_id)
-        
-        if datos_producto:
-            codigo, nombre, categoria, laboratorio = datos_producto
-            
-            data_map = {
-                "Código:": codigo,
-                "Nombre del Producto:": nombre,
-                "Categoría:": categoria,
-                "Laboratorio:": laboratorio,
+        def mostrar(detalle):
+            # Se ignora la respuesta si mientras tanto se eligió otro producto
+            if producto_id == self.producto_id:
+                self.show_product_details(detalle)
+
+        self.db_executor.enviar_lectura(
+            self.db_manager.obtener_detalle_producto, producto_id, self.ULTIMOS_MOVIMIENTOS, al_terminar=mostrar
+        )
+
+    def show_product_details(self, detalle):
+        """Muestra los detalles del producto recibidos de la DB."""
+        if detalle:
+            self.subtitle_label.configure(
+                text="Detalles del producto seleccionado", text_color=ctk.ThemeManager.theme["CTkLabel"]["text_color"]
+            )
+            ultimo_precio = detalle["ultimo_precio_compra"]
+            textos = {
+                **{clave: detalle[clave] for clave in ("codigo", "nombre", "categoria", "laboratorio")},
+                "stock_actual": detalle["stock_actual"],
+                "ultimo_precio_compra": f"${ultimo_precio:,.2f}" if ultimo_precio is not None else "Sin compras",
+                "total_vendido": detalle["total_vendido"],
             }
-            
-            for i, (label_text, value) in enumerate(data_map.items()):
-                ctk.CTkLabel(self.details_frame, text=label_text, font=ctk.CTkFont(weight="bold")).grid(
-                    row=i, column=0, padx=10, pady=5, sticky="w"
-                )
-                ctk.CTkLabel(self.details_frame, text=value).grid(
-                    row=i, column=1, padx=10, pady=5, sticky="w"
-                )
+            movimientos = detalle["movimientos"]
         else:
-            ctk.CTkLabel(self.details_frame, text="Producto no encontrado.", text_color="red").grid(
-                row=0, column=0, columnspan=2, padx=10, pady=20
-            )
+            self.subtitle_label.configure(text="Producto no encontrado.", text_color="red")
+            textos = {clave: "" for clave in self.valores}
+            movimientos = []
+
+        for clave, label in self.valores.items():
+            label.configure(text=textos[clave] if textos[clave] is not None else "")
+        self.tabla.mostrar([
+            ((fecha_desde_iso(fecha), tipo, f"${precio:,.2f}", cantidad, observaciones or ""), None, None)
+            for fecha, tipo, precio, cantidad, observaciones in movimientos
+        ])
 
     def go_back(self):
         """Regresa a la página de inventario."""
@@ -112,18 +637,36 @@ class VerProductoPage(ctk.CTkFrame):
 
 class InventarioPage(ctk.CTkFrame):
     """Contenido del Módulo de Inventario con cálculo de stock."""
-    def __init__(self, master, db_manager):
+    # Espera tras el último cambio de stock antes de poner al día la valoración
+    RETARDO_VALORACION_MS = 1000
+    COLOR_MAP = {
+        "green": "#0C9E38",  
+        "yellow": "#DCA501", 
+        "red": "#D91414",    
+    }
+
+    def __init__(self, master, db_executor):
         super().__init__(master, corner_radius=0)
-        self.db_manager = db_manager
+        self.db_executor = db_executor
+        self.db_manager = db_executor.db
         
         self.grid_columnconfigure(0, weight=1)
         
-        # Variables de control
-        self.inventario_data = [] 
-        self.filtered_data = [] 
+        # Variables de control (sólo se guarda en memoria la página visible)
+        self.page_data = [] 
+        self.total_items = None  # None hasta la primera carga
+        self.search_params = ("", "Todos")  # (texto, alerta) de la página mostrada
+        self.orden = "nombre"
+        self.metodo = "promedio"  # método de costeo de la valoración (ver valoracion.py)
         self.items_per_page = 15
         self.current_page = 1
         self.total_pages = 0
+        # Cambios hechos desde otras páginas: productos cuya valoración falta releer,
+        # si el resumen está desactualizado y si hay que recargar toda la página
+        self._productos_cambiados = set()
+        self._valoracion_pendiente = False
+        self._recarga_pendiente = False
+        self._valoracion_diferida = None  # after() que agrupa los cambios de stock
         
         # Título y Subtítulo
         ctk.CTkLabel(self, text="INVENTARIO", font=ctk.CTkFont(size=24, weight="bold")).grid(
@@ -144,7 +687,11 @@ class InventarioPage(ctk.CTkFrame):
         self.search_frame.grid(row=0, column=0, sticky="w")
         self.search_entry = ctk.CTkEntry(self.search_frame, placeholder_text="Buscar código, producto, categoría o laboratorio...", width=300)
         self.search_entry.grid(row=0, column=0, padx=(0, 10), sticky="w")
-        self.search_entry.bind("<KeyRelease>", self.filter_inventory) 
+        # La búsqueda se agrupa por pulsaciones y se ejecuta fuera del hilo de Tk
+        self.busqueda = BusquedaDiferida(
+            self, self.db_executor, self._parametros_busqueda, self._consultar_primera_pagina, self._mostrar_primera_pagina
+        )
+        self.search_entry.bind("<KeyRelease>", self.busqueda.on_key) 
 
         # Marco Derecho (Alerta y Paginación)
         self.alert_pag_frame = ctk.CTkFrame(self.controls_frame, fg_color="transparent")
@@ -156,16 +703,28 @@ class InventarioPage(ctk.CTkFrame):
         self.combo_alerta = ctk.CTkComboBox(
             self.alert_pag_frame, 
             values=self.alert_options, 
-            command=self.filter_inventory,
+            command=self.busqueda.lanzar,
             width=120,
             state="readonly"
         )
         self.combo_alerta.set("Todos")
         self.combo_alerta.grid(row=0, column=1, padx=(0, 20), sticky="w")
+
+        # Select del método de costeo
+        ctk.CTkLabel(self.alert_pag_frame, text="Costeo:").grid(row=0, column=2, padx=(0, 5), sticky="w")
+        self.combo_metodo = ctk.CTkComboBox(
+            self.alert_pag_frame,
+            values=list(METODOS_VALORACION.values()),
+            command=self.cambiar_metodo,
+            width=160,
+            state="readonly"
+        )
+        self.combo_metodo.set(METODOS_VALORACION[self.metodo])
+        self.combo_metodo.grid(row=0, column=3, padx=(0, 20), sticky="w")
         
         # Paginación (Se redibuja en draw_pagination_controls)
         self.pagination_frame = ctk.CTkFrame(self.alert_pag_frame, fg_color="transparent")
-        self.pagination_frame.grid(row=0, column=2, sticky="e")
+        self.pagination_frame.grid(row=0, column=4, sticky="e")
         
         # --- Marco Contenedor con Scroll Vertical ---
         self.table_scroll_container = ctk.CTkScrollableFrame(
@@ -177,19 +736,83 @@ class InventarioPage(ctk.CTkFrame):
         self.table_scroll_container.grid(row=3, column=0, sticky="nsew")
         self.grid_rowconfigure(3, weight=1) 
         
-        # Marco interno (Grid) para la tabla. Este marco tendrá un ancho fijo.
-        self.table_grid_frame = ctk.CTkFrame(self.table_scroll_container, fg_color="transparent")
+        # Configuración de columnas (Anchos generosos para asegurar visibilidad)
+        # Código, Producto, Categoría, Laboratorio, Stock Act., Stock Min., Valor Stock, Costo Ventas, Estado, Acciones
+        column_widths = [60, 230, 170, 170, 50, 50, 90, 90, 70, 150] 
+        headers = ["Código", "Producto", "Categoría", "Laboratorio", "Stock Act.", f"Stock Min.", "Valor Stock", "Costo Ventas", "Estado", "Acciones"]
+        acciones = [
+            ("Ver", lambda datos: self.master.master.show_product_details(datos[0]), {}),
+            ("Eliminar", lambda datos: self.delete_product(*datos), {"fg_color": "red", "hover_color": "darkred"}),
+        ]
+
+        # Marco interno (Grid) para la tabla. Las filas se crean una vez y se reutilizan.
+        self.table_grid_frame = TablaReciclable(
+            self.table_scroll_container, headers, column_widths, self.items_per_page,
+            acciones, "No se encontraron productos en el inventario."
+        )
         self.table_grid_frame.grid(row=0, column=0, sticky="nsw") 
+
+        # 💥 CLAVE: Calcular el ancho total de la tabla (incluyendo padding)
+        # 10 columnas * 10 de padding horizontal total por celda = 80px extra
+        # Se agrega un margen adicional para la barra de scroll vertical si aparece
+        TOTAL_WIDTH = sum(column_widths) + (len(column_widths) * 10) + 30 
+
+        # Aplicar el ancho total al marco de la cuadrícula
+        # Esto fuerza al CTkScrollableFrame a mostrar la barra de scroll horizontal 
+        self.table_grid_frame.configure(width=TOTAL_WIDTH)
+        self.table_grid_frame.grid_propagate(False) # Evita que el marco se encoja
+
+        # Resumen de la valoración (todo el inventario, según el método de costeo)
+        self.lbl_resumen = ctk.CTkLabel(self, text="Calculando valoración...", font=ctk.CTkFont(weight="bold"))
+        self.lbl_resumen.grid(row=4, column=0, sticky="w", pady=(10, 0))
+
+        # Exportación del inventario con los filtros y el orden de la pantalla
+        self.panel_exportacion = PanelExportacion(
+            self, db_executor, "Exportar inventario...", "Exporta todos los productos que cumplen la búsqueda y el filtro de alerta.",
+            preparar=lambda: (*self.search_params, self.orden),
+            exportar=lambda ruta, parametros, al_progresar: exportar_inventario(
+                self.db_manager, ruta, parametros[0], parametros[1], STOCK_MINIMO, parametros[2], al_progresar=al_progresar
+            ),
+            nombre_sugerido="inventario.csv"
+        )
+        self.panel_exportacion.grid(row=5, column=0, sticky="ew", pady=(10, 0))
         
-        # Cargar datos iniciales
-        self.load_inventory_data()
+        # Cargar datos iniciales (la valoración se completa en segundo plano)
         self.filter_inventory()
-        
-    def load_inventory_data(self):
-        """Carga todos los datos de inventario con stock calculado."""
-        self.inventario_data = self.db_manager.obtener_datos_inventario()
+        self.actualizar_valoracion()
+        # Cada escritura publica qué productos cambiaron de stock y en cuánto
+        self.db_executor.suscribir_stock(self._stock_cambiado)
+        
+    def load_inventory_page(self, numero_pagina, despues_de=None, antes_de=None):
+        """Pide a la DB sólo las filas de la página indicada según los filtros activos."""
+        parametros = self.search_params
+        texto, alerta = parametros
+
+        def mostrar_pagina(filas):
+            # Se descarta si mientras tanto cambió la búsqueda
+            if parametros != self.search_params:
+                return
+            self.page_data = filas
+            self.current_page = numero_pagina
+            self.draw_inventory_table()
+            self.draw_pagination_controls()
 
-    def get_status_and_color(self, stock):
+        with self.db_executor.accion("Cambiar página del inventario"):
+            self.db_executor.enviar_lectura(
+                self.db_manager.consultar_inventario,
+                texto=texto,
+                alerta=alerta,
+                stock_minimo=STOCK_MINIMO,
+                orden=self.orden,
+                despues_de=despues_de,
+                antes_de=antes_de,
+                limite=self.items_per_page,
+                metodo=self.metodo,
+                al_terminar=mostrar_pagina,
+            )
+
+    @staticmethod
+    def get_status_and_color(stock):
         """Determina el estado y el color de fondo de la fila."""
         stock = int(stock)
         if stock == 0:
@@ -202,146 +825,77 @@ class InventarioPage(ctk.CTkFrame):
             # 🟢 Caso 3: Normal (Stock actual mayor al mínimo)
             return "Normal", "green"
 
+    @staticmethod
+    def cumple_alerta(stock, alerta):
+        """Indica si el stock pasa el filtro de alerta (mismas reglas que DBManager._filtros_inventario)."""
+        if alerta == "Sin stock":
+            return stock == 0
+        if alerta == "Stock bajo":
+            return stock != 0 and stock <= STOCK_MINIMO
+        return True
+
+    @medir("inventario.filter_inventory")
     def filter_inventory(self, event=None):
-        """Filtra la lista de inventario basándose en el texto de búsqueda y la alerta."""
-        search_term = self.search_entry.get().strip().lower()
-        alert_filter = self.combo_alerta.get()
-        
-        # 1. Aplicar filtro de búsqueda general
-        temp_data = []
-        for row in self.inventario_data:
-            text_to_search = f"{row[1]} {row[2]} {row[3]} {row[4]}".lower()
-            if search_term in text_to_search:
-                temp_data.append(row)
-                
-        # 2. Aplicar filtro de alerta
-        self.filtered_data = []
-        for row in temp_data:
-            stock = row[5]
-            status, _ = self.get_status_and_color(stock)
-            
-            if alert_filter == "Todos":
-                self.filtered_data.append(row)
-            elif alert_filter == "Stock bajo" and status == "Stock bajo":
-                self.filtered_data.append(row)
-            elif alert_filter == "Sin stock" and status == "Sin stock":
-                self.filtered_data.append(row)
-            
-        # 3. Reiniciar y dibujar
+        """Filtra el inventario en la DB según el texto de búsqueda y la alerta, y muestra la primera página."""
+        self.busqueda.lanzar()
+
+    def _parametros_busqueda(self):
+        return (self.search_entry.get().strip(), self.combo_alerta.get())
+
+    @medir("inventario.consultar_primera_pagina")
+    def _consultar_primera_pagina(self, parametros):
+        """Cuenta y trae la primera página para (texto, alerta). Corre en el hilo de la DB."""
+        texto, alerta = parametros
+        total = self.db_manager.contar_inventario(texto=texto, alerta=alerta, stock_minimo=STOCK_MINIMO)
+        filas = self.db_manager.consultar_inventario(
+            texto=texto, alerta=alerta, stock_minimo=STOCK_MINIMO, orden=self.orden, limite=self.items_per_page,
+            metodo=self.metodo
+        )
+        return parametros, total, filas
+
+    def _mostrar_primera_pagina(self, resultado):
+        """Muestra la primera página de un resultado; no redibuja si ya es lo que se ve."""
+        parametros, total, filas = resultado
+        self.search_params = parametros
+        if self.current_page == 1 and total == self.total_items and filas == self.page_data:
+            return
+
+        # Reiniciar y dibujar
+        self.total_items = total
+        self.page_data = filas
         self.current_page = 1
         self.draw_inventory_table()
         self.draw_pagination_controls()
 
+    @classmethod
+    def formatear_filas(cls, page_data):
+        """Convierte las filas de la DB en (celdas, color, datos) para TablaReciclable. No toca Tk."""
+        filas = []
+        for producto_id, codigo, nombre, categoria, laboratorio, stock_actual, valor, costo_ventas in page_data:
+            # Determinar el estado y el color de fondo
+            estado, color_key = cls.get_status_and_color(stock_actual)
+            row_color = cls.COLOR_MAP.get(color_key, "transparent")
+            cell_data = [
+                codigo, nombre, categoria, laboratorio, stock_actual, STOCK_MINIMO,
+                f"${valor:,.2f}", f"${costo_ventas:,.2f}", estado
+            ]
+            filas.append((cell_data, row_color, (producto_id, nombre)))
+        return filas
+
+    @medir("inventario.draw_inventory_table")
     def draw_inventory_table(self):
-        """Dibuja la tabla de inventario con los datos paginados."""
-        # Limpiar el marco de la tabla (self.table_grid_frame)
-        for widget in self.table_grid_frame.winfo_children():
-            widget.destroy()
-
-        # Configuración de columnas (Anchos generosos para asegurar visibilidad)
-        # Código, Producto, Categoría, Laboratorio, Stock Act., Stock Min., Estado, Acciones
-        column_widths = [60, 230, 170, 170, 50, 50, 70, 150] 
-        
-        # 💥 CLAVE: Calcular el ancho total de la tabla (incluyendo padding)
-        # 8 columnas * 10 de padding horizontal total por celda = 80px extra
-        # Se agrega un margen adicional para la barra de scroll vertical si aparece
-        TOTAL_WIDTH = sum(column_widths) + (len(column_widths) * 10) + 30 
-
-        # Aplicar el ancho total al marco de la cuadrícula
-        # Esto fuerza al CTkScrollableFrame a mostrar la barra de scroll horizontal 
-        self.table_grid_frame.configure(width=TOTAL_WIDTH)
-        self.table_grid_frame.grid_propagate(False) # Evita que el marco se encoja
-        
-        # --- Cabecera de la Tabla ---
-        headers = ["Código", "Producto", "Categoría", "Laboratorio", "Stock Act.", f"Stock Min.", "Estado", "Acciones"]
-        for i, header in enumerate(headers):
-            label = ctk.CTkLabel(
-                self.table_grid_frame, 
-                text=header, 
-                font=ctk.CTkFont(weight="bold"), 
-                width=column_widths[i]
-            )
-            # El padding en la derecha del último elemento ayuda a que el scrollbar no tape el contenido.
-            padx_val = (5, 5) if i < len(headers) - 1 else (5, 10) 
-            label.grid(row=0, column=i, padx=padx_val, pady=5, sticky="w")
-            
-            # 💡 CLAVE: Aplicar el peso para que las columnas se expandan
-            # Aunque tenemos un ancho fijo, esto ayuda a la distribución interna.
-            self.table_grid_frame.grid_columnconfigure(i, weight=1)
-
-        # --- Paginación y Datos a Mostrar ---
-        start_index = (self.current_page - 1) * self.items_per_page
-        end_index = start_index + self.items_per_page
-        
-        data_to_display = self.filtered_data[start_index:end_index]
-        
-        if not data_to_display:
-            no_data_label = ctk.CTkLabel(self.table_grid_frame, text="No se encontraron productos en el inventario.", fg_color="transparent")
-            no_data_label.grid(row=1, column=0, columnspan=len(headers), pady=10)
-            return
-
-        # --- Filas de Datos ---
-        for i, row_data in enumerate(data_to_display):
-            producto_id, codigo, nombre, categoria, laboratorio, stock_actual = row_data
-            
-            # 1. Determinar el estado y el color de fondo
-            estado, color_key = self.get_status_and_color(stock_actual)
-            
-            color_map = {
-                "green": "#0C9E38",  
-                "yellow": "#DCA501", 
-                "red": "#D91414",    
-            }
-            row_color = color_map.get(color_key, "transparent")
-            
-            row = i + 1  
-            
-            # 2. Dibujar las celdas de la fila
-            cell_data = [codigo, nombre, categoria, laboratorio, stock_actual, STOCK_MINIMO, estado]
-            for col_index, value in enumerate(cell_data):
-                # Usar un CTkFrame como celda para aplicar el color de fondo y ancho
-                cell_frame = ctk.CTkFrame(self.table_grid_frame, fg_color=row_color, height=30, width=column_widths[col_index])
-                cell_frame.grid(row=row, column=col_index, padx=1, pady=1, sticky="nsew")
-                cell_frame.grid_propagate(False) 
-                cell_frame.grid_columnconfigure(0, weight=1)
-
-                ctk.CTkLabel(cell_frame, text=str(value), fg_color=row_color).grid(
-                    row=0, column=0, padx=5, sticky="w"
-                )
-            
-            # 3. Columna Acciones (Botones)
-            actions_frame = ctk.CTkFrame(self.table_grid_frame, fg_color=row_color, height=30, width=column_widths[7])
-            actions_frame.grid(row=row, column=7, padx=1, pady=1, sticky="w")
-            actions_frame.grid_propagate(False) 
-            
-            # Botón Ver
-            btn_view = ctk.CTkButton(
-                actions_frame, 
-                text="Ver", 
-                width=40,
-                command=lambda id=producto_id: self.master.master.show_product_details(id)
-            )
-            btn_view.grid(row=0, column=0, padx=(5, 5))
-            
-            # Botón Eliminar
-            btn_delete = ctk.CTkButton(
-                actions_frame, 
-                text="Eliminar", 
-                width=40,
-                fg_color="red",
-                hover_color="darkred",
-                command=lambda id=producto_id, name=nombre: self.delete_product(id, name)
-            )
-            btn_delete.grid(row=0, column=1)
+        """Dibuja la tabla de inventario con la página cargada."""
+        # --- Filas de Datos (sólo se reconfiguran las celdas que cambiaron) ---
+        self.table_grid_frame.mostrar(self.formatear_filas(self.page_data))
 
     # --- Lógica de Paginación ---
 
+    @medir("inventario.draw_pagination_controls")
     def draw_pagination_controls(self):
         for widget in self.pagination_frame.winfo_children():
             widget.destroy()
 
-        total_items = len(self.filtered_data)
-        self.total_pages = (total_items + self.items_per_page - 1) // self.items_per_page
+        self.total_pages = (self.total_items + self.items_per_page - 1) // self.items_per_page
         
         if self.total_pages <= 1:
             return 
@@ -372,38 +926,218 @@ class InventarioPage(ctk.CTkFrame):
 
     def prev_page(self):
         if self.current_page > 1:
-            self.current_page -= 1
-            self.draw_inventory_table()
-            self.draw_pagination_controls()
+            if self.current_page == 2:
+                self.load_inventory_page(1)
+            else:
+                self.load_inventory_page(self.current_page - 1, antes_de=self.page_data[0])
 
     def next_page(self):
         if self.current_page < self.total_pages:
-            self.current_page += 1
-            self.draw_inventory_table()
-            self.draw_pagination_controls()
+            self.load_inventory_page(self.current_page + 1, despues_de=self.page_data[-1])
 
     # --- Lógica de Acciones (Eliminar y Refrescar) ---
     
     def delete_product(self, product_id, product_name):
         """Elimina un producto y sus movimientos asociados."""
         if messagebox.askyesno("Confirmar Eliminación", f"¡ADVERTENCIA! ¿Está seguro de que desea eliminar el producto '{product_name}'? Se eliminarán también todos los movimientos asociados."):
-            if self.db_manager.eliminar_producto_completo(product_id):
-                messagebox.showinfo("Éxito", f"Producto '{product_name}' y todos sus movimientos han sido eliminados con éxito.")
-                self.refresh_and_redraw()
-            else:
-                messagebox.showerror("Error", "Ocurrió un error al eliminar el producto.")
+            def resultado_eliminacion(resultado):
+                eliminado, recarga = resultado
+                if eliminado:
+                    self._recargado(recarga)
+                    messagebox.showinfo("Éxito", f"Producto '{product_name}' y todos sus movimientos han sido eliminados con éxito.")
+                else:
+                    messagebox.showerror("Error", "Ocurrió un error al eliminar el producto.")
+
+            # Eliminar y recargar la página van en el mismo viaje al hilo de escritura
+            with self.db_executor.accion("Eliminar producto"):
+                self.db_executor.enviar(
+                    self._eliminar_y_recargar, product_id, self._parametros_busqueda(), self.metodo,
+                    al_terminar=resultado_eliminacion
+                )
+
+    def _eliminar_y_recargar(self, product_id, parametros, metodo):
+        """Elimina el producto y, si se pudo, recarga como _recargar(). Corre en el hilo de la DB."""
+        eliminado = self.db_manager.eliminar_producto_completo(product_id)
+        return eliminado, (self._recargar(parametros, metodo) if eliminado else None)
+                
+    # --- Valoración ---
+
+    def cambiar_metodo(self, nombre_metodo):
+        self.metodo = next(clave for clave, nombre in METODOS_VALORACION.items() if nombre == nombre_metodo)
+        self.lbl_resumen.configure(text="Calculando valoración...")
+        self.actualizar_valoracion()
+
+    def actualizar_valoracion(self):
+        """
+        Procesa en el hilo de escritura los movimientos nuevos para el método actual
+        y, en el mismo viaje, trae la primera página y el resumen con los valores al día.
+        """
+        self.db_executor.enviar(
+            self._recargar, self._parametros_busqueda(), self.metodo, al_terminar=self._recargado
+        )
+
+    def _recargar(self, parametros, metodo):
+        """Valoración al día, total, primera página y resumen de una sola vez. Corre en el hilo de escritura."""
+        self.db_manager.actualizar_valoracion(metodo)
+        _, total, filas = self._consultar_primera_pagina(parametros)
+        return parametros, metodo, total, filas, self.db_manager.resumen_valoracion(metodo)
+
+    def _recargado(self, resultado):
+        parametros, metodo, total, filas, resumen = resultado
+        if metodo != self.metodo:
+            return
+        self._mostrar_resumen(resumen)
+        # Si mientras tanto se escribió otra búsqueda, la tabla la pinta esa búsqueda
+        if parametros == self._parametros_busqueda() and not self.busqueda.en_curso():
+            self._mostrar_primera_pagina((parametros, total, filas))
+
+    def cargar_resumen(self):
+        metodo = self.metodo
+
+        def mostrar_resumen(resumen):
+            if metodo == self.metodo:
+                self._mostrar_resumen(resumen)
+
+        self.db_executor.enviar_lectura(self.db_manager.resumen_valoracion, metodo, al_terminar=mostrar_resumen)
+
+    def _mostrar_resumen(self, resumen):
+        valor, costo_ventas, ingresos = resumen
+        self.lbl_resumen.configure(
+            text=f"Valor del inventario: ${valor:,.2f}   |   Costo de ventas: ${costo_ventas:,.2f}   |   "
+                 f"Ventas: ${ingresos:,.2f}   |   Margen bruto: ${ingresos - costo_ventas:,.2f}"
+        )
                 
     def refresh_and_redraw(self):
-        """Recarga los datos y redibuja la tabla y los controles."""
-        self.load_inventory_data()
-        self.filter_inventory() 
+        """Recarga los datos (con la valoración al día) y redibuja la tabla y los controles."""
+        self.actualizar_valoracion()
+
+    def _stock_cambiado(self, cambios):
+        """
+        Aplica sobre la página en memoria los registros de cambio [(producto_id, diferencia)]
+        que publica la base en cada escritura, sin volver a consultarla: suma la diferencia
+        al stock de las filas visibles de esos productos, reevalúa su estado y el filtro de
+        alerta (la fila que deja de cumplirlo se quita) y repinta sólo esas filas. La página
+        actual y el scroll no cambian. Lo que no se puede resolver en memoria (valoración,
+        total de la búsqueda) queda para actualizar_productos(). Se llama en el hilo de Tk.
+        """
+        if self._recarga_pendiente:
+            return
+        diferencias = {}
+        for producto_id, diferencia in cambios:
+            diferencias[producto_id] = diferencias.get(producto_id, 0) + diferencia
+        # El resumen de la valoración cambia aunque el producto no esté a la vista
+        self._valoracion_pendiente = True
+
+        alerta = self.search_params[1]
+        filas = []
+        tocadas = 0
+        for fila in self.page_data:
+            diferencia = diferencias.get(fila[0])
+            if diferencia is None:
+                filas.append(fila)
+                continue
+            tocadas += 1
+            stock = fila[5] + diferencia
+            if self.cumple_alerta(stock, alerta):
+                filas.append(fila[:5] + (stock,) + fila[6:])
+                self._productos_cambiados.add(fila[0])
+
+        quitadas = len(self.page_data) - len(filas)
+        if tocadas:
+            self.page_data = filas
+            self.draw_inventory_table()
+            if quitadas:
+                self.total_items -= quitadas
+                if not filas and self.total_items > 0:
+                    # La página quedó vacía: se vuelve a la primera con los filtros actuales
+                    self.filter_inventory()
+                else:
+                    self.draw_pagination_controls()
+        self._programar_valoracion()
+
+    def _programar_valoracion(self):
+        """Agrupa los cambios de los próximos RETARDO_VALORACION_MS en un solo viaje a la base."""
+        if self._valoracion_diferida is not None:
+            self.after_cancel(self._valoracion_diferida)
+        self._valoracion_diferida = self.after(self.RETARDO_VALORACION_MS, self._valoracion_vencida)
+
+    def _valoracion_vencida(self):
+        self._valoracion_diferida = None
+        # Oculta, la valoración se pone al día recién al volver a mostrarla
+        if self.winfo_ismapped():
+            self.aplicar_cambios_pendientes()
+
+    def actualizar_productos(self, producto_ids):
+        """
+        Pone al día lo que los registros de cambio no alcanzan a resolver en memoria: el
+        valor del stock y el costo de ventas (dependen de los precios y del método de
+        costeo), el resumen y el total de la búsqueda (productos nuevos o que entran o
+        salen del filtro sin estar a la vista). Relee sólo esas columnas de las filas
+        visibles de esos productos, en un viaje, sin tocar el stock ni cambiar de página.
+        """
+        metodo = self.metodo
+        parametros = self.search_params
+        visibles = set(producto_ids) & {fila[0] for fila in self.page_data}
+
+        def parchear(resultado):
+            resumen, total, filas = resultado
+            if metodo != self.metodo:
+                return
+            self._mostrar_resumen(resumen)
+            if parametros != self.search_params:
+                return
+            if filas:
+                self.page_data = [
+                    fila[:6] + filas[fila[0]][6:] if fila[0] in filas else fila for fila in self.page_data
+                ]
+                self.draw_inventory_table()
+            if total != self.total_items:
+                self.total_items = total
+                self.draw_pagination_controls()
+
+        self.db_executor.enviar(self._releer_productos, visibles, parametros, metodo, al_terminar=parchear)
+
+    def _releer_productos(self, producto_ids, parametros, metodo):
+        """Valoración al día, resumen, total y filas de esos productos. Corre en el hilo de escritura."""
+        texto, alerta = parametros
+        self.db_manager.actualizar_valoracion(metodo)
+        return (
+            self.db_manager.resumen_valoracion(metodo),
+            self.db_manager.contar_inventario(texto=texto, alerta=alerta, stock_minimo=STOCK_MINIMO),
+            self.db_manager.obtener_filas_inventario(producto_ids, metodo),
+        )
+
+    def registrar_cambios(self):
+        """
+        Anota que otras páginas agregaron productos en bloque (importación) y hay que
+        recargar la página. Si el inventario está a la vista se recarga ya; si no,
+        recién al volver a mostrarlo. Los cambios de stock no necesitan aviso: llegan
+        solos como registros de cambio (ver _stock_cambiado).
+        """
+        self._recarga_pendiente = True
+        if self.winfo_ismapped():
+            self.aplicar_cambios_pendientes()
+
+    def aplicar_cambios_pendientes(self):
+        """Lo llama App al mostrar la página: un solo viaje a la base por todos los cambios anotados."""
+        if not self._recarga_pendiente and not self._valoracion_pendiente:
+            return
+        with self.db_executor.accion("Actualizar inventario"):
+            if self._recarga_pendiente:
+                self.refresh_and_redraw()
+            else:
+                self.actualizar_productos(self._productos_cambiados)
+        self._recarga_pendiente = False
+        self._valoracion_pendiente = False
+        self._productos_cambiados = set()
 
 # --- CLASES DE VISTA: CATEGORÍAS Y PRODUCTOS ---
 
 class CategoriasPage(ctk.CTkFrame):
-    def __init__(self, master, db_manager):
+    def __init__(self, master, db_executor):
         super().__init__(master, corner_radius=0)
-        self.db_manager = db_manager
+        self.db_executor = db_executor
+        self.db_manager = db_executor.db
         
         self.grid_columnconfigure(0, weight=1)
 
@@ -427,7 +1161,10 @@ class CategoriasPage(ctk.CTkFrame):
         
         self.search_entry = ctk.CTkEntry(self.controls_frame, placeholder_text="Buscar categoría por nombre...")
         self.search_entry.grid(row=0, column=0, padx=(0, 10), sticky="w")
-        self.search_entry.bind("<KeyRelease>", self.filter_categories) 
+        self.busqueda = BusquedaDiferida(
+            self, self.db_executor, lambda: self.search_entry.get().strip().lower(), self._buscar_categorias, self._mostrar_categorias_filtradas
+        )
+        self.search_entry.bind("<KeyRelease>", self.busqueda.on_key) 
         
         self.pagination_frame = ctk.CTkFrame(self.controls_frame, fg_color="transparent")
         self.pagination_frame.grid(row=0, column=1, sticky="e")
@@ -435,57 +1172,55 @@ class CategoriasPage(ctk.CTkFrame):
         self.table_frame = ctk.CTkScrollableFrame(self, label_text="Lista de Categorías")
         self.table_frame.grid(row=4, column=0, sticky="nsew")
         self.grid_rowconfigure(4, weight=1) 
+
+        acciones = [
+            ("Editar", lambda datos: self.open_edit_category_modal(*datos), {}),
+            ("Eliminar", lambda datos: self.delete_category(*datos), {"fg_color": "red", "hover_color": "darkred"}),
+        ]
+        self.tabla = TablaReciclable(
+            self.table_frame, ["N°", "Nombre de la Categoría", "Acciones"], [50, 250, 100],
+            self.items_per_page, acciones, "No hay categorías registradas."
+        )
+        self.tabla.grid(row=0, column=0, sticky="nsw")
         
-        self.load_categories_data()
         self.filtered_data = self.categorias_data
         self.draw_category_table()
         self.draw_pagination_controls()
+        self.load_categories_data()
 
     def load_categories_data(self):
-        self.categorias_data = self.db_manager.obtener_categorias()
+        """Pide las categorías a la DB en segundo plano y vuelve a aplicar el filtro."""
+        def categorias_cargadas(categorias):
+            self.categorias_data = categorias
+            self.filter_categories()
+
+        self.db_executor.enviar_lectura(self.db_manager.obtener_categorias, al_terminar=categorias_cargadas)
         
     def draw_category_table(self):
-        for widget in self.table_frame.winfo_children():
-            widget.destroy()
-
-        column_widths = [50, 250, 100]  
-        headers = ["N°", "Nombre de la Categoría", "Acciones"]
-        for i, header in enumerate(headers):
-            label = ctk.CTkLabel(self.table_frame, text=header, font=ctk.CTkFont(weight="bold"), width=column_widths[i])
-            label.grid(row=0, column=i, padx=(5, 15) if i == 2 else 5, pady=5, sticky="w")
-
         start_index = (self.current_page - 1) * self.items_per_page
         end_index = start_index + self.items_per_page
         data_to_display = self.filtered_data[start_index:end_index]
-        
-        if not data_to_display:
-            ctk.CTkLabel(self.table_frame, text="No hay categorías registradas.", fg_color="transparent").grid(row=1, column=0, columnspan=3, pady=10)
-            return
 
+        filas = []
         for i, (id, nombre) in enumerate(data_to_display):
-            row = i + 1  
             num_display = start_index + i + 1 
-            
-            ctk.CTkLabel(self.table_frame, text=str(num_display)).grid(row=row, column=0, padx=5, pady=5, sticky="w")
-            ctk.CTkLabel(self.table_frame, text=nombre).grid(row=row, column=1, padx=5, pady=5, sticky="w")
-            
-            actions_frame = ctk.CTkFrame(self.table_frame, fg_color="transparent")
-            actions_frame.grid(row=row, column=2, padx=5, pady=5, sticky="w")
-            
-            btn_edit = ctk.CTkButton(actions_frame, text="Editar", width=40, command=lambda id=id, name=nombre: self.open_edit_category_modal(id, name))
-            btn_edit.grid(row=0, column=0, padx=(0, 5))
-            
-            btn_delete = ctk.CTkButton(actions_frame, text="Eliminar", width=40, fg_color="red", hover_color="darkred", command=lambda id=id, name=nombre: self.delete_category(id, name))
-            btn_delete.grid(row=0, column=1)
+            filas.append(((num_display, nombre), None, (id, nombre)))
+
+        self.tabla.mostrar(filas)
 
     def filter_categories(self, event=None):
-        search_term = self.search_entry.get().strip().lower()
+        self.busqueda.lanzar()
 
+    def _buscar_categorias(self, search_term):
+        # Corre en el hilo de la DB: sólo lee datos, no toca widgets.
         if not search_term:
-            self.filtered_data = self.categorias_data
-        else:
-            self.filtered_data = [(id, nombre) for id, nombre in self.categorias_data if search_term in nombre.lower()]
-            
+            return self.categorias_data
+        return self.db_manager.buscar_categorias(search_term)
+
+    def _mostrar_categorias_filtradas(self, filtered_data):
+        if self.current_page == 1 and filtered_data == self.filtered_data:
+            return
+        self.filtered_data = filtered_data
         self.current_page = 1
         self.draw_category_table()
         self.draw_pagination_controls()
@@ -525,64 +1260,65 @@ class CategoriasPage(ctk.CTkFrame):
         AddEditCategoryModal(self.master.master, "Registrar Categoría", self.register_category)
 
     def open_edit_category_modal(self, category_id, current_name):
-        def update_func(name):
-            self.update_category(category_id, name)
+        def update_func(name, cerrar):
+            self.update_category(category_id, name, cerrar)
             
         AddEditCategoryModal(self.master.master, "Editar Categoría", update_func, current_name)
 
-    def register_category(self, name):
+    def register_category(self, name, cerrar):
         if not name:
             messagebox.showerror("Error", "El nombre de la categoría no puede estar vacío.")
-            return False
+            return
 
-        result = self.db_manager.insertar_categoria(name)
+        def resultado_registro(result):
+            if result == "DUPLICATE":
+                messagebox.showerror("Error", f"La categoría '{name}' ya existe.")
+            elif result is not None:
+                messagebox.showinfo("Éxito", f"Categoría '{name}' registrada con éxito.")
+                cerrar()
+                self.refresh_and_redraw()
+            else:
+                messagebox.showerror("Error", "Ocurrió un error al registrar la categoría.")
 
-        if result == "DUPLICATE":
-            messagebox.showerror("Error", f"La categoría '{name}' ya existe.")
-            return False
-        elif result is not None:
-            messagebox.showinfo("Éxito", f"Categoría '{name}' registrada con éxito.")
-            self.refresh_and_redraw()
-            return True
-        else:
-            messagebox.showerror("Error", "Ocurrió un error al registrar la categoría.")
-            return False
+        self.db_executor.enviar(self.db_manager.insertar_categoria, name, al_terminar=resultado_registro)
 
-    def update_category(self, id, new_name):
+    def update_category(self, id, new_name, cerrar):
         if not new_name:
             messagebox.showerror("Error", "El nombre de la categoría no puede estar vacío.")
-            return False
+            return
 
-        result = self.db_manager.actualizar_categoria(id, new_name)
+        def resultado_actualizacion(result):
+            if result == "DUPLICATE":
+                messagebox.showerror("Error", f"La categoría '{new_name}' ya existe.")
+            elif result:
+                messagebox.showinfo("Éxito", f"Categoría actualizada a '{new_name}' con éxito.")
+                cerrar()
+                self.refresh_and_redraw()
+            else:
+                messagebox.showerror("Error", "Ocurrió un error al actualizar la categoría.")
 
-        if result == "DUPLICATE":
-            messagebox.showerror("Error", f"La categoría '{new_name}' ya existe.")
-            return False
-        elif result:
-            messagebox.showinfo("Éxito", f"Categoría actualizada a '{new_name}' con éxito.")
-            self.refresh_and_redraw()
-            return True
-        else:
-            messagebox.showerror("Error", "Ocurrió un error al actualizar la categoría.")
-            return False
+        self.db_executor.enviar(self.db_manager.actualizar_categoria, id, new_name, al_terminar=resultado_actualizacion)
 
     def delete_category(self, id, name):
         if messagebox.askyesno("Confirmar Eliminación", f"¿Está seguro de que desea eliminar la categoría '{name}'?"):
-            if self.db_manager.eliminar_categoria(id):
-                messagebox.showinfo("Éxito", f"Categoría '{name}' eliminada con éxito.")
-                self.refresh_and_redraw()
-            else:
-                messagebox.showerror("Error", "Ocurrió un error al eliminar la categoría.")
+            def resultado_eliminacion(eliminada):
+                if eliminada:
+                    messagebox.showinfo("Éxito", f"Categoría '{name}' eliminada con éxito.")
+                    self.refresh_and_redraw()
+                else:
+                    messagebox.showerror("Error", "Ocurrió un error al eliminar la categoría.")
+
+            self.db_executor.enviar(self.db_manager.eliminar_categoria, id, al_terminar=resultado_eliminacion)
                 
     def refresh_and_redraw(self):
         self.load_categories_data()
-        self.filter_categories() 
 
 
 class ProductosPage(ctk.CTkFrame):
-    def __init__(self, master, db_manager):
+    def __init__(self, master, db_executor):
         super().__init__(master, corner_radius=0)
-        self.db_manager = db_manager
+        self.db_executor = db_executor
+        self.db_manager = db_executor.db
         
         self.grid_columnconfigure(0, weight=1)
 
@@ -605,13 +1341,13 @@ class ProductosPage(ctk.CTkFrame):
 
         # 3. Categoría (ComboBox)
         ctk.CTkLabel(self.form_frame, text="Categoría:").grid(row=2, column=0, padx=10, pady=5, sticky="w")
-        self.categories_names = self.db_manager.obtener_todas_categorias_combo()
-        if not self.categories_names:
-             self.categories_names = ["No hay categorías (Agregue una primero)"]
-        
+        self.categories_names = ["Cargando categorías..."]
         self.combo_categoria = ctk.CTkComboBox(self.form_frame, values=self.categories_names, state="readonly")
         self.combo_categoria.set(self.categories_names[0]) 
         self.combo_categoria.grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+        # Las categorías salen de la caché del catálogo y se actualizan con sus avisos
+        self._categorias_cargadas(self.db_manager.obtener_todas_categorias_combo())
+        self.db_executor.suscribir_catalogo(self._catalogo_cambiado)
 
         # 4. Laboratorio
         ctk.CTkLabel(self.form_frame, text="Laboratorio:").grid(row=3, column=0, padx=10, pady=5, sticky="w")
@@ -621,46 +1357,334 @@ class ProductosPage(ctk.CTkFrame):
         # 5. Botón Registrar
         self.btn_registrar = ctk.CTkButton(self.form_frame, text="Registrar Producto", command=self.registrar_producto_action)
         self.btn_registrar.grid(row=4, column=0, columnspan=2, padx=10, pady=20, sticky="e")
+
+        # 6. Importación del catálogo de proveedores (alta o actualización por código)
+        self.panel_importacion = PanelImportacion(
+            self, db_executor, "Importar catálogo...",
+            "CSV, JSON o JSON Lines con columnas: codigo, nombre, categoria, laboratorio",
+            importar=lambda ruta, al_progresar, simular: importar_productos(
+                self.db_manager, ruta, simular=simular, al_progresar=al_progresar
+            ),
+            resumir=self._resumir_importacion,
+            al_terminar=self._importacion_terminada,
+            con_simulacion=True
+        )
+        self.panel_importacion.grid(row=3, column=0, sticky="ew", padx=20, pady=10)
         
+    def _categorias_cargadas(self, categories_names):
+        seleccionada = self.combo_categoria.get()
+        self.categories_names = categories_names
+        if not self.categories_names:
+             self.categories_names = ["No hay categorías (Agregue una primero)"]
+        self.combo_categoria.configure(values=self.categories_names)
+        # Se conserva la selección si la categoría sigue existiendo
+        self.combo_categoria.set(seleccionada if seleccionada in self.categories_names else self.categories_names[0]) 
+
+    def _catalogo_cambiado(self, tipo):
+        if tipo == CAMBIO_CATEGORIAS:
+            self._categorias_cargadas(self.db_manager.obtener_todas_categorias_combo())
+
     def registrar_producto_action(self):
         codigo = self.entry_codigo.get().strip()
         nombre = self.entry_nombre.get().strip()
         nombre_categoria = self.combo_categoria.get()
         laboratorio = self.entry_laboratorio.get().strip()
         
-        if not all([codigo, nombre, laboratorio]) or nombre_categoria == "No hay categorías (Agregue una primero)":
+        if not all([codigo, nombre, laboratorio]) or nombre_categoria in ("No hay categorías (Agregue una primero)", "Cargando categorías..."):
             messagebox.showerror("Error de Datos", "Los datos ingresados no son correctos. Por favor vuelva a ingresar los datos correctamente.")
             return
 
-        categoria_id = self.db_manager.obtener_id_categoria_por_nombre(nombre_categoria)
-        
-        if categoria_id is None:
-            messagebox.showerror("Error", "Error: No se encontró el ID de la categoría seleccionada. Intente recargar.")
-            return
+        # Se deshabilita el botón hasta que la DB responda para evitar registros dobles
+        self.btn_registrar.configure(state="disabled")
+        # Categoría e inserción en una sola transacción y un solo viaje
+        with self.db_executor.accion("Registrar producto"):
+            self.db_executor.enviar(
+                self.db_manager.registrar_producto, codigo, nombre, nombre_categoria, laboratorio,
+                al_terminar=lambda result: self._resultado_registro(codigo, result)
+            )
 
-        result = self.db_manager.insertar_producto(codigo, nombre, categoria_id, laboratorio)
+    def _resultado_registro(self, codigo, result):
+        self.btn_registrar.configure(state="normal")
 
-        if result == "DUPLICATE_CODE":
+        if result == "NO_CATEGORY":
+            messagebox.showerror("Error", "Error: No se encontró el ID de la categoría seleccionada. Intente recargar.")
+        elif result == "DUPLICATE_CODE":
             messagebox.showerror("Error de Registro", f"El código '{codigo}' ya está registrado para otro producto.")
         elif result is not None:
             messagebox.showinfo("Registro Exitoso", "El producto se registró exitosamente.")
+            # El Inventario se entera por el registro de cambio que publica la base
             self._limpiar_campos()
-            # Al registrar un producto, recargamos el Inventario si existe
-            if "inventario" in self.master.master.pages:
-                self.master.master.pages["inventario"].refresh_and_redraw()
         else:
             messagebox.showerror("Error", "Ocurrió un error desconocido al registrar el producto.")
             
+    def _resumir_importacion(self, resumen):
+        texto = "Simulación (no se guardó nada): " if resumen["simulacion"] else ""
+        texto += (
+            f"{resumen['insertadas']} productos nuevos, {resumen['actualizadas']} actualizados, "
+            f"{resumen['sin_cambios']} sin cambios y {resumen['rechazadas']} rechazados "
+            f"en {resumen['segundos']:.1f} s."
+        )
+        if resumen["categorias_creadas"]:
+            texto += f" Categorías nuevas: {len(resumen['categorias_creadas'])}."
+        return texto
+
+    def _importacion_terminada(self, resumen):
+        if resumen["simulacion"] or not (resumen["insertadas"] or resumen["actualizadas"]):
+            return
+        # Los combos se actualizan solos con los avisos del catálogo; se recargan las tablas
+        pages = self.master.master.pages
+        if "inventario" in pages:
+            pages["inventario"].registrar_cambios()
+        if "categorias" in pages:
+            pages["categorias"].load_categories_data()
+
     def _limpiar_campos(self):
         self.entry_codigo.delete(0, 'end')
         self.entry_nombre.delete(0, 'end')
         self.entry_laboratorio.delete(0, 'end')
 
 
+class EntradaRapida(ctk.CTkFrame):
+    """
+    Modo de carga rápida para el mostrador: cada código escaneado (o escrito y
+    Enter) se resuelve con el índice en memoria del catálogo y se agrega a una
+    lista de pendientes, con precio y cantidad tomados del último movimiento del
+    mismo tipo. Volver a escanear un producto suma una unidad a su línea. La
+    lista se guarda en una sola transacción con "Confirmar" (o F12).
+    """
+    FILAS_VISIBLES = 10
+    OBSERVACION = "Entrada rápida"
+
+    def __init__(self, master, db_executor):
+        super().__init__(master)
+        self.db_executor = db_executor
+        self.db_manager = db_executor.db
+        # (producto_id, tipo) -> [codigo, nombre, cantidad, precio]; el último agregado va al final
+        self.pendientes = {}
+        # (producto_id, tipo) -> (precio, cantidad) del último movimiento conocido
+        self.ultimos = {}
+        self.guardando = False
+
+        self.grid_columnconfigure(1, weight=1)
+
+        ctk.CTkLabel(self, text="Tipo:").grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        self.combo_tipo = ctk.CTkComboBox(self, values=["Venta", "Compra"], state="readonly", width=110)
+        self.combo_tipo.set("Venta")
+        self.combo_tipo.grid(row=0, column=1, padx=10, pady=5, sticky="w")
+
+        ctk.CTkLabel(self, text="Código:").grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.entry_codigo = ctk.CTkEntry(self, placeholder_text="Escanee o escriba el código y presione Enter")
+        self.entry_codigo.grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+        self.entry_codigo.bind("<Return>", self.escanear)
+        self.entry_codigo.bind("<KP_Enter>", self.escanear)
+        self.entry_codigo.bind("<F12>", self.confirmar)
+
+        # Valores opcionales para el próximo escaneo (vacíos = se usa el último movimiento)
+        self.opciones_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.opciones_frame.grid(row=2, column=1, padx=10, sticky="w")
+        ctk.CTkLabel(self.opciones_frame, text="Cantidad:").grid(row=0, column=0, padx=(0, 5))
+        self.entry_cantidad = ctk.CTkEntry(self.opciones_frame, width=70, placeholder_text="auto")
+        self.entry_cantidad.grid(row=0, column=1, padx=(0, 15))
+        ctk.CTkLabel(self.opciones_frame, text="Precio:").grid(row=0, column=2, padx=(0, 5))
+        self.entry_precio = ctk.CTkEntry(self.opciones_frame, width=90, placeholder_text="auto")
+        self.entry_precio.grid(row=0, column=3)
+
+        self.lbl_estado = ctk.CTkLabel(self, text="", anchor="w")
+        self.lbl_estado.grid(row=3, column=0, columnspan=2, padx=10, sticky="ew")
+
+        self.tabla = TablaReciclable(
+            self,
+            headers=["Código", "Producto", "Tipo", "Cantidad", "Precio", "Subtotal", "Acciones"],
+            column_widths=[90, 220, 60, 70, 90, 100, 130],
+            filas_visibles=self.FILAS_VISIBLES,
+            acciones=[
+                ("-1", lambda clave: self.restar(clave), {}),
+                ("Quitar", lambda clave: self.quitar(clave), {"fg_color": "red", "hover_color": "darkred"}),
+            ],
+            mensaje_vacio="No hay movimientos pendientes.",
+        )
+        self.tabla.grid(row=4, column=0, columnspan=2, padx=10, pady=5, sticky="ew")
+
+        self.pie_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.pie_frame.grid(row=5, column=0, columnspan=2, padx=10, pady=(5, 10), sticky="ew")
+        self.pie_frame.grid_columnconfigure(0, weight=1)
+        self.lbl_totales = ctk.CTkLabel(self.pie_frame, text="", font=ctk.CTkFont(weight="bold"))
+        self.lbl_totales.grid(row=0, column=0, sticky="w")
+        ctk.CTkButton(self.pie_frame, text="Vaciar", width=80, fg_color="gray", command=self.vaciar).grid(
+            row=0, column=1, padx=5
+        )
+        self.btn_confirmar = ctk.CTkButton(self.pie_frame, text="Confirmar (F12)", command=self.confirmar)
+        self.btn_confirmar.grid(row=0, column=2, padx=5)
+
+        self._redibujar()
+
+    def enfocar(self):
+        self.entry_codigo.focus_set()
+
+    def _informar(self, texto, error=False):
+        self.lbl_estado.configure(text=texto, text_color="red" if error else ("gray10", "gray90"))
+        if error:
+            self.bell()
+
+    def _leer_opciones(self):
+        """Cantidad y precio escritos para este escaneo (None si están vacíos). Lanza ValueError si no son válidos."""
+        cantidad_str = self.entry_cantidad.get().strip()
+        precio_str = self.entry_precio.get().strip()
+        cantidad = int(cantidad_str) if cantidad_str else None
+        precio = float(precio_str) if precio_str else None
+        if (cantidad is not None and cantidad <= 0) or (precio is not None and precio <= 0):
+            raise ValueError
+        return cantidad, precio
+
+    def escanear(self, event=None):
+        codigo = self.entry_codigo.get().strip()
+        self.entry_codigo.delete(0, "end")
+        if not codigo:
+            return "break"
+        producto_id = self.db_manager.catalogo.id_por_codigo(codigo)
+        if producto_id is None:
+            self._informar(f"No existe un producto con código '{codigo}'.", error=True)
+            return "break"
+        try:
+            cantidad, precio = self._leer_opciones()
+        except ValueError:
+            self._informar("Cantidad y precio deben ser números positivos.", error=True)
+            return "break"
+        self.entry_cantidad.delete(0, "end")
+        self.entry_precio.delete(0, "end")
+
+        tipo = self.combo_tipo.get()
+        clave = (producto_id, tipo)
+        linea = self.pendientes.pop(clave, None)
+        if linea is not None:
+            # Se vuelve a poner al final para que quede arriba en la lista
+            linea[2] += cantidad or 1
+            if precio is not None:
+                linea[3] = precio
+        else:
+            codigo, nombre = self.db_manager.catalogo.producto(producto_id)
+            ultimo = self.ultimos.get(clave)
+            linea = [
+                codigo, nombre,
+                cantidad or (ultimo[1] if ultimo else 1),
+                precio if precio is not None else (ultimo[0] if ultimo else None),
+            ]
+            if ultimo is None:
+                self._pedir_ultimo(clave, cantidad is None, precio is None)
+        self.pendientes[clave] = linea
+        self._informar(f"{linea[1]}: {linea[2]} u.")
+        self._redibujar()
+        return "break"
+
+    def _pedir_ultimo(self, clave, completar_cantidad, completar_precio):
+        """Busca en segundo plano el último movimiento y completa la línea si sigue pendiente."""
+        def recibido(ultimo):
+            if ultimo is None:
+                if clave in self.pendientes and self.pendientes[clave][3] is None:
+                    self._informar(
+                        f"{self.pendientes[clave][1]} no tiene movimientos previos: escanéelo de nuevo con el precio.",
+                        error=True
+                    )
+                return
+            self.ultimos[clave] = ultimo
+            linea = self.pendientes.get(clave)
+            if linea is None:
+                return
+            if completar_precio and linea[3] is None:
+                linea[3] = ultimo[0]
+            if completar_cantidad and linea[2] == 1:
+                linea[2] = ultimo[1]
+            self._redibujar()
+
+        self.db_executor.enviar_lectura(self.db_manager.obtener_ultimo_movimiento, *clave, al_terminar=recibido)
+
+    def restar(self, clave):
+        linea = self.pendientes.get(clave)
+        if linea is None:
+            return
+        linea[2] -= 1
+        if linea[2] <= 0:
+            del self.pendientes[clave]
+        self._redibujar()
+
+    def quitar(self, clave):
+        self.pendientes.pop(clave, None)
+        self._redibujar()
+
+    def vaciar(self):
+        self.pendientes.clear()
+        self._informar("")
+        self._redibujar()
+
+    def _redibujar(self):
+        """Muestra las últimas líneas (la más reciente arriba) y los totales."""
+        filas = []
+        for clave, (codigo, nombre, cantidad, precio) in reversed(list(self.pendientes.items())[-self.FILAS_VISIBLES:]):
+            filas.append((
+                [
+                    codigo, nombre, clave[1], cantidad,
+                    f"${precio:,.2f}" if precio is not None else "Sin precio",
+                    f"${precio * cantidad:,.2f}" if precio is not None else "-",
+                ],
+                None if precio is not None else "#DCA501",
+                clave,
+            ))
+        self.tabla.mostrar(filas)
+
+        unidades = sum(linea[2] for linea in self.pendientes.values())
+        importe = sum(linea[2] * linea[3] for linea in self.pendientes.values() if linea[3] is not None)
+        ocultas = len(self.pendientes) - len(filas)
+        texto = f"{len(self.pendientes)} líneas, {unidades} unidades, ${importe:,.2f}"
+        if ocultas:
+            texto += f" ({ocultas} líneas más no se muestran)"
+        self.lbl_totales.configure(text=texto)
+
+    def confirmar(self, event=None):
+        """Guarda todas las líneas pendientes en una sola transacción."""
+        if self.guardando or not self.pendientes:
+            return "break"
+        if any(linea[3] is None for linea in self.pendientes.values()):
+            self._informar("Hay líneas sin precio: escanéelas de nuevo indicando el precio.", error=True)
+            return "break"
+
+        fecha_iso = date.today().isoformat()
+        # Copia de lo que se guarda: mientras tanto se puede seguir escaneando
+        pendientes = {clave: tuple(linea) for clave, linea in self.pendientes.items()}
+        lote = [
+            (producto_id, fecha_iso, tipo, precio, cantidad, self.OBSERVACION)
+            for (producto_id, tipo), (_, _, cantidad, precio) in pendientes.items()
+        ]
+
+        def guardado(resultado):
+            self.guardando = False
+            self.btn_confirmar.configure(state="normal")
+            if resultado is None:
+                self._informar("Error al guardar los movimientos; la lista se conserva.", error=True)
+                return
+            # Se descuenta lo guardado: las unidades escaneadas mientras tanto siguen pendientes
+            for clave, (_, _, cantidad, precio) in pendientes.items():
+                linea = self.pendientes.get(clave)
+                if linea is not None:
+                    linea[2] -= cantidad
+                    if linea[2] <= 0:
+                        del self.pendientes[clave]
+                self.ultimos[clave] = (precio, cantidad)
+            self._informar(f"{resultado} movimientos guardados.")
+            # El Inventario repinta las filas de esos productos con los registros de cambio del lote
+            self._redibujar()
+
+        self.guardando = True
+        self.btn_confirmar.configure(state="disabled")
+        with self.db_executor.accion("Confirmar entrada rápida"):
+            self.db_executor.enviar(self.db_manager.insertar_movimientos_lote, lote, al_terminar=guardado)
+        return "break"
+
+
 class MovimientosPage(ctk.CTkFrame):
-    def __init__(self, master, db_manager):
+    def __init__(self, master, db_executor):
         super().__init__(master, corner_radius=0)
-        self.db_manager = db_manager
+        self.db_executor = db_executor
+        self.db_manager = db_executor.db
         
         self.grid_columnconfigure(0, weight=1)
 
@@ -670,22 +1694,20 @@ class MovimientosPage(ctk.CTkFrame):
         ctk.CTkLabel(self, text="Registro de movimientos", font=ctk.CTkFont(size=16)).grid(
             row=1, column=0, padx=0, pady=(0, 20), sticky="w"
         )
+        # Alterna entre el formulario completo y la carga rápida con lector de códigos
+        self.switch_rapida = ctk.CTkSwitch(self, text="Entrada rápida", command=self.cambiar_modo)
+        self.switch_rapida.grid(row=1, column=0, padx=20, pady=(0, 20), sticky="e")
+        self.entrada_rapida = None
         
         self.form_frame = ctk.CTkFrame(self)
         self.form_frame.grid(row=2, column=0, sticky="ew", padx=20, pady=10)
         self.form_frame.grid_columnconfigure((0, 1), weight=1)
 
-        # 1. Producto (Select/ComboBox)
-        ctk.CTkLabel(self.form_frame, text="Producto:").grid(row=0, column=0, padx=10, pady=5, sticky="w")
-        self.productos_data = self.db_manager.obtener_productos_combo()
-        self.productos_nombres = [nombre for id, nombre in self.productos_data]
-        
-        if not self.productos_nombres:
-             self.productos_nombres = ["No hay productos (Agregue uno primero)"]
-        
-        self.combo_producto = ctk.CTkComboBox(self.form_frame, values=self.productos_nombres, state="readonly")
-        self.combo_producto.set(self.productos_nombres[0]) 
-        self.combo_producto.grid(row=0, column=1, padx=10, pady=5, sticky="ew")
+        # 1. Producto (búsqueda por código o nombre mientras se escribe)
+        ctk.CTkLabel(self.form_frame, text="Producto:").grid(row=0, column=0, padx=10, pady=5, sticky="nw")
+        self.selector_producto = SelectorProducto(self.form_frame, db_executor)
+        self.selector_producto.grid(row=0, column=1, padx=10, pady=5, sticky="ew")
+        self.db_executor.suscribir_catalogo(self._catalogo_cambiado)
 
         # 2. Fecha
         ctk.CTkLabel(self.form_frame, text="Fecha (dd/mm/aaaa):").grid(row=1, column=0, padx=10, pady=5, sticky="w")
@@ -718,48 +1740,103 @@ class MovimientosPage(ctk.CTkFrame):
         # 7. Botón Registrar
         self.btn_registrar = ctk.CTkButton(self.form_frame, text="Registrar Movimiento", command=self.registrar_movimiento_action)
         self.btn_registrar.grid(row=6, column=0, columnspan=2, padx=10, pady=20, sticky="e")
+
+        # 8. Importación masiva desde archivo
+        self.panel_importacion = PanelImportacion(
+            self, db_executor, "Importar archivo...",
+            "CSV, JSON o JSON Lines con columnas: codigo, fecha, tipo, precio, cantidad, observaciones",
+            importar=lambda ruta, al_progresar, simular: importar_movimientos(self.db_manager, ruta, al_progresar=al_progresar),
+            resumir=lambda resumen: (
+                f"{resumen['insertadas']} movimientos insertados y {resumen['rechazadas']} rechazados "
+                f"en {resumen['segundos']:.1f} s ({resumen['filas_por_segundo']:.0f} filas/s)."
+            )
+        )
+        self.panel_importacion.grid(row=3, column=0, sticky="ew", padx=20, pady=10)
+
+        # 9. Exportación del libro de movimientos por rango de fechas
+        self.rango_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.rango_frame.grid(row=4, column=0, sticky="w", padx=20, pady=(10, 0))
+        ctk.CTkLabel(self.rango_frame, text="Exportar desde:").grid(row=0, column=0, padx=(10, 5))
+        self.entry_desde = ctk.CTkEntry(self.rango_frame, placeholder_text="dd/mm/aaaa", width=110)
+        self.entry_desde.grid(row=0, column=1, padx=5)
+        ctk.CTkLabel(self.rango_frame, text="hasta:").grid(row=0, column=2, padx=5)
+        self.entry_hasta = ctk.CTkEntry(self.rango_frame, placeholder_text="dd/mm/aaaa", width=110)
+        self.entry_hasta.grid(row=0, column=3, padx=5)
+
+        self.panel_exportacion = PanelExportacion(
+            self, db_executor, "Exportar movimientos...", "Sin fechas se exportan todos los movimientos.",
+            preparar=self._rango_exportacion,
+            exportar=lambda ruta, rango, al_progresar: exportar_movimientos(
+                self.db_manager, ruta, *rango, al_progresar=al_progresar
+            ),
+            nombre_sugerido="movimientos.csv"
+        )
+        self.panel_exportacion.grid(row=5, column=0, sticky="ew", padx=20, pady=10)
         
+    def _rango_exportacion(self):
+        """Lee el rango de fechas a exportar como (desde, hasta) ISO. Retorna None si no es válido."""
+        try:
+            desde = fecha_a_iso(self.entry_desde.get().strip()) if self.entry_desde.get().strip() else None
+            hasta = fecha_a_iso(self.entry_hasta.get().strip()) if self.entry_hasta.get().strip() else None
+        except ValueError:
+            messagebox.showerror("Error de Datos", "Error: El formato de las fechas debe ser dd/mm/aaaa.")
+            return None
+        return desde, hasta
+
+    def cambiar_modo(self):
+        """Muestra la entrada rápida (se crea la primera vez) o el formulario completo."""
+        if self.switch_rapida.get():
+            if self.entrada_rapida is None:
+                self.entrada_rapida = EntradaRapida(self, self.db_executor)
+            self.form_frame.grid_remove()
+            self.entrada_rapida.grid(row=2, column=0, sticky="ew", padx=20, pady=10)
+            self.entrada_rapida.enfocar()
+        else:
+            self.entrada_rapida.grid_remove()
+            self.form_frame.grid()
+
+    def _catalogo_cambiado(self, tipo):
+        # Si se eliminó el producto elegido, se descarta la selección
+        producto_id = self.selector_producto.producto_id
+        if tipo == CAMBIO_PRODUCTOS and producto_id is not None and self.db_manager.catalogo.producto(producto_id) is None:
+            self.selector_producto.limpiar()
+
     def registrar_movimiento_action(self):
-        nombre_producto = self.combo_producto.get()
+        producto_id = self.selector_producto.producto_id
         fecha = self.entry_fecha.get().strip()
         tipo = self.combo_tipo.get()
         precio_str = self.entry_precio.get().strip()
         cantidad_str = self.entry_cantidad.get().strip()
         observaciones = self.entry_observaciones.get("1.0", "end-1c").strip()
         
-        if nombre_producto == "No hay productos (Agregue uno primero)" or not all([fecha, tipo, precio_str, cantidad_str]):
+        if producto_id is None:
             messagebox.showerror("Error de Datos", "Error: ingresa los datos correctamente. Asegúrate de seleccionar un producto y llenar todos los campos.")
             return
-            
-        try:
-            date.strptime(fecha, "%d/%m/%Y")
-        except ValueError:
-            messagebox.showerror("Error de Datos", "Error: El formato de la fecha debe ser dd/mm/aaaa. Por favor, ingresa los datos correctamente.")
-            return
 
+        # Mismas reglas que la importación de movimientos
         try:
-            precio = float(precio_str)
-            cantidad = int(cantidad_str)
-            if precio <= 0 or cantidad <= 0:
-                 raise ValueError("Los valores deben ser positivos.")
-        except ValueError:
-            messagebox.showerror("Error de Datos", "Error: Precio y Cantidad deben ser números positivos válidos. Por favor, ingresa los datos correctamente.")
+            fecha_iso, tipo, precio, cantidad = validar_movimiento(fecha, tipo, precio_str, cantidad_str)
+        except ValueError as e:
+            messagebox.showerror("Error de Datos", f"Error: {e} Por favor, ingresa los datos correctamente.")
             return
 
-        producto_id = self.db_manager.obtener_id_producto_por_nombre(nombre_producto)
-        
-        if producto_id is None:
-            messagebox.showerror("Error", "Error: No se encontró el ID del producto seleccionado. Intente recargar la aplicación.")
-            return
+        # Se deshabilita el botón hasta que la DB responda para evitar registros dobles
+        self.btn_registrar.configure(state="disabled")
+        # La inserción devuelve también el stock resultante: un solo viaje a la base
+        with self.db_executor.accion("Registrar movimiento"):
+            self.db_executor.enviar(
+                self.db_manager.registrar_movimiento, producto_id, fecha_iso, tipo, precio, cantidad, observaciones,
+                al_terminar=self._resultado_registro
+            )
 
-        result = self.db_manager.insertar_movimiento(producto_id, fecha, tipo, precio, cantidad, observaciones)
+    def _resultado_registro(self, result):
+        self.btn_registrar.configure(state="normal")
 
         if result is not None:
-            messagebox.showinfo("Registro Exitoso", "El movimiento se registró exitosamente.")
+            _, stock = result
+            messagebox.showinfo("Registro Exitoso", f"El movimiento se registró exitosamente. Stock actual: {stock}.")
+            # El Inventario repinta la fila de este producto con el registro de cambio que publica la base
             self._limpiar_campos()
-            # Al registrar un movimiento, recargamos el Inventario si existe
-            if "inventario" in self.master.master.pages:
-                self.master.master.pages["inventario"].refresh_and_redraw()
         else:
             messagebox.showerror("Error", "Ocurrió un error desconocido al registrar el movimiento. Verifica la integridad de los datos.")
             
@@ -771,14 +1848,246 @@ class MovimientosPage(ctk.CTkFrame):
         self.entry_fecha.insert(0, date.today().strftime("%d/%m/%Y"))
 
 
+# --- CLASE DE VISTA: TABLERO DE VENTAS ---
+
+class GraficoBarras(ctk.CTkCanvas):
+    """Gráfico de barras agrupadas (una barra por serie en cada período) dibujado en un Canvas."""
+    ALTO = 220
+    MARGEN = 30
+
+    def __init__(self, master, series, **kwargs):
+        super().__init__(master, height=self.ALTO, highlightthickness=0, bg="#2B2B2B", **kwargs)
+        self.series = series  # [(nombre, color)]
+        self._datos = ([], [])
+        self.bind("<Configure>", lambda event: self._dibujar())
+
+    def mostrar(self, etiquetas, valores):
+        """etiquetas: un texto por período; valores: una lista por serie, alineada con etiquetas."""
+        self._datos = (etiquetas, valores)
+        self._dibujar()
+
+    def _dibujar(self):
+        self.delete("all")
+        etiquetas, valores = self._datos
+        ancho = max(self.winfo_width(), 200)
+        alto_util = self.ALTO - 2 * self.MARGEN
+        if not etiquetas:
+            self.create_text(ancho / 2, self.ALTO / 2, text="Sin movimientos en el período", fill="gray")
+            return
+
+        maximo = max((max(serie) for serie in valores if serie), default=0) or 1
+        ancho_grupo = (ancho - 2 * self.MARGEN) / len(etiquetas)
+        ancho_barra = max(ancho_grupo * 0.8 / len(self.series), 1)
+        # Con muchos períodos se rotula uno de cada 'paso' para que no se encimen
+        paso = max(1, round(40 / ancho_grupo))
+        for i, etiqueta in enumerate(etiquetas):
+            x = self.MARGEN + i * ancho_grupo + ancho_grupo * 0.1
+            for j, (nombre, color) in enumerate(self.series):
+                altura = valores[j][i] / maximo * alto_util
+                x0 = x + j * ancho_barra
+                self.create_rectangle(x0, self.MARGEN + alto_util - altura, x0 + ancho_barra, self.MARGEN + alto_util, fill=color, width=0)
+            if i % paso == 0:
+                self.create_text(x + ancho_grupo * 0.4, self.ALTO - self.MARGEN / 2, text=etiqueta, fill="white", font=("", 8))
+
+        self.create_text(self.MARGEN, self.MARGEN / 2, text=f"Máx: ${maximo:,.0f}", fill="white", anchor="w", font=("", 9))
+        for j, (nombre, color) in enumerate(self.series):
+            self.create_text(ancho - self.MARGEN - 110 * j, self.MARGEN / 2, text=f"■ {nombre}", fill=color, anchor="e", font=("", 9))
+
+
+class TableroPage(ctk.CTkFrame):
+    """Tablero de compras y ventas. Lee sólo las tablas de resumen (ver migración 8 en db_manager)."""
+    # Período -> (meses hacia atrás incluyendo el actual, serie por día)
+    PERIODOS = {
+        "Este mes": (1, True),
+        "Últimos 3 meses": (3, True),
+        "Últimos 12 meses": (12, False),
+    }
+
+    def __init__(self, master, db_executor):
+        super().__init__(master, corner_radius=0)
+        self.db_executor = db_executor
+        self.db_manager = db_executor.db
+
+        self.grid_columnconfigure((0, 1, 2), weight=1)
+
+        ctk.CTkLabel(self, text="TABLERO", font=ctk.CTkFont(size=24, weight="bold")).grid(
+            row=0, column=0, padx=0, pady=(0, 5), sticky="w"
+        )
+        ctk.CTkLabel(self, text="Compras y ventas", font=ctk.CTkFont(size=16)).grid(
+            row=1, column=0, padx=0, pady=(0, 20), sticky="w"
+        )
+
+        self.combo_periodo = ctk.CTkComboBox(
+            self, values=list(self.PERIODOS), command=lambda _: self.load_dashboard_data(), width=160, state="readonly"
+        )
+        self.combo_periodo.set("Últimos 12 meses")
+        self.combo_periodo.grid(row=0, column=2, sticky="e")
+        self.lbl_totales = ctk.CTkLabel(self, text="", font=ctk.CTkFont(weight="bold"))
+        self.lbl_totales.grid(row=1, column=1, columnspan=2, sticky="e", pady=(0, 20))
+
+        self.grafico = GraficoBarras(self, [("Compras", "#1F6AA5"), ("Ventas", "#0C9E38")])
+        self.grafico.grid(row=2, column=0, columnspan=3, sticky="ew", pady=(0, 15))
+
+        # Rankings: productos, laboratorios y categorías más vendidos
+        self.listas = {}
+        for columna, (clave, titulo) in enumerate((
+            ("productos", "Productos más vendidos"),
+            ("laboratorios", "Laboratorios más vendidos"),
+            ("categorias", "Ventas por categoría"),
+        )):
+            marco = ctk.CTkFrame(self)
+            marco.grid(row=3, column=columna, sticky="nsew", padx=5)
+            ctk.CTkLabel(marco, text=titulo, font=ctk.CTkFont(weight="bold")).pack(anchor="w", padx=10, pady=(10, 5))
+            self.listas[clave] = ctk.CTkLabel(marco, text="", justify="left", anchor="nw")
+            self.listas[clave].pack(anchor="w", fill="both", expand=True, padx=10, pady=(0, 10))
+        self.grid_rowconfigure(3, weight=1)
+
+        self.lbl_tiempo = ctk.CTkLabel(self, text="", text_color="gray")
+        self.lbl_tiempo.grid(row=4, column=0, columnspan=3, sticky="e")
+
+        self.load_dashboard_data()
+
+    def _rango_meses(self, meses):
+        """Meses 'aaaa-mm' desde (meses - 1) meses atrás hasta el actual."""
+        hoy = date.today()
+        indice = hoy.year * 12 + hoy.month - 1 - (meses - 1)
+        return f"{indice // 12:04d}-{indice % 12 + 1:02d}", hoy.strftime("%Y-%m")
+
+    def load_dashboard_data(self):
+        periodo = self.combo_periodo.get()
+        meses, por_dia = self.PERIODOS[periodo]
+        desde, hasta = self._rango_meses(meses)
+
+        def mostrar(tablero):
+            if periodo == self.combo_periodo.get():
+                self.show_dashboard(tablero, por_dia)
+
+        self.db_executor.enviar_lectura(self.db_manager.obtener_tablero, desde, hasta, por_dia, al_terminar=mostrar)
+
+    def show_dashboard(self, tablero, por_dia):
+        serie = tablero["serie"]
+        # dd/mm para los días, mm/aaaa para los meses
+        etiquetas = [f"{p[8:10]}/{p[5:7]}" if por_dia else f"{p[5:7]}/{p[:4]}" for p, *_ in serie]
+        self.grafico.mostrar(etiquetas, [[fila[1] for fila in serie], [fila[2] for fila in serie]])
+
+        compras = sum(fila[1] for fila in serie)
+        ventas = sum(fila[2] for fila in serie)
+        self.lbl_totales.configure(text=f"Compras: ${compras:,.2f}   |   Ventas: ${ventas:,.2f}")
+
+        for clave, lista in self.listas.items():
+            filas = tablero[clave]
+            texto = "\n".join(f"{nombre}: {cantidad} u. - ${importe:,.2f}" for nombre, cantidad, importe in filas)
+            lista.configure(text=texto or "Sin ventas en el período")
+        self.lbl_tiempo.configure(text=f"Consultado en {tablero['milisegundos']:.1f} ms")
+
+    def refresh_and_redraw(self):
+        self.load_dashboard_data()
+
+
+# --- COMPONENTE: PANEL DE RENDIMIENTO (F9) ---
+
+class PanelRendimiento(ctk.CTkFrame):
+    """
+    Panel superpuesto en la esquina de la ventana con los tiempos medidos por
+    instrumentacion.py (p50/p95/p99 de las últimas mediciones) y el estado de la
+    cola de la base de datos. Se actualiza cada segundo mientras está visible.
+    """
+    INTERVALO_MS = 1000
+
+    def __init__(self, master, db_executor, registro, texto_extra):
+        super().__init__(master, corner_radius=8, border_width=1)
+        self.db_executor = db_executor
+        self.registro = registro
+        self.texto_extra = texto_extra  # función que retorna texto adicional para el registro
+        self._sondeo = None
+
+        barra = ctk.CTkFrame(self, fg_color="transparent")
+        barra.grid(row=0, column=0, sticky="ew", padx=10, pady=(8, 4))
+        ctk.CTkLabel(barra, text="Rendimiento (ms)", font=ctk.CTkFont(weight="bold")).grid(row=0, column=0, padx=(0, 15))
+        self.switch_medir = ctk.CTkSwitch(barra, text="Medir", command=self.cambiar_medicion)
+        self.switch_medir.grid(row=0, column=1, padx=5)
+        ctk.CTkButton(barra, text="Reiniciar", width=80, command=self.reiniciar).grid(row=0, column=2, padx=5)
+        ctk.CTkButton(barra, text="Guardar registro", width=120, command=self.guardar_registro).grid(row=0, column=3, padx=5)
+
+        self.texto = ctk.CTkTextbox(self, width=720, height=280, wrap="none", font=ctk.CTkFont(family="Courier", size=12))
+        self.texto.grid(row=1, column=0, padx=10, pady=(0, 4))
+        self.label_estado = ctk.CTkLabel(self, text="", anchor="w")
+        self.label_estado.grid(row=2, column=0, sticky="ew", padx=10, pady=(0, 8))
+
+    def visible(self):
+        return self._sondeo is not None
+
+    def mostrar(self):
+        # Al abrir el panel se enciende la medición (se puede apagar con el interruptor)
+        instrumentacion.activar()
+        self.switch_medir.select()
+        self.place(relx=1.0, rely=1.0, x=-10, y=-10, anchor="se")
+        self.lift()
+        self._actualizar()
+
+    def ocultar(self):
+        if self._sondeo is not None:
+            self.after_cancel(self._sondeo)
+            self._sondeo = None
+        self.place_forget()
+
+    def cambiar_medicion(self):
+        if self.switch_medir.get():
+            instrumentacion.activar()
+        else:
+            instrumentacion.desactivar()
+
+    def reiniciar(self):
+        instrumentacion.reiniciar()
+        self._actualizar()
+
+    def guardar_registro(self):
+        if not self.registro:
+            self.label_estado.configure(text="No hay archivo de registro configurado (config.ini, [instrumentacion]).")
+        elif instrumentacion.volcar(self.registro, self.texto_extra()):
+            self.label_estado.configure(text=f"Registro agregado a {self.registro}")
+        else:
+            self.label_estado.configure(text=f"No se pudo escribir {self.registro}")
+
+    def _actualizar(self):
+        cola = (
+            f"Cola DB: {self.db_executor.profundidad_cola()} por ejecutar, "
+            f"{self.db_executor.pendientes()} sin entregar"
+        )
+        self.texto.configure(state="normal")
+        self.texto.delete("1.0", "end")
+        self.texto.insert("1.0", f"{cola}\n\n{instrumentacion.reporte()}\n\n{self.db_executor.reporte_acciones()}")
+        self.texto.configure(state="disabled")
+        self._sondeo = self.after(self.INTERVALO_MS, self._actualizar)
+
 # --- CLASE PRINCIPAL DE LA APLICACIÓN ---
 
 class App(ctk.CTk):
     """Contenedor principal con Navegación."""
+    # Las páginas se construyen recién la primera vez que se navega a ellas
+    CLASES_PAGINAS = {
+        "categorias": CategoriasPage,
+        "productos": ProductosPage,
+        "movimientos": MovimientosPage,
+        "inventario": InventarioPage,
+        "tablero": TableroPage,
+    }
+
     def __init__(self):
+        self.inicio_arranque = time.perf_counter()
+        # Tiempos de arranque en ms: "base_datos", "primera_pintura" y "pagina:<nombre>"
+        self.tiempos_arranque = {}
+        # Medición de tiempos (apagada salvo que config.ini diga lo contrario; F9 muestra el panel)
+        self.config_instrumentacion = instrumentacion.cargar_configuracion()
+        instrumentacion.configurar(self.config_instrumentacion)
         super().__init__()
 
-        self.db_manager = DBManager()
+        # Todas las operaciones de la base de datos corren en el hilo del ejecutor
+        inicio = time.perf_counter()
+        self.db_executor = DBExecutor(self)
+        self.db_manager = self.db_executor.db
+        self.tiempos_arranque["base_datos"] = (time.perf_counter() - inicio) * 1000
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.title("Sistema de Inventario")
         self.geometry("1200x600") 
@@ -792,11 +2101,12 @@ class App(ctk.CTk):
         self.page_container.grid_columnconfigure(0, weight=1)
         
         self.current_page_view = None
+        self.label_cargando = ctk.CTkLabel(self.page_container, text="Cargando...", font=ctk.CTkFont(size=16))
 
         # --- 1. Navegador (Sidebar) ---
         self.sidebar_frame = ctk.CTkFrame(self, width=140, corner_radius=0)
         self.sidebar_frame.grid(row=0, column=0, sticky="nsew")
-        self.sidebar_frame.grid_rowconfigure(6, weight=1) 
+        self.sidebar_frame.grid_rowconfigure(7, weight=1) 
         
         ctk.CTkLabel(self.sidebar_frame, text="Inventario", font=ctk.CTkFont(size=20, weight="bold")).grid(
             row=0, column=0, padx=20, pady=(20, 10)
@@ -813,24 +2123,91 @@ class App(ctk.CTk):
 
         self.btn_inventario = ctk.CTkButton(self.sidebar_frame, text="Inventario", command=lambda: self.show_page("inventario"))
         self.btn_inventario.grid(row=4, column=0, padx=20, pady=10)
+
+        self.btn_tablero = ctk.CTkButton(self.sidebar_frame, text="Tablero", command=lambda: self.show_page("tablero"))
+        self.btn_tablero.grid(row=5, column=0, padx=20, pady=10)
         
-        # Inicializar todas las páginas
-        self.pages = {
-            "categorias": CategoriasPage(self.page_container, self.db_manager),
-            "productos": ProductosPage(self.page_container, self.db_manager),
-            "movimientos": MovimientosPage(self.page_container, self.db_manager),
-            "inventario": InventarioPage(self.page_container, self.db_manager), 
-        }
+        # Sólo contiene las páginas ya construidas; las demás se crean en show_page()
+        self.pages = {}
+        self._pagina_pendiente = None
+        self.vista_producto = None
+        self.panel_rendimiento = None
 
+        self.bind("<Map>", self._primera_pintura, add="+")
+        self.bind("<F9>", self.alternar_panel_rendimiento)
         self.show_page("inventario") 
 
-    def show_page(self, page_name):
+    def _primera_pintura(self, event):
+        """Registra (una sola vez) cuánto tardó la ventana en mostrarse desde el arranque."""
+        if event.widget is not self or "primera_pintura" in self.tiempos_arranque:
+            return
+        # Espera a que se dibujen los widgets pendientes antes de medir
+        self.update_idletasks()
+        self.tiempos_arranque["primera_pintura"] = (time.perf_counter() - self.inicio_arranque) * 1000
+        print(self.reporte_arranque())
+
+    def reporte_arranque(self):
+        """Texto con los tiempos de arranque medidos hasta el momento."""
+        lineas = [
+            f"Base de datos lista en {self.tiempos_arranque['base_datos']:.1f} ms",
+        ]
+        if "primera_pintura" in self.tiempos_arranque:
+            lineas.append(f"Primera pintura a los {self.tiempos_arranque['primera_pintura']:.1f} ms del inicio")
+        for clave, ms in self.tiempos_arranque.items():
+            if clave.startswith("pagina:"):
+                lineas.append(f"  Página '{clave[7:]}' construida en {ms:.1f} ms")
+        return "\n".join(lineas)
+
+    def alternar_panel_rendimiento(self, event=None):
+        """Muestra u oculta el panel de rendimiento sobre la página actual."""
+        if self.panel_rendimiento is None:
+            self.panel_rendimiento = PanelRendimiento(
+                self, self.db_executor, self.config_instrumentacion["registro"], self._texto_registro
+            )
+        if self.panel_rendimiento.visible():
+            self.panel_rendimiento.ocultar()
+        else:
+            self.panel_rendimiento.mostrar()
+
+    def _texto_registro(self):
+        """Tiempos de arranque y métricas del ejecutor que acompañan al reporte de rendimiento."""
+        return f"{self.reporte_arranque()}\n{self.db_executor.reporte()}"
+
+    def obtener_pagina(self, page_name):
+        """Retorna la página indicada, construyéndola si todavía no existe."""
+        pagina = self.pages.get(page_name)
+        if pagina is None:
+            inicio = time.perf_counter()
+            pagina = self.CLASES_PAGINAS[page_name](self.page_container, self.db_executor)
+            self.pages[page_name] = pagina
+            ms = (time.perf_counter() - inicio) * 1000
+            self.tiempos_arranque[f"pagina:{page_name}"] = ms
+            if "primera_pintura" in self.tiempos_arranque:
+                print(f"Página '{page_name}' construida en {ms:.1f} ms")
+        return pagina
+
+    def _construir_pendiente(self):
+        """Construye la página que quedó esperando detrás del indicador de carga."""
+        page_name, self._pagina_pendiente = self._pagina_pendiente, None
+        if page_name is None:
+            return
+        self.obtener_pagina(page_name)
+        # Si mientras tanto se navegó a otra página, ésta queda construida pero oculta
+        if self.current_page_view is self.label_cargando:
+            self.label_cargando.grid_forget()
+            self.current_page_view = None
+            # Recién construida ya pidió sus datos: no hace falta refrescarla
+            self.show_page(page_name, refrescar=False)
+
+    @medir("app.show_page")
+    def show_page(self, page_name, refrescar=True):
         """Muestra la página seleccionada y oculta las demás."""
         
         self.btn_categorias.configure(state="normal")
         self.btn_productos.configure(state="normal")
         self.btn_movimientos.configure(state="normal")
         self.btn_inventario.configure(state="normal") 
+        self.btn_tablero.configure(state="normal")
         
         if page_name.startswith("ver_producto"):
             if self.current_page_view:
@@ -843,6 +2220,16 @@ class App(ctk.CTk):
         
         if self.current_page_view:
             self.current_page_view.grid_forget()
+
+        if page_to_show is None:
+            # Primero se pinta el indicador de carga y luego se construye la página;
+            # sus datos llegan después desde el hilo de lectura.
+            if self._pagina_pendiente is None:
+                self.after(1, self._construir_pendiente)
+            self._pagina_pendiente = page_name
+            self.label_cargando.grid(row=0, column=0)
+            self.current_page_view = self.label_cargando
+            return
             
         page_to_show.grid(row=0, column=0, sticky="nsew", padx=0, pady=0)
         self.current_page_view = page_to_show
@@ -855,6 +2242,11 @@ class App(ctk.CTk):
             self.btn_movimientos.configure(state="disabled")
         elif page_name == "inventario":
             self.btn_inventario.configure(state="disabled")
+            page_to_show.aplicar_cambios_pendientes()
+        elif page_name == "tablero":
+            self.btn_tablero.configure(state="disabled")
+            if refrescar:
+                page_to_show.refresh_and_redraw()
 
     def show_product_details(self, product_id):
         """Muestra la vista de detalles de un producto específico."""
@@ -862,7 +2254,11 @@ class App(ctk.CTk):
         if self.current_page_view:
             self.current_page_view.grid_forget()
 
-        self.current_page_view = VerProductoPage(self.page_container, self.db_manager, product_id, self.pages["inventario"])
+        # Una sola vista de detalle que se reutiliza para todos los productos
+        if self.vista_producto is None:
+            self.vista_producto = VerProductoPage(self.page_container, self.db_executor, self.obtener_pagina("inventario"))
+        self.vista_producto.mostrar_producto(product_id)
+        self.current_page_view = self.vista_producto
         self.current_page_view.grid(row=0, column=0, sticky="nsew", padx=0, pady=0)
         
         self.btn_categorias.configure(state="normal")
@@ -870,6 +2266,15 @@ class App(ctk.CTk):
         self.btn_movimientos.configure(state="normal")
         self.btn_inventario.configure(state="disabled") 
 
+    def on_close(self):
+        """Espera las operaciones pendientes de la DB, cierra la conexión y la ventana."""
+        self.db_executor.cerrar()
+        # Con la medición encendida, las métricas de la sesión se agregan al registro
+        registro = self.config_instrumentacion["registro"]
+        if instrumentacion.activa() and registro:
+            instrumentacion.volcar(registro, self._texto_registro())
+        self.destroy()
+
 
 # Ejecución de la aplicación
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+import json
+from collections import deque
+
+# Métodos de costeo disponibles: clave guardada en la base -> nombre para mostrar
+METODOS_VALORACION = {
+    "promedio": "Promedio ponderado",
+    "fifo": "FIFO",
+}
+
+
+class EstadoValoracion:
+    """
+    Estado del costeo de un producto después de aplicar, en orden (fecha, id), sus
+    movimientos hasta (ultima_fecha, ultimo_id). Guardarlo permite continuar
+    después sólo con los movimientos nuevos.
+
+    Con 'promedio' cada venta sale al costo medio del stock; con 'fifo' sale de las
+    capas de compra más antiguas. Las ventas sin stock suficiente se costean al
+    último precio de compra y quedan como 'faltante' hasta la próxima compra.
+    """
+    __slots__ = (
+        "metodo", "ultima_fecha", "ultimo_id", "cantidad", "valor", "costo_ventas",
+        "ingresos", "ultimo_costo", "faltante", "capas", "valor_capas",
+    )
+
+    def __init__(self, metodo, ultima_fecha="", ultimo_id=0, cantidad=0, valor=0.0, costo_ventas=0.0,
+                 ingresos=0.0, ultimo_costo=0.0, faltante=0, capas=None):
+        self.metodo = metodo
+        self.ultima_fecha = ultima_fecha
+        self.ultimo_id = ultimo_id
+        self.cantidad = cantidad
+        self.valor = valor
+        self.costo_ventas = costo_ventas
+        self.ingresos = ingresos
+        self.ultimo_costo = ultimo_costo
+        self.faltante = faltante
+        # Capas FIFO: [cantidad restante, precio de compra], de la más antigua a la más nueva
+        self.capas = deque(json.loads(capas)) if capas else deque()
+        self.valor_capas = sum(c * p for c, p in self.capas)
+
+    def aplicar(self, movimiento_id, fecha, tipo, precio, cantidad):
+        """Procesa un movimiento. Deben llegar en orden (fecha, id)."""
+        if tipo == "Compra":
+            self._compra(precio, cantidad)
+        else:
+            self._venta(precio, cantidad)
+        self.ultima_fecha = fecha
+        self.ultimo_id = movimiento_id
+
+    def _compra(self, precio, cantidad):
+        self.cantidad += cantidad
+        self.ultimo_costo = precio
+        if self.metodo == "fifo":
+            # Las unidades vendidas sin stock ya se costearon; sólo el resto forma una capa
+            cubre = min(cantidad, self.faltante)
+            self.faltante -= cubre
+            if cantidad > cubre:
+                self.capas.append([cantidad - cubre, precio])
+                self.valor_capas += (cantidad - cubre) * precio
+            self.valor = self.valor_capas - self.faltante * self.ultimo_costo
+        else:
+            self.valor += cantidad * precio
+
+    def _venta(self, precio, cantidad):
+        self.ingresos += cantidad * precio
+        if self.metodo == "fifo":
+            restante = cantidad
+            while restante and self.capas:
+                capa = self.capas[0]
+                usadas = min(restante, capa[0])
+                self.costo_ventas += usadas * capa[1]
+                self.valor_capas -= usadas * capa[1]
+                capa[0] -= usadas
+                restante -= usadas
+                if capa[0] == 0:
+                    self.capas.popleft()
+            if not self.capas:
+                self.valor_capas = 0.0
+            if restante:
+                self.costo_ventas += restante * self.ultimo_costo
+                self.faltante += restante
+            self.cantidad -= cantidad
+            self.valor = self.valor_capas - self.faltante * self.ultimo_costo
+        else:
+            costo = self.valor / self.cantidad if self.cantidad > 0 else self.ultimo_costo
+            self.costo_ventas += cantidad * costo
+            self.cantidad -= cantidad
+            # Al quedar en cero se descarta el residuo de redondeo
+            self.valor = 0.0 if self.cantidad == 0 else self.valor - cantidad * costo
+
+    def como_fila(self, producto_id):
+        """Fila para la tabla 'valoracion' (mismo orden que sus columnas)."""
+        return (
+            producto_id, self.metodo, self.ultima_fecha, self.ultimo_id, self.cantidad, self.valor,
+            self.costo_ventas, self.ingresos, self.ultimo_costo, self.faltante,
+            json.dumps(list(self.capas)) if self.capas else None,
+        )